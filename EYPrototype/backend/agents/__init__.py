@@ -1,8 +1,21 @@
-from .master_agent import MasterAgent
-from .sales_agent import SalesAgent
-from .verification_agent import VerificationAgent
-from .underwriting_agent import UnderwritingAgent
-from .sanction_agent import SanctionLetterAgent
+import importlib
+
+# Agents are imported on first use; the LLM and LangGraph stacks are slow to import
+_EXPORTS = {
+    'MasterAgent': '.master_agent',
+    'SalesAgent': '.sales_agent',
+    'VerificationAgent': '.verification_agent',
+    'UnderwritingAgent': '.underwriting_agent',
+    'SanctionLetterAgent': '.sanction_agent',
+}
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
 __all__ = [
     'MasterAgent',
@@ -11,4 +24,3 @@ __all__ = [
     'UnderwritingAgent',
     'SanctionLetterAgent'
 ]
-
@@ -1,8 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-import os
+from typing import Dict, Any, Optional, Callable
+from contextvars import ContextVar
+from config import Config
+from .model_router import get_model_router, estimate_tokens
+import time
+
+# Receives (agent_name, token) while an LLM response streams. Set per request
+# by MasterAgent.process; context variables follow the request through the
+# workflow's asyncio tasks without putting a callable into the graph state.
+token_sink: ContextVar[Optional[Callable[[str, str], None]]] = ContextVar("token_sink", default=None)
 
 class BaseAgent(ABC):
     """Base class for all AI agents in the system"""
@@ -10,23 +16,37 @@ class BaseAgent(ABC):
     def __init__(self, agent_name: str, system_prompt: str):
         self.agent_name = agent_name
         self.system_prompt = system_prompt
-        api_key = os.getenv('OPENAI_API_KEY', '')
-        self.llm = ChatOpenAI(
-            model="gpt-4",
-            temperature=0.3,
-            openai_api_key=api_key
-        ) if api_key else None
+        self._llm = None
+    
+    @property
+    def llm(self):
+        """Default chat model for this agent; the router creates it on first use"""
+        return self._llm if self._llm is not None else get_model_router().chat_model("default")
+    
+    @llm.setter
+    def llm(self, value):
+        """Pin one model for every task of this agent (bypasses routing)"""
+        self._llm = value
+    
+    def _model_for(self, task: str):
+        router = get_model_router()
+        if self._llm is not None:
+            return self._llm, getattr(self._llm, "model_name", "custom")
+        return router.chat_model(task), router.model_name(task)
+    
+    @staticmethod
+    def _usage(response, prompt_chars: int, text: str):
+        usage = getattr(response, "usage_metadata", None) or {}
+        return (usage.get("input_tokens") or max(1, prompt_chars // 4),
+                usage.get("output_tokens") or estimate_tokens(text))
     
     @abstractmethod
     async def process(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Process the given context and return results"""
         pass
     
-    def _call_llm(self, user_message: str, additional_context: Optional[str] = None) -> str:
-        """Helper method to call LLM with system and user messages"""
-        if not self.llm:
-            return "LLM not configured. Please set OPENAI_API_KEY."
-        
+    def _build_messages(self, user_message: str, additional_context: Optional[str] = None):
+        from langchain.schema import HumanMessage, SystemMessage
         messages = [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=user_message)
@@ -34,11 +54,58 @@ class BaseAgent(ABC):
         
         if additional_context:
             messages.insert(1, HumanMessage(content=f"Additional Context: {additional_context}"))
+        return messages
+    
+    def _call_llm(self, user_message: str, additional_context: Optional[str] = None,
+                  task: str = "default") -> str:
+        """Helper method to call LLM with system and user messages"""
+        llm, model_name = self._model_for(task)
+        if not llm:
+            return "LLM not configured. Please set OPENAI_API_KEY."
         
+        messages = self._build_messages(user_message, additional_context)
+        prompt_chars = sum(len(m.content) for m in messages)
+        start = time.perf_counter()
         try:
-            response = self.llm.invoke(messages)
+            response = llm.invoke(messages)
+            get_model_router().record(task, model_name, time.perf_counter() - start,
+                                      *self._usage(response, prompt_chars, response.content))
             return response.content
         except Exception as e:
+            get_model_router().record(task, model_name, time.perf_counter() - start, error=True)
+            return f"Error calling LLM: {str(e)}"
+    
+    async def _generate(self, user_message: str, additional_context: Optional[str] = None,
+                        task: str = "default", stream: bool = True) -> str:
+        """Async LLM call; streams tokens to the active token_sink, if any, as they arrive.
+
+        stream=False keeps a response the customer should not see (e.g. a label) out of the sink.
+        """
+        llm, model_name = self._model_for(task)
+        if not llm:
+            return "LLM not configured. Please set OPENAI_API_KEY."
+        
+        sink = token_sink.get() if stream else None
+        messages = self._build_messages(user_message, additional_context)
+        prompt_chars = sum(len(m.content) for m in messages)
+        start = time.perf_counter()
+        try:
+            if sink is None:
+                response = await llm.ainvoke(messages)
+                text = response.content
+            else:
+                parts, response = [], None
+                async for chunk in llm.astream(messages):
+                    response = chunk
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        sink(self.agent_name, chunk.content)
+                text = "".join(parts)
+            get_model_router().record(task, model_name, time.perf_counter() - start,
+                                      *self._usage(response, prompt_chars, text))
+            return text
+        except Exception as e:
+            get_model_router().record(task, model_name, time.perf_counter() - start, error=True)
             return f"Error calling LLM: {str(e)}"
     
     def log_action(self, action: str, details: Dict[str, Any]):
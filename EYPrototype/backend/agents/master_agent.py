@@ -1,16 +1,55 @@
-from typing import Dict, Any, List
-from langgraph.graph import StateGraph, END
-from .base_agent import BaseAgent
-from .sales_agent import SalesAgent
-from .verification_agent import VerificationAgent
-from .underwriting_agent import UnderwritingAgent
-from .sanction_agent import SanctionLetterAgent
+from typing import Dict, Any, List, Optional, Callable, Tuple, Annotated
+from dataclasses import dataclass, field
+from .base_agent import BaseAgent, token_sink
+from services.profiler import mark_node
+from datetime import datetime
 import asyncio
+import operator
+import threading
+import time
+import uuid
+
+EMERGENCY_KEYWORDS = ["urgent", "emergency", "immediate", "asap", "critical"]
+
+# A history entry is (step, state field holding that step's output) rather than a copy of the output
+HistoryEntry = Tuple[str, Optional[str]]
+
+@dataclass(slots=True)
+class WorkflowState:
+    """State of one request through the workflow graph.
+
+    Nodes read it and return only the fields they change; history is merged
+    by concatenation, every other field by replacement. Fields no node has
+    written are left out of the final state returned by MasterAgent.process.
+    """
+    customer_id: Optional[str] = None
+    message: str = ""
+    documents: List[Dict[str, Any]] = field(default_factory=list)
+    customer_data: Dict[str, Any] = field(default_factory=dict)
+    status: str = "processing"
+    history: Annotated[List[HistoryEntry], operator.add] = field(default_factory=list)
+    sales_result: Optional[Dict[str, Any]] = None
+    fast_path: bool = False  # answered from the decision cache
+    is_emergency: bool = False
+    preliminary_risk_score: Optional[float] = None
+    credit_score: Optional[Dict[str, Any]] = None
+    offer_mart_data: Optional[Dict[str, Any]] = None
+    verification_result: Optional[Dict[str, Any]] = None
+    underwriting_result: Optional[Dict[str, Any]] = None
+    final_decision: Optional[str] = None
+    sanction_result: Optional[Dict[str, Any]] = None
+    feedback_data: Optional[Dict[str, Any]] = None
+
+def is_emergency_message(message: str) -> bool:
+    """Whether a customer message asks for emergency handling"""
+    message = (message or "").lower()
+    return any(keyword in message for keyword in EMERGENCY_KEYWORDS)
 
 class MasterAgent(BaseAgent):
     """Master Agent that orchestrates all worker agents"""
     
-    def __init__(self):
+    def __init__(self, application_index=None, ip_reputation=None, otp_service=None, feedback_store=None,
+                 decision_cache=None):
         super().__init__(
             agent_name="MasterAgent",
             system_prompt="""You are the Master Agent orchestrating a loan processing workflow.
@@ -18,29 +57,75 @@ class MasterAgent(BaseAgent):
             Make intelligent routing decisions based on customer context and risk levels."""
         )
         
-        # Initialize worker agents
-        self.sales_agent = SalesAgent()
-        self.verification_agent = VerificationAgent()
-        self.underwriting_agent = UnderwritingAgent()
-        self.sanction_agent = SanctionLetterAgent()
-        
-        # Build the workflow graph
-        self.workflow = self._build_workflow()
+        # Worker agents and the workflow graph are built on first use
+        self._verification_deps = (application_index, ip_reputation, otp_service)
+        self.feedback_store = feedback_store
+        self.decision_cache = decision_cache  # services.decision_cache.DecisionCache, enables the fast path
+        self._components: Dict[str, Any] = {}
+        self._components_lock = threading.RLock()
+    
+    def _component(self, name: str, factory) -> Any:
+        """Build a worker agent (or the workflow) once, even under concurrent first use"""
+        component = self._components.get(name)
+        if component is None:
+            with self._components_lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = self._components[name] = factory()
+        return component
+    
+    @property
+    def sales_agent(self):
+        from .sales_agent import SalesAgent
+        return self._component("sales_agent", SalesAgent)
+    
+    @property
+    def verification_agent(self):
+        from .verification_agent import VerificationAgent
+        return self._component("verification_agent", lambda: VerificationAgent(*self._verification_deps))
+    
+    @property
+    def underwriting_agent(self):
+        from .underwriting_agent import UnderwritingAgent
+        return self._component("underwriting_agent", UnderwritingAgent)
     
-    def _build_workflow(self) -> StateGraph:
+    @property
+    def sanction_agent(self):
+        from .sanction_agent import SanctionLetterAgent
+        return self._component("sanction_agent", SanctionLetterAgent)
+    
+    @property
+    def workflow(self):
+        """Compiled LangGraph workflow"""
+        return self._component("workflow", self._build_workflow)
+    
+    def warm_up(self) -> Dict[str, float]:
+        """Build the workflow and every worker agent now; returns seconds per component"""
+        timings = {}
+        for name in ["workflow", "sales_agent", "verification_agent", "underwriting_agent", "sanction_agent"]:
+            start = time.perf_counter()
+            getattr(self, name)
+            timings[name] = round(time.perf_counter() - start, 3)
+        return timings
+    
+    def _build_workflow(self):
         """Build the LangGraph workflow"""
-        workflow = StateGraph(dict)
-        
-        # Define nodes
-        workflow.add_node("entry", self._entry_point)
-        workflow.add_node("sales", self._sales_processing)
-        workflow.add_node("emergency_check", self._emergency_check)
-        workflow.add_node("parallel_verification", self._parallel_verification)
-        workflow.add_node("risk_assessment", self._risk_assessment)
-        workflow.add_node("underwriting", self._underwriting_processing)
-        workflow.add_node("decision", self._final_decision)
-        workflow.add_node("sanction", self._sanction_processing)
-        workflow.add_node("feedback", self._feedback_learning)
+        from langgraph.graph import StateGraph, END
+        
+        workflow = StateGraph(WorkflowState)
+        
+        # Define nodes (wrapped so request profiles attribute samples to the running node)
+        workflow.add_node("entry", self._node("entry", self._entry_point))
+        workflow.add_node("sales", self._node("sales", self._sales_processing))
+        workflow.add_node("emergency_check", self._node("emergency_check", self._emergency_check))
+        if self.decision_cache is not None:
+            workflow.add_node("fast_path", self._node("fast_path", self._fast_path))
+        workflow.add_node("parallel_verification", self._node("parallel_verification", self._parallel_verification))
+        workflow.add_node("risk_assessment", self._node("risk_assessment", self._risk_assessment))
+        workflow.add_node("underwriting", self._node("underwriting", self._underwriting_processing))
+        workflow.add_node("decision", self._node("decision", self._final_decision))
+        workflow.add_node("sanction", self._node("sanction", self._sanction_processing))
+        workflow.add_node("feedback", self._node("feedback", self._feedback_learning))
         
         # Define edges
         workflow.set_entry_point("entry")
@@ -49,11 +134,18 @@ class MasterAgent(BaseAgent):
             "sales",
             self._route_after_sales,
             {
-                "interested": "emergency_check",
+                "interested": "fast_path" if self.decision_cache is not None else "emergency_check",
                 "not_interested": END,
-                "objection": "sales"
+                "objection": END  # reply with the objection response and wait for the next message
             }
         )
+        if self.decision_cache is not None:
+            # Returning customers whose cached inputs are unchanged skip verification and underwriting
+            workflow.add_conditional_edges(
+                "fast_path",
+                self._route_fast_path,
+                {"hit": END, "miss": "emergency_check"}
+            )
         workflow.add_conditional_edges(
             "emergency_check",
             self._route_emergency,
@@ -71,7 +163,7 @@ class MasterAgent(BaseAgent):
             {
                 "approve": "sanction",
                 "counter_offer": "sanction",
-                "reject": END
+                "reject": "feedback"
             }
         )
         workflow.add_edge("sanction", "feedback")
@@ -79,39 +171,81 @@ class MasterAgent(BaseAgent):
         
         return workflow.compile()
     
-    async def process(self, context: Dict[str, Any]) -> Dict[str, Any]:
-        """Process customer request through the workflow"""
+    @staticmethod
+    def _node(name: str, handler):
+        """Workflow node that marks itself as running for the request profiler"""
+        async def run(state: WorkflowState) -> Dict[str, Any]:
+            mark_node(name)
+            return await handler(state)
+        return run
+    
+    async def process(self, context: Dict[str, Any],
+                      on_progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                      on_token: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        """Process customer request through the workflow.
+
+        Returns the final state as a dict. on_progress, if given, is called with
+        (node, state dict) as each workflow node finishes; on_token with
+        (agent_name, token) as LLM responses stream.
+        """
+        sink = token_sink.set(on_token)
+        try:
+            return await self._run(context, on_progress)
+        finally:
+            token_sink.reset(sink)
+    
+    async def _run(self, context: Dict[str, Any],
+                   on_progress: Optional[Callable[[str, Dict[str, Any]], None]]) -> Dict[str, Any]:
         initial_state = {
             "customer_id": context.get("customer_id"),
             "message": context.get("message", ""),
             "documents": context.get("documents", []),
             "customer_data": context.get("customer_data", {}),
-            "status": "processing",
-            "history": []
+            "status": "processing"
         }
         
-        result = await self.workflow.ainvoke(initial_state)
+        if on_progress is None:
+            return await self.workflow.ainvoke(initial_state)
+        
+        # Nodes return only their changes; each step's updates are followed by the
+        # merged state, which is what progress callbacks are given
+        result = initial_state
+        finished: List[str] = []
+        async for mode, chunk in self.workflow.astream(initial_state, stream_mode=["updates", "values"]):
+            if mode == "updates":
+                finished.extend(chunk)
+                continue
+            result = chunk
+            for node in finished:
+                try:
+                    on_progress(node, result)
+                except Exception as e:
+                    print(f"Progress callback failed for {node}: {str(e)}")
+            finished.clear()
         return result
     
-    async def _entry_point(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _entry_point(self, state: WorkflowState) -> Dict[str, Any]:
         """Entry point for customer requests"""
-        state["history"].append({"step": "entry", "action": "Customer entry received"})
-        return state
+        return {"history": [("entry", None)]}
     
-    async def _sales_processing(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _sales_processing(self, state: WorkflowState) -> Dict[str, Any]:
         """Process through Sales Agent"""
         sales_result = await self.sales_agent.process({
-            "message": state.get("message", ""),
-            "customer_data": state.get("customer_data", {})
+            "message": state.message,
+            "customer_data": state.customer_data
         })
         
-        state["sales_result"] = sales_result
-        state["history"].append({"step": "sales", "result": sales_result})
-        return state
+        # Details extracted from the message are kept once, in customer_data
+        customer_data = sales_result.pop("customer_data", state.customer_data)
+        return {
+            "sales_result": sales_result,
+            "customer_data": customer_data,
+            "history": [("sales", "sales_result")]
+        }
     
-    def _route_after_sales(self, state: Dict[str, Any]) -> str:
+    def _route_after_sales(self, state: WorkflowState) -> str:
         """Route after sales processing"""
-        sales_result = state.get("sales_result", {})
+        sales_result = state.sales_result or {}
         if sales_result.get("objection_detected"):
             return "objection"
         elif sales_result.get("interested"):
@@ -119,51 +253,97 @@ class MasterAgent(BaseAgent):
         else:
             return "not_interested"
     
-    async def _emergency_check(self, state: Dict[str, Any]) -> Dict[str, Any]:
-        """Check for emergency cases"""
-        message = state.get("message", "").lower()
-        emergency_keywords = ["urgent", "emergency", "immediate", "asap", "critical"]
-        is_emergency = any(keyword in message for keyword in emergency_keywords)
+    async def _fast_path(self, state: WorkflowState) -> Dict[str, Any]:
+        """Reuse the cached decision for a returning customer whose inputs have not changed.
+
+        The fraud check is re-run first (it is an index lookup), since applications
+        made since the decision was cached can link this customer to others. A hit
+        is a new decision with its own decision_id and feedback row; the sanction
+        letter already delivered is referenced, not reported as delivered again.
+        """
+        try:
+            fraud_check = await self.verification_agent.detect_fraud(
+                state.customer_data, state.documents, state.customer_id
+            )
+            outcome = self.decision_cache.lookup(state.customer_id, state.customer_data, state.documents,
+                                                 fraud_check=fraud_check)
+        except Exception as e:
+            print(f"Fast path lookup failed: {str(e)}")
+            outcome = None
+        if outcome is None:
+            return {}
         
-        state["is_emergency"] = is_emergency
-        state["history"].append({"step": "emergency_check", "is_emergency": is_emergency})
-        return state
+        cached_decision_id = (outcome.get("feedback_data") or {}).get("decision_id")
+        feedback_data = {
+            **(outcome.get("feedback_data") or {}),
+            "decision_id": uuid.uuid4().hex,
+            "fast_path": True,
+            "cached_decision_id": cached_decision_id
+        }
+        sanction_result = outcome.get("sanction_result")
+        if sanction_result and sanction_result.get("status") == "delivered":
+            outcome["sanction_result"] = {**sanction_result, "status": "previously_delivered",
+                                          "decision_id": cached_decision_id}
+        self._record_feedback(feedback_data, state.customer_id, state.customer_data,
+                              outcome.get("underwriting_result"), fast_path=True)
+        return {
+            **outcome,
+            "feedback_data": feedback_data,
+            "fast_path": True,
+            "history": [("fast_path", "underwriting_result")]
+        }
     
-    def _route_emergency(self, state: Dict[str, Any]) -> str:
+    def _route_fast_path(self, state: WorkflowState) -> str:
+        """Route after the fast-path lookup"""
+        return "hit" if state.fast_path else "miss"
+    
+    async def _emergency_check(self, state: WorkflowState) -> Dict[str, Any]:
+        """Check for emergency cases"""
+        is_emergency = is_emergency_message(state.message)
+        return {"is_emergency": is_emergency, "history": [("emergency_check", "is_emergency")]}
+    
+    def _route_emergency(self, state: WorkflowState) -> str:
         """Route based on emergency status"""
-        return "emergency" if state.get("is_emergency") else "normal"
+        return "emergency" if state.is_emergency else "normal"
     
-    async def _risk_assessment(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _risk_assessment(self, state: WorkflowState) -> Dict[str, Any]:
         """Preliminary risk assessment"""
         # This would integrate with credit bureau for initial scoring
-        state["preliminary_risk_score"] = 0.6  # Placeholder
-        state["history"].append({"step": "risk_assessment", "score": state["preliminary_risk_score"]})
-        return state
+        return {
+            "preliminary_risk_score": 0.6,  # Placeholder
+            "history": [("risk_assessment", "preliminary_risk_score")]
+        }
     
-    async def _parallel_verification(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _parallel_verification(self, state: WorkflowState) -> Dict[str, Any]:
         """Execute parallel verification processes"""
-        customer_data = state.get("customer_data", {})
-        documents = state.get("documents", [])
+        customer_data = state.customer_data
         
         # Parallel execution
         tasks = [
             self._get_credit_score(customer_data),
             self._get_offer_mart_data(customer_data),
             self.verification_agent.process({
-                "documents": documents,
+                "customer_id": state.customer_id,
+                "documents": state.documents,
                 "customer_data": customer_data,
-                "risk_level": state.get("risk_level", "medium")
+                "risk_level": "medium"
             })
         ]
         
         credit_score, offer_mart, verification = await asyncio.gather(*tasks)
         
-        state["credit_score"] = credit_score
-        state["offer_mart_data"] = offer_mart
-        state["verification_result"] = verification
-        state["history"].append({"step": "parallel_verification", "completed": True})
+        if self.decision_cache is not None:
+            try:
+                self.decision_cache.record_inputs(state.customer_id, verification, credit_score, offer_mart)
+            except Exception as e:
+                print(f"Error caching verification inputs: {str(e)}")
         
-        return state
+        return {
+            "credit_score": credit_score,
+            "offer_mart_data": offer_mart,
+            "verification_result": verification,
+            "history": [("parallel_verification", "verification_result")]
+        }
     
     async def _get_credit_score(self, customer_data: Dict[str, Any]) -> Dict[str, Any]:
         """Get credit score from Credit Bureau API"""
@@ -175,59 +355,94 @@ class MasterAgent(BaseAgent):
         # Placeholder - would integrate with actual API
         return {"pre_approval_limit": 500000, "eligibility": True}
     
-    async def _underwriting_processing(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _underwriting_processing(self, state: WorkflowState) -> Dict[str, Any]:
         """Process through Underwriting Agent"""
         underwriting_result = await self.underwriting_agent.process({
-            "credit_score": state.get("credit_score", {}),
-            "offer_mart_data": state.get("offer_mart_data", {}),
-            "verification_result": state.get("verification_result", {}),
-            "customer_data": state.get("customer_data", {})
+            "customer_id": state.customer_id,
+            "credit_score": state.credit_score or {},
+            "offer_mart_data": state.offer_mart_data or {},
+            "verification_result": state.verification_result or {},
+            "customer_data": state.customer_data
         })
         
-        state["underwriting_result"] = underwriting_result
-        state["history"].append({"step": "underwriting", "result": underwriting_result})
-        return state
+        return {"underwriting_result": underwriting_result, "history": [("underwriting", "underwriting_result")]}
     
-    def _route_decision(self, state: Dict[str, Any]) -> str:
+    def _route_decision(self, state: WorkflowState) -> str:
         """Route based on underwriting decision"""
-        decision = state.get("underwriting_result", {}).get("decision", "reject")
-        return decision
+        return state.final_decision or "reject"
     
-    async def _final_decision(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _final_decision(self, state: WorkflowState) -> Dict[str, Any]:
         """Final decision processing"""
-        underwriting = state.get("underwriting_result", {})
-        state["final_decision"] = underwriting.get("decision", "reject")
-        state["decision_details"] = underwriting
-        state["history"].append({"step": "decision", "decision": state["final_decision"]})
-        return state
+        return {
+            "final_decision": (state.underwriting_result or {}).get("decision", "reject"),
+            "history": [("decision", "final_decision")]
+        }
     
-    async def _sanction_processing(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _sanction_processing(self, state: WorkflowState) -> Dict[str, Any]:
         """Generate and deliver sanction letter"""
-        if state.get("final_decision") in ["approve", "counter_offer"]:
-            sanction_result = await self.sanction_agent.process({
-                "customer_data": state.get("customer_data", {}),
-                "loan_details": state.get("underwriting_result", {}),
-                "decision": state.get("final_decision")
-            })
-            
-            state["sanction_result"] = sanction_result
-            state["status"] = "approved"
-            state["history"].append({"step": "sanction", "result": sanction_result})
+        if state.final_decision not in ["approve", "counter_offer"]:
+            return {}
         
-        return state
+        sanction_result = await self.sanction_agent.process({
+            "customer_data": state.customer_data,
+            "loan_details": state.underwriting_result or {},
+            "decision": state.final_decision
+        })
+        
+        return {
+            "sanction_result": sanction_result,
+            "status": "approved",
+            "history": [("sanction", "sanction_result")]
+        }
     
-    async def _feedback_learning(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    async def _feedback_learning(self, state: WorkflowState) -> Dict[str, Any]:
         """Feedback learning engine"""
-        # Store case for learning
+        # Store case for learning; repayment outcomes are joined on decision_id later
         feedback_data = {
-            "customer_id": state.get("customer_id"),
-            "decision": state.get("final_decision"),
-            "verification_score": state.get("verification_result", {}).get("confidence_score", 0),
-            "risk_score": state.get("preliminary_risk_score", 0),
+            "decision_id": uuid.uuid4().hex,
+            "customer_id": state.customer_id,
+            "decision": state.final_decision,
+            "verification_score": (state.verification_result or {}).get("confidence_score", 0),
+            "risk_score": state.preliminary_risk_score or 0,
             "outcome": "pending"  # Would be updated based on actual loan performance
         }
         
-        state["feedback_data"] = feedback_data
-        state["history"].append({"step": "feedback", "data": feedback_data})
-        return state
-
+        self._record_feedback(feedback_data, state.customer_id, state.customer_data, state.underwriting_result)
+        
+        if self.decision_cache is not None:
+            try:
+                self.decision_cache.record_decision(state.customer_id, state.customer_data, state.documents, {
+                    "final_decision": state.final_decision,
+                    "underwriting_result": state.underwriting_result,
+                    "sanction_result": state.sanction_result,
+                    "feedback_data": feedback_data,
+                    "status": state.status
+                })
+            except Exception as e:
+                print(f"Error caching decision: {str(e)}")
+        
+        return {"feedback_data": feedback_data, "history": [("feedback", "feedback_data")]}
+    
+    def _record_feedback(self, feedback_data: Dict[str, Any], customer_id: Optional[str],
+                         customer_data: Dict[str, Any], underwriting: Optional[Dict[str, Any]],
+                         fast_path: bool = False):
+        """Append a decision to the feedback store, where repayment outcomes are joined on decision_id"""
+        if self.feedback_store is None:
+            return
+        from services.risk_model import profile_inputs
+        underwriting = underwriting or {}
+        try:
+            self.feedback_store.append({
+                "decision_id": feedback_data["decision_id"],
+                "customer_id": str(customer_id or ""),
+                "decided_at": datetime.now(),
+                "decision": feedback_data["decision"],
+                "fast_path": fast_path,
+                **{key: underwriting.get(key) for key in [
+                    "product", "policy_version", "credit_score", "verification_confidence", "risk_score",
+                    "profile_risk", "risk_model_version", "pre_approval_limit", "loan_amount",
+                    "interest_rate", "tenure_months"]},
+                **profile_inputs(customer_data)
+            })
+        except Exception as e:
+            print(f"Error recording feedback: {str(e)}")
@@ -0,0 +1,183 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import deque
+from config import Config
+import os
+import threading
+import time
+
+# USD per 1K tokens (input, output); used for cost estimates only
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+# Which tier serves each call site: "large", "small" or "local"
+DEFAULT_ROUTES = {
+    "default": "large",
+    "objection_handling": "small",
+    "intent_classification": "local",
+    "intent_escalation": "large",
+}
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+class RouteStats:
+    """Counters and recent latencies for one route"""
+
+    def __init__(self):
+        self.calls = 0
+        self.escalations = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.latencies = deque(maxlen=2048)
+        self.models: Dict[str, int] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        samples = sorted(self.latencies)
+        pct = lambda p: round(samples[min(int(len(samples) * p), len(samples) - 1)] * 1000, 2) if samples else None
+        return {
+            "calls": self.calls,
+            "models": dict(self.models),
+            "escalations": self.escalations,
+            "escalation_rate": round(self.escalations / self.calls, 4) if self.calls else 0.0,
+            "errors": self.errors,
+            "latency_ms": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99)},
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6)
+        }
+
+class ModelRouter:
+    """Picks a model per call site and records latency, cost and escalations per route.
+
+    Tiers map to LLM_MODEL_LARGE / LLM_MODEL_SMALL, or "local" for the
+    in-process intent classifier. Routes can be overridden with LLM_ROUTES,
+    e.g. "objection_handling:large,default:small".
+    """
+
+    def __init__(self, routes: Optional[Dict[str, str]] = None):
+        self.routes = dict(DEFAULT_ROUTES)
+        self.routes.update(routes if routes is not None else self._configured_routes())
+        self._models: Dict[str, Any] = {}
+        self._classifier = None
+        self._classifier_loaded = False
+        self._lock = threading.Lock()
+        self._stats: Dict[str, RouteStats] = {}
+
+    @staticmethod
+    def _configured_routes() -> Dict[str, str]:
+        routes = {}
+        for entry in Config.LLM_ROUTES.split(","):
+            task, _, tier = entry.strip().partition(":")
+            if task and tier:
+                routes[task] = tier
+        return routes
+
+    def tier_for(self, task: str) -> str:
+        return self.routes.get(task, self.routes["default"])
+
+    def model_name(self, task: str) -> str:
+        tier = self.tier_for(task)
+        if tier == "local":
+            return "local"
+        if Config.LLM_PROVIDER == "stub":
+            return "stub"
+        return Config.LLM_MODEL_SMALL if tier == "small" else Config.LLM_MODEL_LARGE
+
+    def chat_model(self, task: str = "default"):
+        """Chat model serving a task, or None if no LLM is configured"""
+        name = self.model_name(task)
+        if name == "local":
+            return None
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    model = self._models[name] = self._create_model(name)
+        return model or None
+
+    def _create_model(self, name: str):
+        if name == "stub":
+            from .stub_llm import StubChatModel
+            return StubChatModel(token_delay=Config.LLM_STUB_TOKEN_DELAY)
+        api_key = os.getenv('OPENAI_API_KEY', '')
+        if not api_key:
+            return False  # cached "not configured"
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model=name, temperature=0.3, openai_api_key=api_key)
+
+    @property
+    def intent_classifier(self):
+        """Local intent model from INTENT_MODEL_PATH, or None until one has been trained"""
+        if not self._classifier_loaded:
+            with self._lock:
+                if not self._classifier_loaded:
+                    if os.path.exists(Config.INTENT_MODEL_PATH):
+                        from services.intent_classifier import IntentClassifier
+                        self._classifier = IntentClassifier.load(Config.INTENT_MODEL_PATH)
+                    self._classifier_loaded = True
+        return self._classifier
+
+    @intent_classifier.setter
+    def intent_classifier(self, classifier):
+        self._classifier = classifier
+        self._classifier_loaded = True
+
+    def _route_stats(self, task: str) -> RouteStats:
+        stats = self._stats.get(task)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(task, RouteStats())
+        return stats
+
+    def record(self, task: str, model: str, seconds: float, input_tokens: int = 0,
+               output_tokens: int = 0, error: bool = False):
+        stats = self._route_stats(task)
+        prices = MODEL_PRICES.get(model, (0.0, 0.0))
+        with self._lock:
+            stats.calls += 1
+            stats.errors += error
+            stats.models[model] = stats.models.get(model, 0) + 1
+            stats.latencies.append(seconds)
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost += input_tokens / 1000 * prices[0] + output_tokens / 1000 * prices[1]
+
+    def record_escalation(self, task: str):
+        stats = self._route_stats(task)
+        with self._lock:
+            stats.escalations += 1
+
+    def classify_intent(self, message: str) -> Optional[Tuple[str, float]]:
+        """(label, confidence) from the local classifier, or None if none is trained"""
+        classifier = self.intent_classifier
+        if classifier is None:
+            return None
+        start = time.perf_counter()
+        prediction = classifier.predict(message)
+        self.record("intent_classification", "local", time.perf_counter() - start)
+        return prediction
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "routes": {task: {"tier": self.tier_for(task), "model": self.model_name(task)} for task in self.routes},
+            "stats": {task: stats.summary() for task, stats in self._stats.items()}
+        }
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+def get_model_router() -> ModelRouter:
+    """Process-wide router shared by all agents"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
@@ -1,7 +1,11 @@
 from typing import Dict, Any
 from .base_agent import BaseAgent
+from .model_router import get_model_router
+from config import Config
 import re
 
+INTENT_TYPES = ["application", "inquiry", "general"]
+
 class SalesAgent(BaseAgent):
     """Sales Agent handles customer interactions, objection handling, and intent detection"""
     
@@ -29,18 +33,18 @@ class SalesAgent(BaseAgent):
         customer_data = context.get("customer_data", {})
         
         # Detect intent and interest
-        intent_analysis = self._detect_intent(message)
+        intent_analysis = await self._detect_intent(message)
         
         # Check for objections
         objection_detected = self._detect_objections(message)
         objection_response = None
         
         if objection_detected:
-            objection_response = self._handle_objection(message)
+            objection_response = await self._handle_objection(message)
         
-        # Extract customer information
+        # Extract customer information (into a copy; the caller's customer_data is left as is)
         extracted_info = self._extract_customer_info(message)
-        customer_data.update(extracted_info)
+        customer_data = {**customer_data, **extracted_info}
         
         # Detect urgency
         urgency_level = self._detect_urgency(message)
@@ -61,31 +65,62 @@ class SalesAgent(BaseAgent):
         self.log_action("Sales Processing", result)
         return result
     
-    def _detect_intent(self, message: str) -> Dict[str, Any]:
-        """Detect customer intent using NLP"""
-        loan_keywords = ["loan", "credit", "borrow", "finance", "emi", "interest rate"]
+    @staticmethod
+    def _keyword_intent_type(message: str) -> str:
+        """Intent type from keyword rules (the fallback when no local classifier is trained)"""
         inquiry_keywords = ["information", "details", "how", "what", "tell me"]
         application_keywords = ["apply", "application", "need", "want", "require"]
         
-        has_loan_intent = any(keyword in message for keyword in loan_keywords)
         is_inquiry = any(keyword in message for keyword in inquiry_keywords)
         is_application = any(keyword in message for keyword in application_keywords)
+        return "application" if is_application else ("inquiry" if is_inquiry else "general")
+    
+    async def _detect_intent(self, message: str) -> Dict[str, Any]:
+        """Detect customer intent using NLP"""
+        loan_keywords = ["loan", "credit", "borrow", "finance", "emi", "interest rate"]
+        
+        has_loan_intent = any(keyword in message for keyword in loan_keywords)
+        intent_type, source = await self._classify_intent_type(message, self._keyword_intent_type(message))
         
         # Calculate interest score
         interest_score = 0.0
-        if is_application:
+        if intent_type == "application":
             interest_score = 0.9
-        elif has_loan_intent and not is_inquiry:
+        elif has_loan_intent and intent_type != "inquiry":
             interest_score = 0.7
         elif has_loan_intent:
             interest_score = 0.5
         
         return {
-            "type": "application" if is_application else ("inquiry" if is_inquiry else "general"),
+            "type": intent_type,
             "interest_score": interest_score,
-            "has_loan_intent": has_loan_intent
+            "has_loan_intent": has_loan_intent,
+            "source": source
         }
     
+    async def _classify_intent_type(self, message: str, keyword_type: str):
+        """Local classifier first; only low-confidence predictions go to the large model"""
+        router = get_model_router()
+        prediction = router.classify_intent(message)
+        if prediction is None:
+            return keyword_type, "keywords"
+        
+        label, confidence = prediction
+        if confidence >= Config.INTENT_CONFIDENCE_THRESHOLD or router.chat_model("intent_escalation") is None:
+            return label, "local"
+        
+        router.record_escalation("intent_classification")
+        answer = (await self._generate(
+            f"""Classify this customer message as exactly one of: {", ".join(INTENT_TYPES)}.
+            application = wants to apply for or take a loan; inquiry = asking for information;
+            general = anything else. Reply with the single word only.
+            
+            Customer message: {message}""",
+            task="intent_escalation",
+            stream=False
+        )).strip().lower().strip(".")
+        return (answer, "escalated") if answer in INTENT_TYPES else (label, "local")
+    
     def _detect_objections(self, message: str) -> bool:
         """Detect customer objections or concerns"""
         objection_keywords = [
@@ -101,7 +136,7 @@ class SalesAgent(BaseAgent):
         
         return has_objection_keywords or has_negative_words
     
-    def _handle_objection(self, message: str) -> str:
+    async def _handle_objection(self, message: str) -> str:
         """Generate response to handle objections"""
         # Use LLM to generate personalized objection handling response
         prompt = f"""Customer message: {message}
@@ -110,7 +145,8 @@ class SalesAgent(BaseAgent):
         and highlights the benefits of our loan process (fast approval, transparent process,
         competitive rates, easy application). Keep it concise and friendly."""
         
-        response = self._call_llm(prompt)
+        # Streams to the customer as it is generated when a token sink is active
+        response = await self._generate(prompt, task="objection_handling")
         return response
     
     def _extract_customer_info(self, message: str) -> Dict[str, Any]:
@@ -1,10 +1,5 @@
 from typing import Dict, Any
 from .base_agent import BaseAgent
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
 from datetime import datetime
 import io
 import os
@@ -62,6 +57,12 @@ class SanctionLetterAgent(BaseAgent):
     async def _generate_pdf(self, customer_data: Dict[str, Any], 
                            loan_details: Dict[str, Any], decision: str) -> str:
         """Generate PDF sanction letter"""
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.lib.units import inch
+        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+        from reportlab.lib import colors
+
         # Create PDF buffer
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch)
@@ -163,11 +164,9 @@ class SanctionLetterAgent(BaseAgent):
         elements.append(Spacer(1, 0.3*inch))
         
         # Closing
-        closing_text = """
-        <para>We look forward to serving you and hope this loan helps you achieve your financial goals.</para>
-        <para>Thank you for choosing our services.</para>
-        """
-        elements.append(Paragraph(closing_text, styles['Normal']))
+        # One <para> per Paragraph: reportlab's parser fails on several in one
+        elements.append(Paragraph("We look forward to serving you and hope this loan helps you achieve your financial goals.", styles['Normal']))
+        elements.append(Paragraph("Thank you for choosing our services.", styles['Normal']))
         elements.append(Spacer(1, 0.3*inch))
         
         # Signature
@@ -0,0 +1,43 @@
+from typing import Any, List
+import asyncio
+import re
+import time
+
+class StubMessage:
+    """Minimal stand-in for a langchain message/chunk: only .content is used"""
+
+    def __init__(self, content: str):
+        self.content = content
+
+class StubChatModel:
+    """Offline chat model for tests and local runs (LLM_PROVIDER=stub).
+
+    Answers every prompt with a fixed, deterministic reply and streams it word
+    by word with an optional per-token delay, so streaming paths can be
+    exercised without an API key or network.
+    """
+
+    DEFAULT_REPLY = ("I understand your concern. Our loan process is fast and fully transparent: "
+                     "you get an instant eligibility check, competitive interest rates and no hidden "
+                     "charges, and most approvals are completed within minutes.")
+
+    def __init__(self, reply: str = None, token_delay: float = 0.0):
+        self.reply = reply or self.DEFAULT_REPLY
+        self.token_delay = token_delay
+
+    def _tokens(self) -> List[str]:
+        return re.findall(r"\S+\s*", self.reply)
+
+    def invoke(self, messages: Any) -> StubMessage:
+        time.sleep(self.token_delay * len(self._tokens()))
+        return StubMessage(self.reply)
+
+    async def ainvoke(self, messages: Any) -> StubMessage:
+        await asyncio.sleep(self.token_delay * len(self._tokens()))
+        return StubMessage(self.reply)
+
+    async def astream(self, messages: Any):
+        for token in self._tokens():
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+            yield StubMessage(token)
@@ -1,7 +1,9 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from .base_agent import BaseAgent
 from config import Config
-import numpy as np
+from services.underwriting_policy import get_policy_store
+from services.model_registry import get_model_registry
+from services.customer_snapshot import get_customer_snapshots
 
 class UnderwritingAgent(BaseAgent):
     """Underwriting Agent evaluates creditworthiness and risk assessment"""
@@ -26,16 +28,32 @@ class UnderwritingAgent(BaseAgent):
         verification_result = context.get("verification_result", {})
         customer_data = context.get("customer_data", {})
         
+        # Prior applications and decisions from the local snapshot (no database round trip).
+        # Only a customer_id match feeds the decision: the PAN is unverified input and a PAN
+        # match may be another customer's history, so it is only reported
+        history = get_customer_snapshots().lookup(
+            context.get("customer_id") or customer_data.get("customer_id"),
+            customer_data.get("pan_number")
+        )
+        pan_history = None
+        if history and history["matched_on"] != "customer_id":
+            pan_history = {"applications": history["applications"], "last_applied_at": history["last_applied_at"]}
+            history = None
+        
         # Extract key metrics
         credit_score = credit_score_data.get("score", 0)
         pre_approval_limit = offer_mart_data.get("pre_approval_limit", 0)
         verification_confidence = verification_result.get("confidence_score", 0)
         
         # Calculate risk score
+        risk_models = get_model_registry()
+        model_risk = risk_models.score(customer_data)
+        profile_risk = round(model_risk, 4) if model_risk is not None else Config.DEFAULT_PROFILE_RISK
         risk_score = self._calculate_risk_score(
             credit_score,
             verification_confidence,
-            customer_data
+            customer_data,
+            profile_risk
         )
         
         # Determine risk level
@@ -44,10 +62,8 @@ class UnderwritingAgent(BaseAgent):
         # Check if salary slip is required
         requires_salary_slip = verification_confidence < Config.VERIFICATION_CONFIDENCE_HIGH
         
-        # If salary slip provided, check EMI eligibility
-        emi_check = None
-        if customer_data.get("salary_slip") and requires_salary_slip:
-            emi_check = await self._check_emi_eligibility(customer_data, pre_approval_limit)
+        # If salary slip provided, the decision checks EMI affordability on the product's terms
+        check_emi = bool(customer_data.get("salary_slip")) and requires_salary_slip
         
         # Make final decision
         decision_result = self._make_decision(
@@ -55,32 +71,40 @@ class UnderwritingAgent(BaseAgent):
             credit_score,
             pre_approval_limit,
             verification_confidence,
-            emi_check,
-            customer_data
+            check_emi,
+            customer_data,
+            history
         )
         
         result = {
             "risk_score": risk_score,
+            "profile_risk": profile_risk,
+            "risk_model_version": risk_models.current_version if model_risk is not None else None,
             "risk_level": risk_level,
             "credit_score": credit_score,
             "pre_approval_limit": pre_approval_limit,
             "verification_confidence": verification_confidence,
             "requires_salary_slip": requires_salary_slip,
-            "emi_check": emi_check,
+            "emi_check": decision_result.get("emi_check"),
             "decision": decision_result["decision"],
             "loan_amount": decision_result.get("loan_amount", 0),
             "interest_rate": decision_result.get("interest_rate", 0),
             "tenure_months": decision_result.get("tenure_months", 0),
             "emi_amount": decision_result.get("emi_amount", 0),
             "reason": decision_result.get("reason", ""),
-            "counter_offer": decision_result.get("counter_offer")
+            "counter_offer": decision_result.get("counter_offer"),
+            "product": decision_result.get("product"),
+            "policy_version": decision_result.get("policy_version"),
+            "policy_shadow": decision_result.get("policy_shadow"),
+            "customer_history": history,
+            "pan_history": pan_history
         }
         
         self.log_action("Underwriting Processing", result)
         return result
     
     def _calculate_risk_score(self, credit_score: int, verification_confidence: float, 
-                             customer_data: Dict[str, Any]) -> float:
+                             customer_data: Dict[str, Any], profile_risk: float = Config.DEFAULT_PROFILE_RISK) -> float:
         """Calculate comprehensive risk score"""
         # Normalize credit score (0-900 scale to 0-1)
         credit_score_norm = credit_score / 900.0
@@ -98,8 +122,7 @@ class UnderwritingAgent(BaseAgent):
         # Verification component (inverse - higher confidence = lower risk)
         verification_risk = 1.0 - verification_confidence
         
-        # Customer profile risk (placeholder - would analyze employment, income stability, etc.)
-        profile_risk = 0.3  # Default moderate risk
+        # Customer profile component: the risk model's default probability (moderate default until one is trained)
         
         # Calculate weighted risk score
         risk_score = (
@@ -119,9 +142,9 @@ class UnderwritingAgent(BaseAgent):
         else:
             return "high"
     
-    async def _check_emi_eligibility(self, customer_data: Dict[str, Any], 
-                                    requested_amount: float) -> Dict[str, Any]:
-        """Check EMI eligibility based on salary slip"""
+    def _applicant_salary(self, customer_data: Dict[str, Any],
+                          history: Optional[Dict[str, Any]] = None) -> float:
+        """Monthly salary from the salary slip, the application or the customer's previous applications"""
         salary = customer_data.get("salary", 0)
         salary_slip_data = customer_data.get("salary_slip_data", {})
         
@@ -129,21 +152,22 @@ class UnderwritingAgent(BaseAgent):
         if salary_slip_data.get("net_salary"):
             salary = salary_slip_data["net_salary"]
         
+        # Fall back to the salary seen on the customer's previous applications
+        if not salary and history and history.get("last_salary"):
+            salary = history["last_salary"]
+        
+        return float(salary or 0)
+    
+    def _check_emi_eligibility(self, salary: float, amount: float,
+                               interest_rate: float, tenure_months: int) -> Dict[str, Any]:
+        """Check that the EMI for the amount on offer, at the product's terms, fits the salary"""
         if salary == 0:
             return {
                 "eligible": False,
                 "reason": "Salary information not available"
             }
         
-        # Calculate EMI for requested amount (simplified calculation)
-        interest_rate = 0.12  # 12% annual
-        tenure_years = 5
-        tenure_months = tenure_years * 12
-        
-        # EMI formula: P * r * (1+r)^n / ((1+r)^n - 1)
-        monthly_rate = interest_rate / 12
-        emi = requested_amount * monthly_rate * ((1 + monthly_rate) ** tenure_months) / \
-              (((1 + monthly_rate) ** tenure_months) - 1)
+        emi = self._calculate_emi(amount, interest_rate, tenure_months)
         
         # Check if EMI is less than 50% of salary
         emi_ratio = emi / salary
@@ -152,102 +176,114 @@ class UnderwritingAgent(BaseAgent):
         return {
             "eligible": eligible,
             "salary": salary,
-            "requested_amount": requested_amount,
-            "emi": round(emi, 2),
+            "requested_amount": amount,
+            "interest_rate": interest_rate,
+            "tenure_months": tenure_months,
+            "emi": emi,
             "emi_ratio": round(emi_ratio, 3),
             "threshold": Config.EMI_SALARY_RATIO_THRESHOLD,
             "reason": "EMI within acceptable range" if eligible else "EMI exceeds 50% of salary"
         }
     
     def _make_decision(self, risk_score: float, credit_score: int, pre_approval_limit: float,
-                      verification_confidence: float, emi_check: Dict[str, Any],
-                      customer_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Make final underwriting decision"""
+                      verification_confidence: float, check_emi: bool,
+                      customer_data: Dict[str, Any], history: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Make final underwriting decision under the loan product's policy"""
         requested_amount = float(customer_data.get("requested_amount", 0) or pre_approval_limit)
+        salary = self._applicant_salary(customer_data, history) if check_emi else float(customer_data.get("salary") or 0)
         
-        # Decision logic
-        if risk_score > 0.7:  # High risk
-            return {
-                "decision": "reject",
-                "reason": "High risk profile based on credit score and verification",
-                "loan_amount": 0
-            }
+        # Reject rules and pricing come from the product's policy (policies/underwriting.json)
+        policy = get_policy_store().evaluate(
+            customer_data.get("loan_type"),
+            {
+                "risk_score": risk_score,
+                "credit_score": credit_score,
+                "verification_confidence": verification_confidence,
+                "requested_amount": requested_amount,
+                "pre_approval_limit": pre_approval_limit,
+                "salary": salary,
+                "prior_applications": (history or {}).get("applications", 0),
+                "prior_approvals": (history or {}).get("approvals", 0) + (history or {}).get("counter_offers", 0),
+                "prior_rejections": (history or {}).get("rejections", 0)
+            },
+            unit_id=customer_data.get("customer_id") or customer_data.get("phone")
+        )
+        audit = {
+            "product": policy["product"],
+            "policy_version": policy["policy_version"],
+            "policy_shadow": policy.get("shadow")
+        }
         
-        elif verification_confidence < Config.VERIFICATION_CONFIDENCE_LOW:
+        if policy["decision"] == "reject":
             return {
                 "decision": "reject",
-                "reason": "Verification confidence too low",
-                "loan_amount": 0
+                "reason": policy["reason"],
+                "loan_amount": 0,
+                **audit
             }
         
-        elif credit_score < 600:  # Low credit score
-            return {
-                "decision": "reject",
-                "reason": "Credit score below minimum threshold",
-                "loan_amount": 0
-            }
+        # Cap loan amount at pre-approval limit and the product maximum
+        approved_amount = min(requested_amount, pre_approval_limit)
+        if policy["max_amount"]:
+            approved_amount = min(approved_amount, policy["max_amount"])
         
-        # Check EMI eligibility if salary slip was required
-        if emi_check:
+        interest_rate = policy["interest_rate"]
+        tenure_months = policy["tenure_months"]
+        
+        # Check EMI eligibility if salary slip was required, on the terms the loan would be approved at
+        if check_emi:
+            emi_check = self._check_emi_eligibility(salary, approved_amount, interest_rate, tenure_months)
+            audit["emi_check"] = emi_check
             if not emi_check.get("eligible"):
-                # Offer counter-offer with lower amount
-                eligible_amount = self._calculate_eligible_amount(
-                    emi_check.get("salary", 0),
-                    customer_data
+                # Offer counter-offer with lower amount, never above what could have been approved
+                interest_rate = policy["counter_offer_rate"]
+                tenure_months = policy["counter_offer_tenure_months"]
+                eligible_amount = min(
+                    self._calculate_eligible_amount(salary, customer_data, interest_rate, tenure_months),
+                    approved_amount
                 )
                 
                 if eligible_amount > 0:
                     return {
                         "decision": "counter_offer",
                         "loan_amount": eligible_amount,
-                        "interest_rate": 0.12,
-                        "tenure_months": 60,
-                        "emi_amount": self._calculate_emi(eligible_amount, 0.12, 60),
+                        "interest_rate": interest_rate,
+                        "tenure_months": tenure_months,
+                        "emi_amount": self._calculate_emi(eligible_amount, interest_rate, tenure_months),
                         "reason": f"Requested amount results in high EMI. Counter-offer: ₹{eligible_amount:,.0f}",
                         "counter_offer": {
                             "original_amount": requested_amount,
                             "offered_amount": eligible_amount,
                             "reason": "EMI affordability"
-                        }
+                        },
+                        **audit
                     }
                 else:
                     return {
                         "decision": "reject",
                         "reason": "Salary insufficient for loan eligibility",
-                        "loan_amount": 0
+                        "loan_amount": 0,
+                        **audit
                     }
         
         # Approval decision
-        # Cap loan amount at pre-approval limit
-        approved_amount = min(requested_amount, pre_approval_limit)
-        
-        # Determine interest rate based on risk
-        if risk_score <= 0.3:
-            interest_rate = 0.10  # 10% for low risk
-        elif risk_score <= 0.5:
-            interest_rate = 0.12  # 12% for medium risk
-        else:
-            interest_rate = 0.15  # 15% for higher risk
-        
-        tenure_months = 60  # 5 years default
-        
         return {
             "decision": "approve",
             "loan_amount": approved_amount,
             "interest_rate": interest_rate,
             "tenure_months": tenure_months,
             "emi_amount": self._calculate_emi(approved_amount, interest_rate, tenure_months),
-            "reason": "Approved based on credit score, verification, and eligibility"
+            "reason": "Approved based on credit score, verification, and eligibility",
+            **audit
         }
     
-    def _calculate_eligible_amount(self, salary: float, customer_data: Dict[str, Any]) -> float:
+    def _calculate_eligible_amount(self, salary: float, customer_data: Dict[str, Any],
+                                   interest_rate: float = 0.12, tenure_months: int = 60) -> float:
         """Calculate maximum eligible loan amount based on salary"""
         # Maximum EMI = 50% of salary
         max_emi = salary * Config.EMI_SALARY_RATIO_THRESHOLD
         
         # Calculate loan amount for given EMI (reverse EMI calculation)
-        interest_rate = 0.12
-        tenure_months = 60
         monthly_rate = interest_rate / 12
         
         # Reverse EMI formula
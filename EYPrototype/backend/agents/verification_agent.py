@@ -1,12 +1,19 @@
 from typing import Dict, Any, List
 from .base_agent import BaseAgent
 from config import Config
+from services.ocr import OcrService
+from services.face_match import FaceMatchService
+from services.fraud_index import DuplicateApplicationIndex
+from services.identifiers import extract_identifiers
+from services.ip_reputation import IpReputationService
+from services.otp import OtpService
 import asyncio
 
 class VerificationAgent(BaseAgent):
     """Verification Agent performs adaptive multi-layer eKYC verification"""
     
-    def __init__(self):
+    def __init__(self, application_index: DuplicateApplicationIndex = None,
+                 ip_reputation: IpReputationService = None, otp_service: OtpService = None):
         super().__init__(
             agent_name="VerificationAgent",
             system_prompt="""You are a Verification Agent responsible for multi-layer eKYC verification.
@@ -19,6 +26,12 @@ class VerificationAgent(BaseAgent):
             
             Determine verification confidence scores and flag suspicious activities."""
         )
+        
+        self.ocr_service = OcrService()
+        self.face_match_service = FaceMatchService()
+        self.application_index = application_index or DuplicateApplicationIndex()
+        self.ip_reputation = ip_reputation or IpReputationService()
+        self.otp_service = otp_service or OtpService()
     
     async def process(self, context: Dict[str, Any]) -> Dict[str, Any]:
         """Process verification with adaptive multi-layer KYC"""
@@ -39,7 +52,8 @@ class VerificationAgent(BaseAgent):
         
         # Step 2: OTP Validation
         if "otp" in verification_steps:
-            otp_result = await self._validate_otp(customer_data.get("otp_code"), customer_data.get("phone"))
+            otp_result = await self._validate_otp(customer_data.get("otp_code"), customer_data.get("phone"),
+                                                  context.get("customer_id") or customer_data.get("customer_id"))
             results["otp"] = otp_result
         
         # Step 3: Selfie Match
@@ -49,7 +63,9 @@ class VerificationAgent(BaseAgent):
         
         # Step 4: Fraud Check
         if "fraud_check" in verification_steps:
-            fraud_result = await self._fraud_detection(customer_data, documents)
+            fraud_result = await self.detect_fraud(
+                customer_data, documents, context.get("customer_id") or customer_data.get("customer_id")
+            )
             results["fraud_check"] = fraud_result
         
         # Step 5: IP and Liveliness Check
@@ -81,38 +97,22 @@ class VerificationAgent(BaseAgent):
             return ["ocr", "otp", "selfie", "fraud_check", "ip_liveliness"]
     
     async def _perform_ocr(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Perform OCR on uploaded documents using Google Vision API"""
-        # Placeholder - would integrate with Google Vision API
-        ocr_results = {}
-        
-        for doc in documents:
-            doc_type = doc.get("type", "unknown")
-            doc_url = doc.get("url", "")
-            
-            # Simulate OCR processing
-            ocr_results[doc_type] = {
-                "extracted_text": f"Extracted text from {doc_type}",
-                "fields": {
-                    "name": "John Doe",
-                    "dob": "1990-01-01",
-                    "address": "123 Main St",
-                    "id_number": "ABCD123456"
-                },
-                "confidence": 0.92
-            }
-        
-        return {
-            "status": "success",
-            "results": ocr_results,
-            "confidence": 0.92
-        }
+        """Perform OCR on uploaded documents using local Tesseract"""
+        # Pages run in parallel on a process pool, results are cached by content hash
+        return await self.ocr_service.extract(documents)
     
-    async def _validate_otp(self, otp_code: str, phone: str) -> Dict[str, Any]:
+    async def _validate_otp(self, otp_code: str, phone: str, customer_id: str = None) -> Dict[str, Any]:
         """Validate OTP sent to customer phone"""
-        # Placeholder - would integrate with Twilio or Firebase Auth
-        # In real implementation, verify OTP against stored value
+        # Codes may be submitted with the chat message or verified earlier via /api/otp/verify
+        # by the same customer; another customer's verification of this phone does not count
+        if otp_code:
+            otp_result = self.otp_service.verify(phone, otp_code, customer_id)
+        elif self.otp_service.is_verified(phone, customer_id):
+            otp_result = {"status": "verified"}
+        else:
+            otp_result = {"status": "failed", "reason": "OTP not provided"}
         
-        if otp_code and len(otp_code) == 6:
+        if otp_result["status"] == "verified":
             return {
                 "status": "verified",
                 "phone": phone,
@@ -122,38 +122,36 @@ class VerificationAgent(BaseAgent):
             return {
                 "status": "failed",
                 "phone": phone,
-                "confidence": 0.0
+                "confidence": 0.0,
+                "reason": otp_result.get("reason", otp_result["status"])
             }
     
     async def _match_selfie(self, documents: List[Dict[str, Any]], selfie_image: str) -> Dict[str, Any]:
-        """Match selfie with ID document photo using AWS Rekognition"""
-        # Placeholder - would integrate with AWS Rekognition
-        
-        # Find ID document (Aadhaar, PAN, etc.)
-        id_document = next((doc for doc in documents if doc.get("type") in ["aadhaar", "pan", "passport"]), None)
-        
-        if id_document and selfie_image:
-            # Simulate face matching
-            match_confidence = 0.88  # Would be actual Rekognition result
-            
-            return {
-                "status": "matched" if match_confidence > 0.80 else "not_matched",
-                "confidence": match_confidence,
-                "threshold": 0.80
-            }
-        else:
-            return {
-                "status": "failed",
-                "confidence": 0.0,
-                "reason": "Missing selfie or ID document"
-            }
+        """Match selfie with ID document photo using local face embeddings"""
+        # ID document embeddings are cached, so a selfie retry only embeds the selfie
+        return await self.face_match_service.match(documents, selfie_image)
     
-    async def _fraud_detection(self, customer_data: Dict[str, Any], documents: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Perform fraud detection checks"""
+    async def detect_fraud(self, customer_data: Dict[str, Any], documents: List[Dict[str, Any]],
+                           customer_id: str = None) -> Dict[str, Any]:
+        """Perform fraud detection checks (also run on its own before a fast-path decision)"""
         fraud_indicators = []
         fraud_score = 0.0
         
-        # Check for duplicate applications
+        # Check for duplicate applications and fraud rings (in-memory index, no DB scan);
+        # the customer's own earlier applications are not duplicates
+        shared = self.application_index.count_shared(extract_identifiers(customer_data, documents),
+                                                     customer_id=customer_id)
+        if shared["count"] > 0:
+            kinds = ", ".join(sorted(shared["by_identifier"]))
+            fraud_indicators.append(
+                f"{shared['count']} other customer(s) in the last {Config.DUPLICATE_LOOKBACK_DAYS} days share {kinds}"
+            )
+            fraud_score += min(0.1 * shared["count"], 0.3)
+        
+        if shared["ring_size"] >= Config.FRAUD_RING_MIN_SIZE:
+            fraud_indicators.append(f"Linked to a group of {shared['ring_size']} customers")
+            fraud_score += 0.3
+        
         # Check document authenticity
         # Check for suspicious patterns
         
@@ -162,15 +160,18 @@ class VerificationAgent(BaseAgent):
             fraud_indicators.append("Invalid phone number")
             fraud_score += 0.2
         
-        # Check IP address (would check against known fraud IPs)
+        # Check IP address against VPN / proxy / bad-actor lists
         ip_address = customer_data.get("ip_address", "")
         if ip_address:
-            # Placeholder check
-            fraud_score += 0.1
+            reputation = self.ip_reputation.check(ip_address)
+            if reputation["categories"]:
+                fraud_indicators.append(f"IP address listed as {', '.join(reputation['categories'])}")
+                fraud_score += reputation["risk"] * 0.4
         
         return {
-            "fraud_score": fraud_score,
+            "fraud_score": round(fraud_score, 3),
             "indicators": fraud_indicators,
+            "shared_identifiers": shared,
             "status": "clean" if fraud_score < 0.3 else "suspicious",
             "requires_review": fraud_score >= 0.3
         }
@@ -179,8 +180,9 @@ class VerificationAgent(BaseAgent):
         """Check IP address and perform liveliness detection"""
         ip_address = customer_data.get("ip_address", "")
         
-        # Placeholder IP check
-        ip_risk = 0.1  # Would check against known VPN/proxy/fraud IP databases
+        # Local reputation lookup against VPN/proxy/fraud IP lists
+        reputation = self.ip_reputation.check(ip_address)
+        ip_risk = reputation["risk"]
         
         # Liveliness check (would use face detection to ensure person is alive)
         liveliness_score = 0.95  # Placeholder
@@ -188,6 +190,7 @@ class VerificationAgent(BaseAgent):
         return {
             "ip_address": ip_address,
             "ip_risk": ip_risk,
+            "ip_categories": reputation["categories"],
             "liveliness_score": liveliness_score,
             "status": "passed" if ip_risk < 0.3 and liveliness_score > 0.8 else "failed"
         }
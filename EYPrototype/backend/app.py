@@ -1,21 +1,131 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
-from agents.master_agent import MasterAgent
-from services.database import DatabaseService
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from werkzeug.middleware.proxy_fix import ProxyFix
+from agents.master_agent import is_emergency_message
+from services.admission import AdmissionController, AdmissionRejected, EMERGENCY, NORMAL
+from services.database import DatabaseService, change_cursor, new_application_id
+from services.document_upload import DocumentUploadService, UploadRejected
+from services.identifiers import extract_identifiers
+from services.lazy import LazyProxy
+from services.otp import OtpService, OtpRateLimited
+from services.decision_cache import DecisionCache
+from services.idempotency import IdempotencyStore, IdempotencyRejected
+from services.profiler import RequestProfiler, mark_node
+from services.realtime import (
+    UpdatePublisher, customer_room, application_room, dashboard_room, room_token, verify_room_token, is_staff_token,
+    room_auth_enabled
+)
 from config import Config
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import wraps
 import uuid
 import asyncio
+import hashlib
+import json
+import queue
+import threading
+import time
 from datetime import datetime
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = Config.SECRET_KEY
+if Config.PROXY_FIX_HOPS:
+    # Behind a load balancer request.remote_addr is the balancer; trust its X-Forwarded-* headers
+    hops = Config.PROXY_FIX_HOPS
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
 CORS(app, origins=Config.SOCKETIO_CORS_ALLOWED_ORIGINS)
-socketio = SocketIO(app, cors_allowed_origins=Config.SOCKETIO_CORS_ALLOWED_ORIGINS)
+socketio = SocketIO(
+    app,
+    cors_allowed_origins=Config.SOCKETIO_CORS_ALLOWED_ORIGINS,
+    async_mode='threading',
+    message_queue=Config.SOCKETIO_MESSAGE_QUEUE or None
+)
+update_publisher = UpdatePublisher(socketio)
+if not room_auth_enabled():
+    print("SECRET_KEY is not set; Socket.IO room subscriptions are refused until it is")
+chat_executor = ThreadPoolExecutor(max_workers=Config.CHAT_STREAM_WORKERS, thread_name_prefix="chat-stream")
+profiler = RequestProfiler()
+admission = AdmissionController()
 
-# Initialize services
-master_agent = MasterAgent()
+# Initialize services; heavy ones are built on first use (or by the warm-up)
 db_service = DatabaseService()
+otp_service = OtpService()
+upload_service = DocumentUploadService()
+decision_cache = DecisionCache() if Config.FAST_PATH_ENABLED else None
+idempotency = IdempotencyStore()
+
+def _create_application_index():
+    from services.fraud_index import DuplicateApplicationIndex
+    index = DuplicateApplicationIndex(db_service)
+    index.start_sync()
+    return index
+
+def _create_ip_reputation():
+    from services.ip_reputation import IpReputationService
+    service = IpReputationService()
+    service.start_watching()
+    return service
+
+def _create_feedback_store():
+    from services.feedback_store import FeedbackStore
+    store = FeedbackStore()
+    store.start_flushing()
+    return store
+
+def _create_risk_models():
+    # Maps the current risk model and starts watching for new versions
+    from services.model_registry import get_model_registry
+    return get_model_registry()
+
+def _create_customer_snapshots():
+    # Maps the current snapshot, then refreshes and rebuilds it in the background
+    from services.customer_snapshot import get_customer_snapshots
+    store = get_customer_snapshots()
+    store.start_building(db_service)
+    return store
+
+def _create_master_agent():
+    from agents.master_agent import MasterAgent
+    agent = MasterAgent(
+        application_index=application_index,
+        ip_reputation=ip_reputation,
+        otp_service=otp_service,
+        feedback_store=feedback_store,
+        decision_cache=decision_cache
+    )
+    agent.warm_up()
+    return agent
+
+application_index = LazyProxy("application_index", _create_application_index)
+ip_reputation = LazyProxy("ip_reputation", _create_ip_reputation)
+feedback_store = LazyProxy("feedback_store", _create_feedback_store)
+risk_models = LazyProxy("risk_models", _create_risk_models)
+customer_snapshots = LazyProxy("customer_snapshots", _create_customer_snapshots)
+master_agent = LazyProxy("master_agent", _create_master_agent)
+warm_components = [application_index, ip_reputation, risk_models, customer_snapshots, master_agent]
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+draining = threading.Event()
+
+def start_warm_up():
+    """Build every lazy component in a background thread (once)"""
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is not None:
+            return
+        
+        def _run():
+            for component in warm_components:
+                try:
+                    component.warm()
+                except Exception as e:
+                    print(f"Warm-up failed for {component.status()['name']}: {str(e)}")
+        
+        _warm_up_thread = threading.Thread(target=_run, name="warm-up", daemon=True)
+        _warm_up_thread.start()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -25,60 +135,232 @@ def health_check():
         "timestamp": datetime.now().isoformat()
     })
 
-@app.route('/api/chat', methods=['POST'])
-def chat():
-    """Main chat endpoint for loan processing"""
-    try:
-        data = request.json
-        message = data.get('message', '')
-        customer_id = data.get('customer_id')
-        customer_data = data.get('customer_data', {})
-        documents = data.get('documents', [])
-        
-        # Create customer if doesn't exist
-        if not customer_id:
-            customer_id = db_service.create_customer({
-                "phone": customer_data.get("phone"),
-                "email": customer_data.get("email"),
-                "name": customer_data.get("name", ""),
-                "status": "active"
-            })
-        
-        # Process through Master Agent
-        context = {
-            "customer_id": customer_id,
-            "message": message,
-            "customer_data": customer_data,
-            "documents": documents
-        }
-        
-        # Run async function
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(master_agent.process(context))
-        loop.close()
-        
-        # Save application to database
-        application_id = db_service.create_loan_application({
-            "customer_id": customer_id,
-            "message": message,
-            "result": result,
-            "status": result.get("status", "processing")
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once agents and indexes are built, 503 while warming up"""
+    if draining.is_set():
+        return jsonify({"status": "draining", "timestamp": datetime.now().isoformat()}), 503
+    
+    start_warm_up()
+    components = [component.status() for component in warm_components]
+    ready = all(component["ready"] for component in components)
+    return jsonify({
+        "status": "ready" if ready else "warming_up",
+        "components": components,
+        "timestamp": datetime.now().isoformat()
+    }), 200 if ready else 503
+
+def _chat_context(data):
+    """Build the Master Agent context for a chat request, creating the customer if needed"""
+    customer_id = data.get('customer_id')
+    customer_data = data.get('customer_data', {})
+    
+    # Create customer if doesn't exist
+    if not customer_id:
+        customer_id = db_service.create_customer({
+            "phone": customer_data.get("phone"),
+            "email": customer_data.get("email"),
+            "name": customer_data.get("name", ""),
+            "status": "active"
         })
-        
-        # Emit real-time update via WebSocket
-        socketio.emit('loan_update', {
+    
+    return {
+        "customer_id": customer_id,
+        "message": data.get('message', ''),
+        "customer_data": customer_data,
+        "documents": data.get('documents', [])
+    }
+
+def _admit_chat(data):
+    """Apply per-customer and per-IP rate limits and wait for a workflow slot.
+
+    Messages with neither a customer_id nor a phone (a new conversation) use
+    the customer limit of an anonymous customer per client IP. Emergency
+    messages queue in their own lane and are admitted first. Raises
+    AdmissionRejected; the caller must call admission.release() once admitted.
+    """
+    customer_key = data.get('customer_id') or (data.get('customer_data') or {}).get('phone')
+    priority = EMERGENCY if is_emergency_message(data.get('message', '')) else NORMAL
+    admission.admit(customer_key, request.remote_addr, priority)
+
+def _admission_rejected(e):
+    response = jsonify({"success": False, "error": str(e), "reason": e.reason, "retry_after": e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+def staff_required(view):
+    """Reject requests without "Authorization: Bearer <STAFF_API_TOKEN>" (all if none is configured)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not is_staff_token(token.strip()):
+            return jsonify({"success": False, "error": "Staff authorization required"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def _request_fingerprint(*parts):
+    """Digest of what makes a request distinct: the raw body, or the given parts (e.g. form fields)"""
+    if not parts:
+        return hashlib.sha256(request.get_data()).hexdigest()
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def _idempotent(scope, fingerprint, handler):
+    """Run handler once per Idempotency-Key header; retries and concurrent duplicates get its response"""
+    key = request.headers.get(Config.IDEMPOTENCY_HEADER)
+    if not key:
+        return handler()
+    if len(key) > 255:
+        return jsonify({"success": False, "error": f"{Config.IDEMPOTENCY_HEADER} is too long"}), 400
+    
+    responses = []
+    
+    def run():
+        response = app.make_response(handler())
+        responses.append(response)
+        return response.get_data(as_text=True), response.status_code
+    
+    try:
+        body, status, replayed = idempotency.run(scope, key, fingerprint, run)
+    except IdempotencyRejected as e:
+        return jsonify({"success": False, "error": str(e)}), e.status_code
+    
+    if not replayed:
+        return responses[0]
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def _progress_callback(customer_id, forward=None):
+    """on_progress for MasterAgent.process: publishes a snapshot to the customer's room per node"""
+    completed_steps = []
+    
+    def on_progress(node, state):
+        completed_steps.append(node)
+        update_publisher.publish('loan_progress', customer_room(customer_id), {
             "customer_id": customer_id,
-            "application_id": application_id,
-            "status": result.get("status"),
-            "decision": result.get("final_decision"),
-            "message": "Processing completed"
+            "step": node,
+            "completed_steps": list(completed_steps),
+            "status": state.get("status"),
+            "decision": state.get("final_decision")
         })
+        if forward:
+            forward(node, state)
+    
+    return on_progress
+
+def _token_callback(customer_id, forward=None):
+    """on_token for MasterAgent.process: streams LLM text to the customer's room as it is generated.
+
+    Events are numbered per agent by seq. Without coalescing each carries one
+    token as delta; when emits are coalesced, intermediate events are dropped,
+    so each carries the full text so far instead (at most one per interval).
+    """
+    coalesced = update_publisher.interval > 0
+    seqs, texts = {}, {}
+    
+    def on_token(agent_name, token):
+        seqs[agent_name] = seqs.get(agent_name, 0) + 1
+        payload = {"customer_id": customer_id, "agent": agent_name, "seq": seqs[agent_name]}
+        if coalesced:
+            texts[agent_name] = texts.get(agent_name, "") + token
+            payload["text"] = texts[agent_name]
+        else:
+            payload["delta"] = token
+        update_publisher.publish('llm_token', customer_room(customer_id), payload, key=agent_name)
+        if forward:
+            forward(agent_name, token)
+    
+    return on_token
+
+def _should_profile():
+    """Profile this request if its profiling header carries PROFILE_SECRET or PROFILE_SAMPLE_RATE picked it"""
+    requested = request.headers.get(Config.PROFILE_HEADER) if Config.PROFILE_HEADER else None
+    return profiler.should_profile(requested)
+
+def _run_workflow(context, on_progress, on_token=None):
+    """Run the Master Agent graph to completion on a private event loop"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(master_agent.process(context, on_progress=on_progress, on_token=on_token))
+    finally:
+        loop.close()
+
+def _record_application(context, result, application_id=None):
+    """Save a processed application, index it and notify subscribers; returns its id.
+
+    application_id is one from new_application_id() already given to the client.
+    """
+    mark_node("record_application")
+    customer_id = context["customer_id"]
+    
+    # Save application to database
+    application = {
+        "customer_id": customer_id,
+        "message": context["message"],
+        "result": result,
+        "status": result.get("status", "processing")
+    }
+    if application_id is not None:
+        application["_id"] = application_id
+    application_id = db_service.create_loan_application(application)
+    
+    # Make the application visible to duplicate checks immediately on this worker
+    application_index.add_application(
+        application_id,
+        extract_identifiers(result.get("customer_data", context["customer_data"]), context["documents"]),
+        customer_id=customer_id
+    )
+    
+    # Emit real-time update to subscribers of this customer and application only
+    update = {
+        "customer_id": customer_id,
+        "application_id": application_id,
+        "status": result.get("status"),
+        "decision": result.get("final_decision"),
+        "sanction": result.get("sanction_result"),
+        "message": "Processing completed"
+    }
+    update_publisher.publish('loan_update', customer_room(customer_id), update, key=application_id)
+    update_publisher.publish('loan_update', application_room(application_id), update, key=application_id)
+    
+    # Dashboards merge the changed row and advance their change-feed cursor
+    update_publisher.publish('application_changed', dashboard_room(), {
+        "application": _format_application(application),
+        "cursor": change_cursor(application)
+    }, key=application_id)
+    return application_id
+
+@app.route('/api/chat', methods=['POST'])
+def chat():
+    """Main chat endpoint for loan processing; send an Idempotency-Key to make retries safe"""
+    return _idempotent("chat", _request_fingerprint(), _chat)
+
+def _chat():
+    data = request.json or {}
+    try:
+        _admit_chat(data)
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
+    
+    started = time.monotonic()
+    try:
+        with profiler.capture(endpoint="/api/chat") if _should_profile() else nullcontext() as capture:
+            context = _chat_context(data)
+            customer_id = context["customer_id"]
+            
+            # Process through Master Agent
+            result = _run_workflow(context, _progress_callback(customer_id), _token_callback(customer_id))
+            application_id = _record_application(context, result)
+            if capture:
+                capture.tags.update(customer_id=customer_id, application_id=application_id,
+                                    decision=result.get("final_decision"))
         
         return jsonify({
             "success": True,
             "customer_id": customer_id,
             "application_id": application_id,
+            **_subscription_tokens(customer_id, application_id),
             "result": result,
             "response": generate_user_response(result)
         })
@@ -88,14 +370,154 @@ def chat():
             "success": False,
             "error": str(e)
         }), 500
+    finally:
+        admission.release(time.monotonic() - started)
+
+def _subscription_tokens(customer_id, application_id=None):
+    """Tokens that let this client join the Socket.IO rooms of its own customer and application"""
+    if not room_auth_enabled():
+        return {}
+    tokens = {"customer_token": room_token(customer_room(customer_id))}
+    if application_id:
+        tokens["application_token"] = room_token(application_room(application_id))
+    return tokens
+
+# State fields sent to the client when each workflow node finishes
+STREAM_NODE_FIELDS = {
+    "sales": ["sales_result"],
+    "emergency_check": ["is_emergency"],
+    "risk_assessment": ["preliminary_risk_score"],
+    "parallel_verification": ["verification_result", "credit_score", "offer_mart_data"],
+    "underwriting": ["underwriting_result"],
+    "decision": ["final_decision", "decision_details"],  # decision_details is underwriting_result
+    "fast_path": ["final_decision", "decision_details", "sanction_result"],
+    "sanction": ["sanction_result"],
+}
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Chat over server-sent events: one event per workflow node as it finishes.
+
+    LLM text (e.g. objection handling) arrives as `token` events while it is generated.
+
+    The stream ends with a `result` event once the decision is made; sanction
+    letter generation and delivery carry on in the background and are reported
+    through the customer's Socket.IO room (loan_update). The event already
+    carries the application_id (and its room token); the application is
+    saved under that id when the workflow finishes.
+    """
+    data = request.json or {}
+    try:
+        _admit_chat(data)
+    except AdmissionRejected as e:
+        return _admission_rejected(e)
+    
+    started = time.monotonic()
+    try:
+        context = _chat_context(data)
+    except Exception as e:
+        admission.release()
+        return jsonify({"success": False, "error": str(e)}), 500
+    
+    customer_id = context["customer_id"]
+    # Allocated now so the result event can name the application before it is saved
+    application_key = new_application_id()
+    application_id = str(application_key)
+    events = queue.Queue()
+    
+    def forward(node, state):
+        events.put(("progress", node, {
+            field: state.get("underwriting_result" if field == "decision_details" else field)
+            for field in STREAM_NODE_FIELDS.get(node, [])
+        }))
+        if node == "decision" or (node == "fast_path" and state.get("final_decision")):
+            events.put(("decided", node, state))
+    
+    def forward_token(agent_name, token):
+        events.put(("token", agent_name, token))
+    
+    profile = _should_profile()
+    
+    def run():
+        try:
+            with profiler.capture(endpoint="/api/chat/stream", customer_id=customer_id) if profile else nullcontext() as capture:
+                result = _run_workflow(context, _progress_callback(customer_id, forward),
+                                       _token_callback(customer_id, forward_token))
+                _record_application(context, result, application_key)
+                if capture:
+                    capture.tags.update(application_id=application_id, decision=result.get("final_decision"))
+            events.put(("complete", application_id, result))
+        except Exception as e:
+            print(f"Streaming chat failed for {customer_id}: {str(e)}")
+            events.put(("error", None, str(e)))
+        finally:
+            admission.release(time.monotonic() - started)
+    
+    # The workflow runs on a bounded pool so it outlives the HTTP stream but not a graceful shutdown
+    chat_executor.submit(run)
+    
+    def generate():
+        yield _sse("start", {"customer_id": customer_id, **_subscription_tokens(customer_id)})
+        while True:
+            try:
+                kind, key, payload = events.get(timeout=Config.CHAT_STREAM_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            
+            if kind == "token":
+                yield _sse("token", {"agent": key, "delta": payload})
+            elif kind == "progress":
+                yield _sse("progress", {"step": key, **payload})
+            elif kind == "decided":
+                # The application is saved after this event; application_id already names it
+                yield _sse("result", {
+                    "success": True,
+                    "customer_id": customer_id,
+                    "application_id": application_id,
+                    **_subscription_tokens(customer_id, application_id),
+                    "decision": payload.get("final_decision"),
+                    "response": generate_user_response(payload),
+                    # A fast-path decision refers to the sanction letter already delivered for it
+                    "sanction": (payload.get("sanction_result") or {}).get("status") or (
+                        "in_progress" if payload.get("final_decision") in ["approve", "counter_offer"] else None)
+                })
+                return
+            elif kind == "complete":
+                # Workflow ended before a decision (e.g. customer not interested)
+                yield _sse("result", {
+                    "success": True,
+                    "customer_id": customer_id,
+                    "application_id": key,
+                    **_subscription_tokens(customer_id, key),
+                    "decision": payload.get("final_decision"),
+                    "response": generate_user_response(payload)
+                })
+                return
+            else:
+                yield _sse("error", {"success": False, "error": payload})
+                return
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
 
 def generate_user_response(result: dict) -> str:
     """Generate user-friendly response from agent result"""
     status = result.get("status", "processing")
     decision = result.get("final_decision", "")
+    objection_response = result.get("sales_result", {}).get("objection_response")
     
-    if decision == "approve":
+    if objection_response and not decision:
+        return objection_response
+    elif decision == "approve":
         loan_amount = result.get("underwriting_result", {}).get("loan_amount", 0)
+        if (result.get("sanction_result") or {}).get("status") == "previously_delivered":
+            return f"Your loan of ₹{loan_amount:,.0f} is already approved and its sanction letter has been sent to you."
         return f"Congratulations! Your loan of ₹{loan_amount:,.0f} has been approved. You will receive the sanction letter shortly."
     elif decision == "counter_offer":
         counter_offer = result.get("underwriting_result", {}).get("counter_offer", {})
@@ -107,9 +529,20 @@ def generate_user_response(result: dict) -> str:
     else:
         return "Your application is being processed. We'll update you shortly."
 
+def _documents_changed(customer_id):
+    """New documents mean a new KYC check, so the customer's fast-path entries are dropped"""
+    if decision_cache is not None and customer_id:
+        decision_cache.invalidate(customer_id)
+
 @app.route('/api/upload-documents', methods=['POST'])
 def upload_documents():
     """Handle document uploads"""
+    # Not the raw body: each retry of a multipart form gets a new boundary
+    file = request.files.get('file')
+    fingerprint = _request_fingerprint(request.form.to_dict(), file and file.filename)
+    return _idempotent("upload-documents", fingerprint, _upload_documents)
+
+def _upload_documents():
     try:
         if 'file' not in request.files:
             return jsonify({"success": False, "error": "No file provided"}), 400
@@ -118,25 +551,110 @@ def upload_documents():
         document_type = request.form.get('document_type', 'unknown')
         customer_id = request.form.get('customer_id')
         
-        # In production, upload to cloud storage (AWS S3, Google Cloud Storage)
-        # For now, save locally
-        import os
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
+        # Stream into the object store in chunks; the stored name is the content hash
+        document = upload_service.save_stream(file.stream, customer_id, document_type)
+        _documents_changed(customer_id)
         
-        filename = f"{customer_id}_{document_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        filepath = os.path.join(upload_dir, filename)
-        file.save(filepath)
+        return jsonify({
+            "success": True,
+            "document": document
+        })
+    
+    except UploadRejected as e:
+        return jsonify({"success": False, "error": str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/uploads', methods=['POST'])
+def start_upload():
+    """Start a resumable upload session for large documents"""
+    return _idempotent("uploads", _request_fingerprint(), _start_upload)
+
+def _start_upload():
+    try:
+        data = request.json or {}
+        total_size = data.get('total_size')
+        session = upload_service.start_upload(
+            data.get('customer_id'),
+            data.get('document_type', 'unknown'),
+            int(total_size) if total_size is not None else None
+        )
+        return jsonify({"success": True, **session}), 201
+    
+    except UploadRejected as e:
+        return jsonify({"success": False, "error": str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>', methods=['GET', 'PATCH', 'DELETE'])
+def resumable_upload(upload_id):
+    """Query the offset of, append a chunk to, or cancel a resumable upload"""
+    try:
+        if request.method == 'GET':
+            offset = upload_service.get_upload_offset(upload_id)
+        elif request.method == 'DELETE':
+            upload_service.abort_upload(upload_id)
+            return jsonify({"success": True, "upload_id": upload_id})
+        else:
+            # Chunk body is the raw request stream, offset mirrors the tus protocol header
+            offset = int(request.headers.get('Upload-Offset', -1))
+            offset = upload_service.append_chunk(upload_id, offset, request.stream)
         
+        return jsonify({"success": True, "upload_id": upload_id, "offset": offset})
+    
+    except UploadRejected as e:
+        return jsonify({"success": False, "error": str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Finalize a resumable upload"""
+    return _idempotent("uploads-complete", _request_fingerprint(upload_id), lambda: _complete_upload(upload_id))
+
+def _complete_upload(upload_id):
+    try:
+        document = upload_service.complete_upload(upload_id)
+        _documents_changed(document.get("customer_id"))
         return jsonify({
             "success": True,
-            "document": {
-                "type": document_type,
-                "filename": filename,
-                "url": f"/uploads/{filename}"
-            }
+            "document": document
         })
     
+    except UploadRejected as e:
+        return jsonify({"success": False, "error": str(e)}), e.status_code
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/otp/issue', methods=['POST'])
+def issue_otp():
+    """Send a one-time password to the customer's phone"""
+    try:
+        data = request.json or {}
+        return jsonify({"success": True, **otp_service.issue(data.get('phone'))})
+    
+    except OtpRateLimited as e:
+        response = jsonify({"success": False, "error": str(e), "retry_after": e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/otp/verify', methods=['POST'])
+def verify_otp():
+    """Verify a one-time password for the customer who will use it (customer_id is required)"""
+    try:
+        data = request.json or {}
+        if not data.get('customer_id'):
+            return jsonify({"success": False, "error": "customer_id is required"}), 400
+        result = otp_service.verify(data.get('phone'), data.get('code'), data['customer_id'])
+        status_code = 200 if result["status"] == "verified" else 400
+        if result["status"] == "locked":
+            status_code = 429
+        return jsonify({"success": result["status"] == "verified", **result}), status_code
+    
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -156,30 +674,36 @@ def get_application_status(application_id):
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
+def _format_application(application):
+    """Application row as shown on the dashboard"""
+    created_at = application.get('created_at')
+    return {
+        'id': application.get('application_id', application.get('id', str(application.get('_id', '')))),
+        'name': application.get('customer_name', 'Unknown'),
+        'type': application.get('loan_type', 'Personal Loan'),
+        'amount': f"₹{application.get('loan_amount', 0):,}",
+        'date': created_at.isoformat() if isinstance(created_at, datetime) else created_at or datetime.now().isoformat().split('T')[0],
+        'progress': application.get('progress', 0),
+        'status': application.get('status', 'pending'),
+        'email': application.get('email', '')
+    }
+
 @app.route('/api/applications', methods=['GET'])
 def get_applications():
-    """Fetch all applications from database"""
+    """Fetch all applications from database (?limit=N for the N most recent)"""
     try:
-        applications = db_service.get_all_applications()
+        # Read the cursor first: a change racing the list is replayed rather than missed
+        cursor = db_service.get_latest_change_cursor()
+        applications = db_service.get_all_applications(request.args.get('limit', type=int))
         
         # Format applications for frontend
-        formatted_apps = []
-        if applications:
-            for app in applications:
-                formatted_apps.append({
-                    'id': app.get('application_id', app.get('id', f"APP-{len(formatted_apps) + 1:03d}")),
-                    'name': app.get('customer_name', 'Unknown'),
-                    'type': app.get('loan_type', 'Personal Loan'),
-                    'amount': f"₹{app.get('loan_amount', 0):,}",
-                    'date': app.get('created_at', datetime.now().isoformat().split('T')[0]),
-                    'progress': app.get('progress', 0),
-                    'status': app.get('status', 'pending'),
-                    'email': app.get('email', '')
-                })
+        formatted_apps = [_format_application(app) for app in applications or []]
         
+        # Clients continue with /api/applications/changes from here
         return jsonify({
             "success": True,
-            "applications": formatted_apps
+            "applications": formatted_apps,
+            "cursor": cursor
         })
     
     except Exception as e:
@@ -190,6 +714,247 @@ def get_applications():
             "applications": []
         }), 500
 
+@app.route('/api/applications/changes', methods=['GET'])
+def get_application_changes():
+    """Applications created or changed after ?since=<cursor>, oldest first.
+
+    Returns the cursor to pass next time; has_more means another page is waiting.
+    Applications written shortly before the cursor are sent again in case one
+    committed after the cursor passed it, so clients dedupe by id.
+    """
+    try:
+        since = request.args.get('since')
+        limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+        changes = db_service.get_application_changes(since, limit)
+        replayed = []
+        if since and Config.CHANGE_FEED_OVERLAP_SECONDS > 0:
+            seen = {app['_id'] for app in changes}
+            replayed = [app for app in db_service.get_application_changes_behind(
+                since, Config.CHANGE_FEED_OVERLAP_SECONDS, limit) if app['_id'] not in seen]
+        return jsonify({
+            "success": True,
+            "applications": [_format_application(app) for app in replayed + changes],
+            "cursor": change_cursor(changes[-1]) if changes else request.args.get('since'),
+            "has_more": len(changes) == limit
+        })
+    
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid cursor: {str(e)}"}), 400
+    except Exception as e:
+        print(f"Error fetching application changes: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/stats/dashboard', methods=['GET'])
+def get_dashboard_stats():
+    """Dashboard counts, sanctioned totals and daily approval funnel (?days=N, default 14)"""
+    try:
+        days = min(max(request.args.get('days', 14, type=int), 1), 366)
+        return jsonify({"success": True, "stats": db_service.get_dashboard_stats(days)})
+    
+    except Exception as e:
+        print(f"Error fetching dashboard stats: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/staff/dashboard-token', methods=['POST'])
+@staff_required
+def issue_dashboard_token():
+    """Short-lived signed token for joining the dashboard room, so the staff secret stays server-side"""
+    token = room_token(dashboard_room(), ttl=Config.DASHBOARD_TOKEN_TTL_SECONDS)
+    if token is None:
+        return jsonify({"success": False, "error": "Room subscriptions are disabled until SECRET_KEY is set"}), 503
+    return jsonify({"success": True, "dashboard_token": token, "expires_in": Config.DASHBOARD_TOKEN_TTL_SECONDS})
+
+@app.route('/api/admin/dashboard-stats/rebuild', methods=['POST'])
+@staff_required
+def rebuild_dashboard_stats():
+    """Recompute dashboard counters from every application"""
+    try:
+        return jsonify({"success": True, "applications": db_service.aggregates.rebuild()})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/fraud/rings', methods=['GET'])
+@staff_required
+def get_fraud_rings():
+    """List groups of applications linked by shared identifiers"""
+    try:
+        min_size = request.args.get('min_size', type=int)
+        return jsonify({
+            "success": True,
+            "rings": application_index.rings(min_size),
+            "index": application_index.stats()
+        })
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/fraud/rings/<application_id>', methods=['GET'])
+@staff_required
+def get_fraud_ring(application_id):
+    """Applications connected to one application through shared identifiers"""
+    try:
+        return jsonify({
+            "success": True,
+            "ring": application_index.ring(application_id)
+        })
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/ip-reputation/reload', methods=['POST'])
+@staff_required
+def reload_ip_reputation():
+    """Rebuild the IP reputation table from the configured lists"""
+    try:
+        reloaded = ip_reputation.reload(force=True)
+        return jsonify({
+            "success": True,
+            "reloaded": reloaded,
+            "stats": ip_reputation.stats()
+        })
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/underwriting-policy', methods=['GET'])
+@staff_required
+def get_underwriting_policy():
+    """Live and challenger underwriting policy versions, with A/B decision counts"""
+    try:
+        from services.underwriting_policy import get_policy_store
+        return jsonify({"success": True, **get_policy_store().stats()})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/underwriting-policy/reload', methods=['POST'])
+@staff_required
+def reload_underwriting_policy():
+    """Recompile the underwriting policy files; a broken file leaves the current policy in place"""
+    try:
+        from services.underwriting_policy import get_policy_store
+        store = get_policy_store()
+        reloaded = store.reload(force=True)
+        return jsonify({
+            "success": True,
+            "reloaded": reloaded,
+            "stats": store.stats()
+        })
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/risk-model', methods=['GET'])
+@staff_required
+def get_risk_model():
+    """Current risk model version, published versions and scoring latency percentiles"""
+    try:
+        return jsonify({"success": True, **risk_models.stats()})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/risk-model/activate', methods=['POST'])
+@staff_required
+def activate_risk_model():
+    """Switch every worker to a published risk model version (promote or roll back)"""
+    try:
+        version = (request.json or {}).get('version')
+        if not version:
+            return jsonify({"success": False, "error": "version is required"}), 400
+        risk_models.activate(version)
+        return jsonify({"success": True, **risk_models.stats()})
+    
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/customer-snapshot', methods=['GET'])
+@staff_required
+def get_customer_snapshot():
+    """Current customer history snapshot and lookup counts for this worker"""
+    try:
+        return jsonify({"success": True, **customer_snapshots.stats()})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/customer-snapshot/rebuild', methods=['POST'])
+@staff_required
+def rebuild_customer_snapshot():
+    """Build a new customer history snapshot now and switch every worker to it"""
+    try:
+        rows = customer_snapshots.build(db_service=db_service)
+        return jsonify({
+            "success": True,
+            "rebuilt": rows is not None,
+            "stats": customer_snapshots.stats()
+        })
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/idempotency', methods=['GET'])
+@staff_required
+def get_idempotency_stats():
+    """Requests run, replayed from a stored response, joined while in flight or refused, on this worker"""
+    try:
+        return jsonify({"success": True, **idempotency.stats()})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/fast-path', methods=['GET'])
+@staff_required
+def get_fast_path_stats():
+    """Fast-path hits and misses (by reason) for returning customers on this worker"""
+    try:
+        if decision_cache is None:
+            return jsonify({"success": True, "enabled": False})
+        return jsonify({"success": True, "enabled": True, **decision_cache.stats()})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/model-routes', methods=['GET'])
+@staff_required
+def get_model_routes():
+    """Model chosen per LLM call site, with latency, cost and escalation stats"""
+    try:
+        from agents.model_router import get_model_router
+        return jsonify({"success": True, **get_model_router().stats()})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/admission', methods=['GET'])
+@staff_required
+def get_admission_stats():
+    """Chat admission control: running and queued workflows, rejections"""
+    return jsonify({"success": True, **admission.stats()})
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@staff_required
+def get_profiles():
+    """Slowest recent request profiles, with time per workflow node"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({"success": True, "profiles": profiler.slowest(limit)})
+    
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/admin/profiles/<capture_id>', methods=['GET'])
+@staff_required
+def get_profile(capture_id):
+    """Collapsed stacks of one profile, for flamegraph.pl or speedscope"""
+    collapsed = profiler.collapsed(capture_id)
+    if collapsed is None:
+        return jsonify({"success": False, "error": "Profile not found"}), 404
+    return Response(collapsed, mimetype='text/plain')
+
 @socketio.on('connect')
 def handle_connect():
     """Handle WebSocket connection"""
@@ -201,12 +966,48 @@ def handle_disconnect():
     """Handle WebSocket disconnection"""
     print('Client disconnected')
 
+def _subscription_rooms(data):
+    """(room, authorized) for each room named in a subscribe/unsubscribe payload"""
+    data = data or {}
+    rooms = []
+    if data.get('customer_id'):
+        room = customer_room(data['customer_id'])
+        rooms.append((room, verify_room_token(room, data.get('customer_token'))))
+    if data.get('application_id'):
+        room = application_room(data['application_id'])
+        rooms.append((room, verify_room_token(room, data.get('application_token'))))
+    if data.get('dashboard'):
+        room = dashboard_room()
+        rooms.append((room, verify_room_token(room, data.get('dashboard_token'))))
+    return rooms
+
 @socketio.on('subscribe')
 def handle_subscribe(data):
-    """Subscribe to loan updates for a customer"""
-    customer_id = data.get('customer_id')
-    print(f'Client subscribed to updates for customer: {customer_id}')
+    """Subscribe to loan updates for a customer and/or application, or to dashboard changes.
+
+    Customer and application rooms need the customer_token / application_token
+    returned by the chat endpoints; the dashboard room needs the dashboard_token
+    from /api/staff/dashboard-token.
+    """
+    joined, denied = [], []
+    for room, authorized in _subscription_rooms(data):
+        if authorized:
+            join_room(room)
+            joined.append(room)
+        else:
+            denied.append(room)
+    emit('subscribed', {'rooms': joined, 'denied': denied})
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    """Stop receiving updates for a customer and/or application"""
+    rooms = [room for room, _ in _subscription_rooms(data)]
+    for room in rooms:
+        leave_room(room)
+    emit('unsubscribed', {'rooms': rooms})
 
 if __name__ == '__main__':
+    if Config.WARM_UP_ON_START:
+        start_warm_up()
     socketio.run(app, host='0.0.0.0', port=5000, debug=Config.DEBUG)
 
@@ -0,0 +1,2 @@
+# Benchmarks for backend hot paths. Run from the backend directory, e.g.
+#   python -m benchmarks.upload_benchmark
@@ -0,0 +1,110 @@
+"""Overload test for /api/chat admission control.
+
+Drives the real chat() endpoint through Flask's test client with open-loop
+arrivals at --rate requests/second. The Master Agent workflow is replaced by
+a stand-in that needs one of --capacity backend slots (LLM, bureau, PDF)
+for a lognormal --service-ms, so excess load queues downstream the way it
+would in production. A share of traffic is marked urgent (emergency lane)
+and a few --spammers send far more than their share.
+
+Compare with --no-admission to see unbounded queueing: every request is
+eventually served, but latency grows for the whole run.
+"""
+from config import Config
+import argparse
+import math
+import random
+import threading
+import time
+import uuid
+
+def _percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000 if samples else float("nan")
+
+def run(args):
+    if args.no_admission:
+        Config.CHAT_RATE_PER_CUSTOMER = Config.CHAT_RATE_PER_IP = 0
+        Config.CHAT_MAX_CONCURRENT = Config.CHAT_MAX_QUEUE = 10 ** 9
+    else:
+        Config.CHAT_MAX_CONCURRENT = args.max_concurrent
+        Config.CHAT_MAX_QUEUE = args.max_queue
+    Config.PROFILE_SAMPLE_RATE = 0
+    import app
+
+    backend = threading.BoundedSemaphore(args.capacity)
+    rng = random.Random(args.seed)
+    service_rng = random.Random(args.seed + 1)
+    service_lock = threading.Lock()
+
+    def fake_workflow(context, on_progress, on_token=None):
+        with service_lock:
+            seconds = service_rng.lognormvariate(math.log(args.service_ms / 1000), 0.4)
+        with backend:
+            time.sleep(seconds)
+        return {"status": "processing", "final_decision": "approve", "customer_data": context["customer_data"]}
+
+    app._run_workflow = fake_workflow
+    app._record_application = lambda context, result: uuid.uuid4().hex
+    app.update_publisher.interval = 0
+    client = app.app.test_client()
+
+    results = {"emergency": [], "normal": []}
+    results_lock = threading.Lock()
+
+    def send(lane, customer_id, ip):
+        message = "need a loan urgently for surgery" if lane == "emergency" else "I want a personal loan"
+        start = time.perf_counter()
+        response = client.post("/api/chat", json={"customer_id": customer_id, "message": message},
+                               environ_base={"REMOTE_ADDR": ip})
+        with results_lock:
+            results[lane].append((response.status_code, time.perf_counter() - start))
+
+    threads = []
+    interval = 1.0 / args.rate
+    start = time.perf_counter()
+    for i in range(int(args.rate * args.duration)):
+        if rng.random() < args.spam_share:
+            customer = f"SPAM{rng.randrange(args.spammers)}"
+        else:
+            customer = f"C{rng.randrange(args.customers)}"
+        lane = "emergency" if rng.random() < args.emergency else "normal"
+        ip = f"10.0.{rng.randrange(256)}.{rng.randrange(256)}"
+        thread = threading.Thread(target=send, args=(lane, customer, ip), daemon=True)
+        thread.start()
+        threads.append(thread)
+        sleep_for = start + (i + 1) * interval - time.perf_counter()
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"mode: {'no admission control' if args.no_admission else 'admission control'}, "
+          f"offered {args.rate:.0f} req/s for {args.duration:.0f} s against capacity "
+          f"~{args.capacity / (args.service_ms / 1000):.0f} req/s")
+    served = 0
+    for lane, samples in results.items():
+        ok = [seconds for status, seconds in samples if status == 200]
+        rejected = [seconds for status, seconds in samples if status == 429]
+        served += len(ok)
+        print(f"  {lane:<9} {len(samples):>6,} sent  {len(ok):>6,} ok (p50 {_percentile(ok, 0.5):7.0f} ms, "
+              f"p99 {_percentile(ok, 0.99):7.0f} ms)  {len(rejected):>6,} rejected "
+              f"(p99 {_percentile(rejected, 0.99):5.0f} ms)")
+    print(f"goodput {served / elapsed:.1f} req/s; admission stats: {app.admission.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=150.0, help="offered requests per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--capacity", type=int, default=16, help="concurrent workflows the backends sustain")
+    parser.add_argument("--service-ms", type=float, default=200.0, help="median workflow time")
+    parser.add_argument("--max-concurrent", type=int, default=16)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--customers", type=int, default=5_000)
+    parser.add_argument("--spammers", type=int, default=5)
+    parser.add_argument("--spam-share", type=float, default=0.2, help="fraction of requests from spammers")
+    parser.add_argument("--emergency", type=float, default=0.05, help="fraction of urgent messages")
+    parser.add_argument("--no-admission", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -0,0 +1,93 @@
+"""End-to-end latency of FaceMatchService.match on real photos.
+
+Uploads --id-image as an ID document and sends --selfie-image as a data URI,
+the way the chat endpoint receives them, then times match() including image
+decoding, YuNet detection, SFace alignment and embedding:
+
+- cold: the ID document's embedding is not cached, so both images are
+  detected, aligned and embedded (first verification of an application)
+- warm: the ID embedding is cached and only the selfie is processed (a
+  selfie retry)
+
+Both images must contain a face; --width resizes them first to test other
+camera and scan sizes. The models are the OpenCV Zoo ONNX files named by
+FACE_DETECTOR_MODEL and FACE_RECOGNIZER_MODEL:
+
+    mkdir -p models
+    curl -L -o models/face_detection_yunet_2023mar.onnx \\
+        https://github.com/opencv/opencv_zoo/raw/main/models/face_detection_yunet/face_detection_yunet_2023mar.onnx
+    curl -L -o models/face_recognition_sface_2021dec.onnx \\
+        https://github.com/opencv/opencv_zoo/raw/main/models/face_recognition_sface/face_recognition_sface_2021dec.onnx
+
+    python -m benchmarks.face_match_benchmark --id-image pan.jpg --selfie-image selfie.jpg
+"""
+from services.face_match import FaceMatchService
+from services.object_store import LocalObjectStore
+from services.document_upload import DocumentUploadService
+import numpy as np
+import argparse
+import asyncio
+import base64
+import io
+import os
+import tempfile
+import time
+
+def _load(path: str, width: int) -> bytes:
+    import cv2
+    with open(path, "rb") as f:
+        data = f.read()
+    if not width:
+        return data
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    height = round(image.shape[0] * width / image.shape[1])
+    _, encoded = cv2.imencode(".jpg", cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA))
+    return encoded.tobytes()
+
+def _summary(seconds):
+    ordered = sorted(seconds)
+    pick = lambda p: ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1000
+    return f"p50 {pick(0.5):7.1f} ms  p95 {pick(0.95):7.1f} ms"
+
+async def _time_matches(service: FaceMatchService, documents, selfie: str, iterations: int, cold: bool):
+    seconds, result = [], None
+    for _ in range(iterations):
+        if cold:
+            service._embeddings.clear()
+        start = time.perf_counter()
+        result = await service.match(documents, selfie)
+        seconds.append(time.perf_counter() - start)
+    return seconds, result
+
+def run(args):
+    import cv2
+    id_bytes = _load(args.id_image, args.width)
+    selfie_bytes = _load(args.selfie_image, args.width)
+    sizes = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).shape[1::-1]
+             for data in (id_bytes, selfie_bytes)]
+    selfie = "data:image/jpeg;base64," + base64.b64encode(selfie_bytes).decode()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalObjectStore(os.path.join(root, "store"))
+        documents = [DocumentUploadService(store).save_stream(io.BytesIO(id_bytes), "id-document", "pan")]
+        service = FaceMatchService(store)
+
+        first, result = asyncio.run(_time_matches(service, documents, selfie, 1, cold=True))  # loads the models
+        if result["status"] == "failed":
+            raise SystemExit(f"match failed: {result['reason']}")
+        cold, _ = asyncio.run(_time_matches(service, documents, selfie, args.iterations, cold=True))
+        warm, result = asyncio.run(_time_matches(service, documents, selfie, args.iterations, cold=False))
+
+    print(f"ID {sizes[0][0]}x{sizes[0][1]}, selfie {sizes[1][0]}x{sizes[1][1]}, {args.iterations} matches per pass")
+    print(f"result: {result['status']} (similarity {result['similarity']}, confidence {result['confidence']})")
+    print(f"first match (loads models): {first[0] * 1000:.1f} ms")
+    print(f"cold (ID and selfie embedded): {_summary(cold)}")
+    print(f"warm (ID embedding cached):    {_summary(warm)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--id-image", required=True, help="photo or scan of an ID card with a face")
+    parser.add_argument("--selfie-image", required=True, help="selfie of the same or another person")
+    parser.add_argument("--width", type=int, default=0, help="resize both images to this width first (0 = as is)")
+    parser.add_argument("--iterations", type=int, default=50)
+    run(parser.parse_args())
@@ -0,0 +1,56 @@
+"""Build, memory and query benchmark for the duplicate-application index"""
+from services.fraud_index import DuplicateApplicationIndex, KEYS_PER_APPLICATION
+import numpy as np
+import argparse
+import time
+
+def run(applications: int, queries: int, ring_rate: float):
+    rng = np.random.default_rng(0)
+
+    # Mostly unique identifiers; a small share reuse a pool of phones / devices
+    # so duplicates and rings exist (columns: phone, email, pan, device, ip, doc, doc)
+    keys = rng.integers(1, 2**63, size=(applications, KEYS_PER_APPLICATION), dtype=np.uint64)
+    keys[:, 6] = 0
+    shared = rng.random(applications) < ring_rate
+    pool = rng.integers(1, 2**63, size=max(applications // 1000, 1), dtype=np.uint64)
+    keys[shared, 0] = rng.choice(pool, size=int(shared.sum()))
+    keys[shared, 3] = rng.choice(pool, size=int(shared.sum()))
+    now = time.time()
+    created_at = now - rng.random(applications) * 365 * 86400
+    ids = [f"APP{i:09d}" for i in range(applications)]
+
+    index = DuplicateApplicationIndex()
+    start = time.perf_counter()
+    index.bulk_load(ids, keys, created_at)
+    build = time.perf_counter() - start
+    stats = index.stats()
+
+    # Query path: hash + binary search + time filter + component sizes
+    identifiers = [{"phone": [f"98{rng.integers(10**7, 10**8)}"], "email": [f"user{i}@example.com"]}
+                   for i in range(queries)]
+    start = time.perf_counter()
+    for ident in identifiers:
+        index.count_shared(ident, days=30)
+    query_us = (time.perf_counter() - start) * 1e6 / queries
+
+    start = time.perf_counter()
+    for i in range(queries):
+        index.add_application(f"NEW{i}", identifiers[i])
+    add_us = (time.perf_counter() - start) * 1e6 / queries
+
+    start = time.perf_counter()
+    rings = index.rings()
+    rings_s = time.perf_counter() - start
+
+    print(f"applications: {applications:,}, postings: {stats['postings']:,}")
+    print(f"bulk build: {build:.1f} s, index arrays: {stats['memory_bytes'] / 2**20:.0f} MiB")
+    print(f"count_shared: {query_us:.1f} us/query, add_application: {add_us:.1f} us/insert")
+    print(f"rings (>= min size): {len(rings):,} found in {rings_s:.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--applications", type=int, default=10_000_000)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--ring-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    run(args.applications, args.queries, args.ring_rate)
@@ -0,0 +1,113 @@
+"""Duplicate work from client retries on /api/chat, with and without idempotency keys.
+
+Drives the real chat() endpoint through Flask's test client. Each of
+--clients sends one message without a customer_id (so the first request
+creates the customer) and gives up after --timeout-ms, sending the same
+message again while the earlier attempt is still running, up to --attempts
+times; --double-submit is the share of clients that also send it twice at
+once. The workflow is replaced by a stand-in taking a lognormal --service-ms,
+and customer creation and application saving are counted instead of hitting
+MongoDB.
+
+Reports how many customers, workflow runs and applications were created per
+logical message, and how long clients waited for an answer. Run with
+--no-keys to see the same traffic without Idempotency-Key headers.
+"""
+from config import Config
+import argparse
+import math
+import random
+import threading
+import time
+import uuid
+
+def _percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000 if samples else float("nan")
+
+def run(args):
+    Config.CHAT_RATE_PER_CUSTOMER = Config.CHAT_RATE_PER_IP = 0
+    Config.CHAT_MAX_CONCURRENT = Config.CHAT_MAX_QUEUE = 10 ** 9
+    Config.PROFILE_SAMPLE_RATE = 0
+    import app
+
+    rng = random.Random(args.seed)
+    counts = {"customers": 0, "workflows": 0, "applications": 0}
+    lock = threading.Lock()
+
+    def count(name):
+        with lock:
+            counts[name] += 1
+
+    def create_customer(customer):
+        count("customers")
+        return uuid.uuid4().hex
+
+    def fake_workflow(context, on_progress, on_token=None):
+        count("workflows")
+        with lock:
+            seconds = rng.lognormvariate(math.log(args.service_ms / 1000), 0.5)
+        time.sleep(seconds)
+        return {"status": "approved", "final_decision": "approve", "customer_data": context["customer_data"]}
+
+    def record_application(context, result):
+        count("applications")
+        return uuid.uuid4().hex
+
+    app.db_service.create_customer = create_customer
+    app._run_workflow = fake_workflow
+    app._record_application = record_application
+    app.update_publisher.interval = 0
+    client = app.app.test_client()
+
+    waits, statuses = [], {}
+
+    def post(body, headers, answered):
+        response = client.post("/api/chat", json=body, headers=headers)
+        with lock:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        answered.set()
+
+    def customer(i):
+        body = {"message": "I want a personal loan of rs 500000", "customer_data": {"phone": f"9{i:09d}"}}
+        headers = {} if args.no_keys else {Config.IDEMPOTENCY_HEADER: uuid.uuid4().hex}
+        answered = threading.Event()
+        start = time.perf_counter()
+        attempts = 2 if rng.random() < args.double_submit else 1
+        for attempt in range(args.attempts):
+            for _ in range(attempts if attempt == 0 else 1):
+                threading.Thread(target=post, args=(body, headers, answered), daemon=True).start()
+            if answered.wait(args.timeout_ms / 1000):
+                break
+        answered.wait()
+        with lock:
+            waits.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=customer, args=(i,), daemon=True) for i in range(args.clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        time.sleep(1 / args.rate)
+    for thread in threads:
+        thread.join()
+    time.sleep(args.service_ms / 1000 * 4)  # let abandoned attempts finish
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.clients:,} messages in {elapsed:.1f} s, idempotency keys {'off' if args.no_keys else 'on'}")
+    for name, value in counts.items():
+        print(f"  {name:<14}{value:>8,}  ({value / args.clients:.2f} per message)")
+    print(f"  responses     {dict(sorted(statuses.items()))}")
+    print(f"  client wait   p50 {_percentile(waits, 0.5):.0f} ms  p95 {_percentile(waits, 0.95):.0f} ms")
+    print(f"  idempotency   {app.idempotency.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=100.0, help="new clients per second")
+    parser.add_argument("--service-ms", type=float, default=800.0, help="median workflow time")
+    parser.add_argument("--timeout-ms", type=float, default=1000.0, help="client timeout before retrying")
+    parser.add_argument("--attempts", type=int, default=3)
+    parser.add_argument("--double-submit", type=float, default=0.1, help="share of clients that submit twice at once")
+    parser.add_argument("--no-keys", action="store_true", help="send no Idempotency-Key headers")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -0,0 +1,39 @@
+"""Build time, memory and lookup rate of the IP reputation table"""
+from services.ip_reputation import IpRangeTable
+import numpy as np
+import argparse
+import socket
+import time
+
+def _random_prefixes(rng, count: int):
+    addresses = rng.integers(0, 2**32, size=count, dtype=np.uint64)
+    lengths = rng.integers(16, 33, size=count)
+    return [f"{socket.inet_ntoa(int(a).to_bytes(4, 'big'))}/{int(l)}" for a, l in zip(addresses, lengths)]
+
+def run(prefixes: int, lookups: int):
+    rng = np.random.default_rng(0)
+    weights = {"vpn": 0.5, "proxy": 0.3, "bad_actor": 0.15, "tor": 0.05}
+    lists = {category: _random_prefixes(rng, int(prefixes * share)) for category, share in weights.items()}
+
+    start = time.perf_counter()
+    table = IpRangeTable.build(lists)
+    build = time.perf_counter() - start
+
+    queries = [socket.inet_ntoa(int(a).to_bytes(4, "big"))
+               for a in rng.integers(0, 2**32, size=lookups, dtype=np.uint64)]
+    start = time.perf_counter()
+    listed = 0
+    for address in queries:
+        listed += table.lookup_mask(address) != 0
+    elapsed = time.perf_counter() - start
+
+    print(f"prefixes: {table.prefix_count:,}, disjoint v4 segments: {len(table.v4_boundaries):,}")
+    print(f"build: {build:.1f} s, table memory: {table.memory_bytes() / 2**20:.1f} MiB")
+    print(f"lookup: {elapsed * 1e9 / lookups:.0f} ns/lookup ({lookups / elapsed:,.0f}/s), {listed / lookups:.1%} listed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prefixes", type=int, default=5_000_000)
+    parser.add_argument("--lookups", type=int, default=1_000_000)
+    args = parser.parse_args()
+    run(args.prefixes, args.lookups)
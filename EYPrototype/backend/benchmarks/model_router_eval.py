@@ -0,0 +1,117 @@
+"""Offline evaluation of model routing: replays logged messages through the Sales Agent.
+
+Trains the local intent classifier on part of the log, replays the rest
+through SalesAgent.process (intent classification, escalation and objection
+handling) and reports accuracy against the logged labels, escalation rate,
+per-route latency and estimated cost. The baseline is what ran before
+routing: the keyword rules for intent (no LLM call) and objection replies
+on the large model. Run with LLM_PROVIDER=stub to replay without calling
+OpenAI.
+
+--from-db replays messages from past loan applications instead. Their
+labels are what the Sales Agent recorded (keyword rules or escalations),
+so the score is agreement with those labels, not accuracy; use --input
+with human-labelled messages for accuracy.
+"""
+from agents.model_router import ModelRouter, MODEL_PRICES
+from agents.sales_agent import SalesAgent
+from services.intent_classifier import IntentClassifier, load_examples, examples_from_applications
+from config import Config
+import agents.model_router as model_router
+import argparse
+import asyncio
+import random
+import time
+
+_TEMPLATES = {
+    "application": ["i want to apply for a personal loan of {amount}", "need a loan urgently for {purpose}",
+                    "please start my loan application, i require {amount}", "i want to borrow {amount} for {purpose}",
+                    "can you process a {amount} loan for my {purpose}", "apply for home loan"],
+    "inquiry": ["what is the interest rate on personal loans", "how does the emi work for {amount}",
+                "tell me the details about eligibility", "what documents are required",
+                "how long does approval take for a {purpose} loan", "information on processing fees please"],
+    "general": ["hello", "thanks for the help", "is anyone there", "good morning",
+                "my phone number changed", "ok"],
+}
+
+def synthetic_log(count: int, seed: int):
+    rng = random.Random(seed)
+    amounts = ["2 lakh", "rs 50000", "₹5,00,000", "1.5 lakh", "80k"]
+    purposes = ["wedding", "medical emergency", "education", "home renovation", "travel"]
+    log = []
+    for _ in range(count):
+        intent = rng.choice(list(_TEMPLATES))
+        message = rng.choice(_TEMPLATES[intent]).format(amount=rng.choice(amounts), purpose=rng.choice(purposes))
+        if rng.random() < 0.15:
+            message += rng.choice([", but it is too expensive", ", not sure about it", " asap"])
+        log.append((message, intent))
+    return log
+
+def _production_cost(router: ModelRouter, task: str, stats) -> float:
+    tier = router.tier_for(task)
+    model = "local" if tier == "local" else (Config.LLM_MODEL_SMALL if tier == "small" else Config.LLM_MODEL_LARGE)
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return stats.input_tokens / 1000 * price_in + stats.output_tokens / 1000 * price_out
+
+def run(log, train_fraction: float, seed: int, metric: str = "accuracy"):
+    rng = random.Random(seed)
+    rng.shuffle(log)
+    split = int(len(log) * train_fraction)
+    train, test = log[:split], log[split:]
+
+    router = ModelRouter()
+    model_router._router = router
+    if train:
+        router.intent_classifier = IntentClassifier.train(train)
+    agent = SalesAgent()
+    agent.log_action = lambda action, details: None
+
+    async def replay():
+        correct = 0
+        for message, label in test:
+            result = await agent.process({"message": message, "customer_data": {}})
+            correct += result["intent"]["type"] == label
+        return correct
+
+    start = time.perf_counter()
+    correct = asyncio.run(replay())
+    elapsed = time.perf_counter() - start
+    keyword_correct = sum(SalesAgent._keyword_intent_type(message.lower()) == label for message, label in test)
+
+    print(f"replayed {len(test):,} messages (trained on {len(train):,}) in {elapsed:.2f} s")
+    print(f"intent {metric}: routed {correct / max(len(test), 1):.1%} vs "
+          f"keyword rules {keyword_correct / max(len(test), 1):.1%}")
+    routed_cost = 0.0
+    for task, stats in router._stats.items():
+        summary = stats.summary()
+        cost = _production_cost(router, task, stats)
+        routed_cost += cost
+        print(f"  {task:<22} {router.tier_for(task):<6} calls {summary['calls']:>6,}  "
+              f"p50 {summary['latency_ms']['p50']} ms  p95 {summary['latency_ms']['p95']} ms  "
+              f"escalation {summary['escalation_rate']:.1%}  est. ${cost:.4f}")
+
+    # Baseline: keyword intent rules (no LLM call) and the same objection replies on the large model
+    large_in, large_out = MODEL_PRICES.get(Config.LLM_MODEL_LARGE, (0.0, 0.0))
+    objection = router._stats.get("objection_handling")
+    baseline = 0.0
+    if objection:
+        baseline += objection.input_tokens / 1000 * large_in + objection.output_tokens / 1000 * large_out
+    print(f"estimated cost: routed ${routed_cost:.4f} vs keyword rules + {Config.LLM_MODEL_LARGE} objections "
+          f"${baseline:.4f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="JSONL of {message, intent}; default is a synthetic log")
+    parser.add_argument("--from-db", action="store_true",
+                        help="replay messages from past loan applications (scores agreement with recorded labels)")
+    parser.add_argument("--synthetic", type=int, default=5_000)
+    parser.add_argument("--train-fraction", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    if args.from_db:
+        from services.database import DatabaseService
+        run(examples_from_applications(DatabaseService()), args.train_fraction, args.seed,
+            metric="agreement with recorded labels")
+    else:
+        log = load_examples(args.input) if args.input else synthetic_log(args.synthetic, args.seed)
+        run(log, args.train_fraction, args.seed)
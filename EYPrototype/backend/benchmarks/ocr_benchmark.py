@@ -0,0 +1,80 @@
+"""Throughput and cache benchmark for the OCR pipeline over synthetic ID scans"""
+from services.ocr import OcrService, OcrResultCache
+from services.object_store import LocalObjectStore
+from services.document_upload import DocumentUploadService
+from PIL import Image, ImageDraw, ImageFont
+import argparse
+import asyncio
+import io
+import os
+import random
+import string
+import tempfile
+import time
+
+def _synthetic_scan(index: int, doc_type: str) -> bytes:
+    """Render a fake PAN / Aadhaar card as a PNG"""
+    rng = random.Random(index)
+    name = f"{rng.choice(['ASHA', 'RAVI', 'MEERA', 'ARJUN'])} {rng.choice(['SHARMA', 'IYER', 'KHAN', 'PATEL'])}"
+    dob = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1960, 2002)}"
+    if doc_type == "pan":
+        id_number = "".join(rng.choices(string.ascii_uppercase, k=5)) + f"{rng.randint(0, 9999):04d}" + rng.choice(string.ascii_uppercase)
+        lines = ["INCOME TAX DEPARTMENT", "Name", name, "Date of Birth", dob, "Permanent Account Number", id_number]
+    else:
+        id_number = f"{rng.randint(2000, 9999)} {rng.randint(0, 9999):04d} {rng.randint(0, 9999):04d}"
+        lines = ["GOVERNMENT OF INDIA", name, f"DOB: {dob}", id_number]
+
+    image = Image.new("L", (1000, 640), color=255)
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 36)
+    except OSError:
+        font = ImageFont.load_default()
+    for i, line in enumerate(lines):
+        draw.text((40, 40 + i * 80), line, fill=0, font=font)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+async def _run_pass(service: OcrService, documents):
+    start = time.perf_counter()
+    for doc in documents:
+        await service.extract([doc])
+    return time.perf_counter() - start
+
+def run(corpus_size: int, workers: int, repeat_fraction: float):
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalObjectStore(os.path.join(root, "store"))
+        uploader = DocumentUploadService(store)
+        documents = []
+        for i in range(corpus_size):
+            doc_type = "pan" if i % 2 else "aadhaar"
+            documents.append(uploader.save_stream(io.BytesIO(_synthetic_scan(i, doc_type)), f"bench-{i}", doc_type))
+
+        service = OcrService(store, max_workers=workers, cache=OcrResultCache(cache_dir=""))
+        try:
+            # Cold pass: every page goes through Tesseract, fanned out over the pool
+            start = time.perf_counter()
+            asyncio.run(service.extract(documents))
+            cold = time.perf_counter() - start
+
+            # Replay traffic where a fraction of documents are re-verified
+            replay = documents + random.Random(0).sample(documents, int(corpus_size * repeat_fraction))
+            warm = asyncio.run(_run_pass(service, replay))
+            stats = service.stats()
+        finally:
+            service.shutdown()
+
+    print(f"corpus: {corpus_size} single-page scans, workers: {workers}")
+    print(f"cold: {corpus_size / cold:.1f} pages/s ({corpus_size / cold / workers:.2f} pages/s per core)")
+    print(f"replay of {len(replay)} documents: {warm * 1000 / len(replay):.3f} ms/document")
+    print(f"cache: {stats['cache']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat-fraction", type=float, default=0.5)
+    args = parser.parse_args()
+    run(args.corpus_size, args.workers, args.repeat_fraction)
@@ -0,0 +1,60 @@
+"""Load test for OTP verification at a target request rate"""
+from services.otp import OtpService, create_ttl_store
+from config import Config
+import argparse
+import random
+import threading
+import time
+
+def run(rate: int, duration: float, threads: int, phones: int, backend: str):
+    Config.OTP_RETURN_CODE_FOR_TESTS = True  # issue() returns the code so the test can answer correctly
+    Config.OTP_MAX_ATTEMPTS = 10 ** 9
+    service = OtpService(create_ttl_store(backend))
+    codes = {}
+    for i in range(phones):
+        phone = f"9{i:09d}"
+        codes[phone] = service.issue(phone)["debug_code"]
+    phone_list = list(codes)
+
+    latencies = [[] for _ in range(threads)]
+    per_thread_interval = threads / rate
+    deadline = time.perf_counter() + duration
+
+    def worker(slot: int):
+        rng = random.Random(slot)
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            phone = rng.choice(phone_list)
+            # Mostly wrong guesses so codes stay live; ~2% are correct and consume the code
+            code = codes[phone] if rng.random() < 0.02 else "000000"
+            start = time.perf_counter()
+            service.verify(phone, code, f"customer-{slot}")
+            latencies[slot].append(time.perf_counter() - start)
+            next_at += per_thread_interval
+            sleep_for = next_at - time.perf_counter()
+            if sleep_for > 0:
+                time.sleep(sleep_for)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    samples = sorted(l for per_thread in latencies for l in per_thread)
+    pct = lambda p: samples[min(int(len(samples) * p), len(samples) - 1)] * 1e6
+    print(f"backend: {backend}, target: {rate:,}/s, threads: {threads}")
+    print(f"achieved: {len(samples) / elapsed:,.0f} verifications/s over {elapsed:.1f} s")
+    print(f"latency: p50 {pct(0.50):.1f} us, p99 {pct(0.99):.1f} us, max {samples[-1] * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=int, default=10_000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--phones", type=int, default=10_000)
+    parser.add_argument("--backend", default="memory", choices=["memory", "redis", "fakeredis"])
+    args = parser.parse_args()
+    run(args.rate, args.duration, args.threads, args.phones, args.backend)
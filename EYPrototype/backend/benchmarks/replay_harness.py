@@ -0,0 +1,480 @@
+"""Replay and load test for the full MasterAgent workflow with stubbed backends.
+
+Feeds recorded (--input JSONL) or synthetic chat sessions through
+MasterAgent.process with --concurrency sessions in flight. The LLM, credit
+bureau, offer mart, OCR, face match, MongoDB and Twilio are replaced by
+stubs whose latency follows --latency specs, e.g.
+
+    python -m benchmarks.replay_harness --sessions 2000 --concurrency 50 \\
+        --latency llm=lognormal:600:0.5 bureau=lognormal:150:0.3 --time-scale 0.1
+
+A spec is "fixed:MS", "uniform:LOW_MS:HIGH_MS" or "lognormal:MEDIAN_MS:SIGMA";
+--time-scale multiplies every sampled latency. Reports per-node latency
+percentiles, throughput, LLM calls per route, the serialized size of each
+saved workflow state and (with --tracemalloc) allocations. Node latency is
+wall time between successive node completions, so it includes time spent
+waiting for the event loop behind other sessions.
+
+To show a change does not alter outcomes, save the decisions from one code
+version and compare them on the other with the same sessions:
+
+    python -m benchmarks.replay_harness --save-sessions s.jsonl --output before.jsonl
+    git checkout my-branch
+    python -m benchmarks.replay_harness --input s.jsonl --compare before.jsonl
+
+--compare exits with status 1 if any session's decision differs.
+
+--fast-path gives the agent a decision cache, so returning customers can be
+answered from their cached decision; --repeat-share makes that share of the
+synthetic sessions a later message from an earlier session's customer. The
+report then shows the share of sessions served by the fast path and their
+latency against sessions that ran the full workflow to a decision.
+
+Session lines are JSON objects with "message" and "customer_data" and,
+optionally, "session_id", "customer_id", "documents" and "fixtures" (the
+backend responses to replay: "credit_score", "offer_mart", "ocr_confidence",
+"selfie_confidence", "otp_verified").
+"""
+from agents.master_agent import MasterAgent
+from agents.model_router import ModelRouter
+from agents.stub_llm import StubChatModel, StubMessage
+from services.fraud_index import DuplicateApplicationIndex
+from services.identifiers import extract_identifiers
+from services.ip_reputation import IpReputationService
+from services.otp import OtpService, InMemoryTtlStore
+from services.decision_cache import DecisionCache
+from config import Config
+from typing import Dict, Any, List, Optional
+import agents.model_router as model_router
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+BACKENDS = ["llm", "bureau", "offer_mart", "ocr", "face", "mongo", "twilio"]
+
+DEFAULT_LATENCY = {
+    "llm": "lognormal:700:0.5",
+    "bureau": "lognormal:180:0.3",
+    "offer_mart": "lognormal:90:0.3",
+    "ocr": "lognormal:400:0.4",
+    "face": "lognormal:120:0.3",
+    "mongo": "lognormal:4:0.5",
+    "twilio": "lognormal:250:0.4",
+}
+
+# Fields compared between code versions; timestamps and file paths are left out
+DECISION_FIELDS = ["decision", "loan_amount", "interest_rate", "tenure_months", "emi_amount",
+                   "risk_score", "reason"]
+
+class Latency:
+    """Sampled backend latency in seconds"""
+
+    def __init__(self, spec: str, scale: float, seed: int):
+        kind, *params = spec.split(":")
+        if len(params) != {"fixed": 1, "uniform": 2, "lognormal": 2}.get(kind):
+            raise ValueError(f"Bad latency spec {spec!r}")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self.scale = scale
+        self.rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(*self.params)
+        else:
+            median, sigma = self.params
+            ms = self.rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return ms / 1000 * self.scale
+
+    async def wait(self):
+        seconds = self.sample()
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+class ReplayChatModel(StubChatModel):
+    """Stub LLM whose first token arrives after a sampled latency"""
+
+    def __init__(self, latency: Latency):
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+
+    def invoke(self, messages: Any) -> StubMessage:
+        self.calls += 1
+        time.sleep(self.latency.sample())
+        return StubMessage(self.reply)
+
+    async def ainvoke(self, messages: Any) -> StubMessage:
+        self.calls += 1
+        await self.latency.wait()
+        return StubMessage(self.reply)
+
+    async def astream(self, messages: Any):
+        self.calls += 1
+        await self.latency.wait()
+        for token in self._tokens():
+            yield StubMessage(token)
+
+class ReplayDatabase:
+    """In-memory stand-in for the loan_applications collection"""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.applications: Dict[str, Dict[str, Any]] = {}
+        self.result_bytes: List[int] = []  # serialized size of each saved workflow state
+
+    async def create_loan_application(self, application: Dict[str, Any]) -> str:
+        await self.latency.wait()
+        application_id = uuid.uuid4().hex
+        self.applications[application_id] = application
+        self.result_bytes.append(len(json.dumps(application.get("result"), default=str)))
+        return application_id
+
+_FIRST_NAMES = ["Aarav", "Diya", "Ishaan", "Meera", "Kabir", "Ananya", "Rohan", "Saanvi"]
+_MESSAGES = [
+    "I want to apply for a personal loan of {amount}",
+    "Please start my loan application, I need {amount} for {purpose}",
+    "Need a loan urgently for a {purpose}",
+    "Can you process a {amount} loan for my {purpose} asap",
+    "What is the interest rate on personal loans",
+    "I want to borrow {amount} but the interest rate is too expensive",
+    "hello",
+]
+
+def synthetic_sessions(count: int, seed: int, repeat_share: float = 0.0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    sessions = []
+    for i in range(count):
+        if repeat_share and sessions and rng.random() < repeat_share:
+            # The same customer again; their OTP verification from the first session is still valid
+            earlier = rng.choice(sessions)
+            fixtures = {k: v for k, v in earlier["fixtures"].items() if k != "otp_verified"}
+            sessions.append(dict(earlier, session_id=f"S{i:06d}", fixtures=fixtures))
+            continue
+        amount = rng.choice([50_000, 150_000, 200_000, 500_000, 800_000, 1_500_000])
+        message = rng.choice(_MESSAGES).format(
+            amount=f"₹{amount:,}", purpose=rng.choice(["wedding", "medical emergency", "education", "home renovation"]))
+        phone = f"9{i:09d}"
+        sessions.append({
+            "session_id": f"S{i:06d}",
+            "customer_id": f"C{i:06d}",
+            "message": message,
+            "customer_data": {
+                "customer_id": f"C{i:06d}",
+                "name": f"{rng.choice(_FIRST_NAMES)} {i}",
+                "phone": phone,
+                "email": f"customer{i}@example.com",
+                "requested_amount": amount,
+                "salary": rng.choice([30_000, 50_000, 80_000, 150_000]),
+            },
+            "documents": [],
+            "fixtures": {
+                "credit_score": {"score": int(rng.triangular(550, 880, 760)), "out_of": 900},
+                "offer_mart": {"pre_approval_limit": rng.choice([100_000, 300_000, 500_000, 1_000_000]),
+                               "eligibility": True},
+                "ocr_confidence": round(rng.uniform(0.6, 0.99), 2),
+                "selfie_confidence": round(rng.uniform(0.5, 0.99), 2),
+                "otp_verified": rng.random() < 0.9,
+            }
+        })
+    return sessions
+
+def load_sessions(path: str) -> List[Dict[str, Any]]:
+    sessions = []
+    with open(path) as f:
+        for number, line in enumerate(f):
+            if line.strip():
+                session = json.loads(line)
+                session.setdefault("session_id", f"S{number:06d}")
+                session.setdefault("customer_id", session.get("customer_data", {}).get("customer_id", session["session_id"]))
+                sessions.append(session)
+    return sessions
+
+class ReplayHarness:
+    """MasterAgent wired to stubbed backends, plus the measurements taken while replaying"""
+
+    def __init__(self, latency_specs: Dict[str, str], time_scale: float, seed: int, fast_path: bool = False):
+        self.latency = {name: Latency(latency_specs[name], time_scale, seed + i) for i, name in enumerate(BACKENDS)}
+        self.fixtures: Dict[str, Dict[str, Any]] = {}
+        self.otp_codes: Dict[str, str] = {}
+        self.node_latencies: Dict[str, List[float]] = {}
+        self.session_latencies: List[float] = []
+        self.path_latencies: Dict[str, List[float]] = {"fast path": [], "full decision": []}
+        self.errors = 0
+
+        Config.LLM_PROVIDER = "stub"
+        self.router = ModelRouter()
+        model_router._router = self.router
+        self.llm = ReplayChatModel(self.latency["llm"])
+        self.router._models["stub"] = self.llm
+
+        self.db = ReplayDatabase(self.latency["mongo"])
+        self.application_index = DuplicateApplicationIndex()
+        self.otp_service = OtpService(InMemoryTtlStore())
+        self.otp_service._deliver = self._deliver_otp
+        self.decision_cache = DecisionCache(InMemoryTtlStore()) if fast_path else None
+        self.agent = MasterAgent(application_index=self.application_index,
+                                 ip_reputation=IpReputationService({}), otp_service=self.otp_service,
+                                 decision_cache=self.decision_cache)
+        self.agent.warm_up()
+        self._stub_agents()
+
+    def _stub_agents(self):
+        agent = self.agent
+        agent._get_credit_score = self._credit_score
+        agent._get_offer_mart_data = self._offer_mart
+        agent.verification_agent.ocr_service.extract = self._ocr
+        agent.verification_agent.face_match_service.match = self._face_match
+        agent.sanction_agent._send_whatsapp = self._twilio_message("whatsapp")
+        agent.sanction_agent._send_sms = self._twilio_message("sms")
+        for worker in [agent, agent.sales_agent, agent.verification_agent,
+                       agent.underwriting_agent, agent.sanction_agent]:
+            worker.log_action = lambda action, details: None
+
+    def _fixture(self, customer_data: Dict[str, Any], key: str, default):
+        return self.fixtures.get(customer_data.get("customer_id"), {}).get(key, default)
+
+    async def _credit_score(self, customer_data: Dict[str, Any]) -> Dict[str, Any]:
+        await self.latency["bureau"].wait()
+        return self._fixture(customer_data, "credit_score", {"score": 750, "out_of": 900, "status": "good"})
+
+    async def _offer_mart(self, customer_data: Dict[str, Any]) -> Dict[str, Any]:
+        await self.latency["offer_mart"].wait()
+        return self._fixture(customer_data, "offer_mart", {"pre_approval_limit": 500000, "eligibility": True})
+
+    async def _ocr(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        await self.latency["ocr"].wait()
+        confidence = self.fixtures.get(self._current_customer(documents), {}).get("ocr_confidence", 0.0)
+        return {"status": "success", "results": {}, "confidence": confidence}
+
+    async def _face_match(self, documents: List[Dict[str, Any]], selfie_image: str) -> Dict[str, Any]:
+        await self.latency["face"].wait()
+        confidence = self.fixtures.get(self._current_customer(documents), {}).get("selfie_confidence", 0.0)
+        return {"status": "matched" if confidence > 0.80 else "not_matched", "confidence": confidence}
+
+    @staticmethod
+    def _current_customer(documents: List[Dict[str, Any]]) -> Optional[str]:
+        # Documents are tagged with the session's customer before replay
+        return documents[0].get("_replay_customer") if documents else None
+
+    def _twilio_message(self, channel: str):
+        async def send(phone: str, *args) -> Dict[str, Any]:
+            await self.latency["twilio"].wait()
+            return {"status": "sent", "channel": channel, "recipient": phone}
+        return send
+
+    def _deliver_otp(self, phone: str, code: str) -> Dict[str, Any]:
+        time.sleep(self.latency["twilio"].sample())
+        self.otp_codes[phone] = code
+        return {"status": "sent", "channel": "sms"}
+
+    def _prepare(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        customer_id = session["customer_id"]
+        customer_data = dict(session.get("customer_data", {}), customer_id=customer_id)
+        fixtures = session.get("fixtures", {})
+        self.fixtures[customer_id] = fixtures
+        documents = [dict(doc, _replay_customer=customer_id) for doc in session.get("documents") or []]
+        if not documents and ("ocr_confidence" in fixtures or "selfie_confidence" in fixtures):
+            documents = [{"type": "aadhaar", "_replay_customer": customer_id}]
+        if fixtures.get("otp_verified") and customer_data.get("phone") and not customer_data.get("otp_code"):
+            issued = self.otp_service.issue(customer_data["phone"])
+            customer_data["otp_code"] = self.otp_codes.get(issued["phone"])
+        return {
+            "customer_id": customer_id,
+            "message": session.get("message", ""),
+            "customer_data": customer_data,
+            "documents": documents
+        }
+
+    async def replay(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        context = self._prepare(session)
+        timeline = []
+        start = time.perf_counter()
+
+        def on_progress(node, state):
+            timeline.append((node, time.perf_counter()))
+
+        try:
+            result = await self.agent.process(context, on_progress=on_progress)
+        except Exception as e:
+            self.errors += 1
+            return {"session_id": session["session_id"], "error": f"{type(e).__name__}: {e}"}
+
+        application_id = await self.db.create_loan_application({
+            "customer_id": context["customer_id"], "message": context["message"], "result": result
+        })
+        self.application_index.add_application(
+            application_id, extract_identifiers(result.get("customer_data", context["customer_data"]),
+                                                context["documents"]), customer_id=context["customer_id"])
+        self.session_latencies.append(time.perf_counter() - start)
+        if result.get("fast_path"):
+            self.path_latencies["fast path"].append(self.session_latencies[-1])
+        elif result.get("final_decision"):
+            self.path_latencies["full decision"].append(self.session_latencies[-1])
+
+        previous = start
+        for node, at in timeline:
+            self.node_latencies.setdefault(node, []).append(at - previous)
+            previous = at
+        return summarize(session["session_id"], result, [node for node, _ in timeline])
+
+    async def run(self, sessions: List[Dict[str, Any]], concurrency: int) -> List[Dict[str, Any]]:
+        gate = asyncio.Semaphore(concurrency)
+
+        async def bounded(session):
+            async with gate:
+                return await self.replay(session)
+
+        return await asyncio.gather(*(bounded(s) for s in sessions))
+
+def summarize(session_id: str, result: Dict[str, Any], path: List[str]) -> Dict[str, Any]:
+    """The outcome fields of one session that must not change between code versions"""
+    underwriting = result.get("underwriting_result") or {}
+    sales = result.get("sales_result") or {}
+    return {
+        "session_id": session_id,
+        "path": path,
+        "intent": (sales.get("intent") or {}).get("type"),
+        "objection": sales.get("objection_detected"),
+        "status": result.get("status"),
+        "final_decision": result.get("final_decision"),
+        "verification_confidence": (result.get("verification_result") or {}).get("confidence_score"),
+        **{f"underwriting_{field}": underwriting.get(field) for field in DECISION_FIELDS}
+    }
+
+def compare(decisions: List[Dict[str, Any]], baseline_path: str, show: int = 10) -> int:
+    """Print sessions whose outcome differs from a saved run; returns the number that differ"""
+    with open(baseline_path) as f:
+        baseline = {record["session_id"]: record for record in map(json.loads, filter(str.strip, f))}
+    changed, missing = [], 0
+    for record in decisions:
+        before = baseline.get(record["session_id"])
+        if before is None:
+            missing += 1
+            continue
+        fields = sorted(k for k in set(before) | set(record) if before.get(k) != record.get(k))
+        if fields:
+            changed.append((record["session_id"], {k: (before.get(k), record.get(k)) for k in fields}))
+    print(f"compared {len(decisions) - missing:,} sessions with {baseline_path}: {len(changed):,} differ"
+          + (f", {missing:,} not in baseline" if missing else ""))
+    for session_id, fields in changed[:show]:
+        print(f"  {session_id}: " + ", ".join(f"{k} {a!r} -> {b!r}" for k, (a, b) in fields.items()))
+    return len(changed)
+
+def _percentiles(samples: List[float]) -> str:
+    samples = sorted(samples)
+    pct = lambda p: samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+    return f"p50 {pct(0.5):8.1f}  p95 {pct(0.95):8.1f}  p99 {pct(0.99):8.1f} ms"
+
+def report(harness: ReplayHarness, decisions: List[Dict[str, Any]], elapsed: float, memory):
+    completed = len(harness.session_latencies)
+    print(f"replayed {len(decisions):,} sessions in {elapsed:.2f} s: {completed / elapsed:,.1f} sessions/s, "
+          f"{harness.errors:,} errors")
+    if harness.session_latencies:
+        print(f"  {'end to end':<24} {_percentiles(harness.session_latencies)}")
+    if harness.decision_cache is not None:
+        served = len(harness.path_latencies["fast path"])
+        print(f"fast path: {served:,} of {len(decisions):,} sessions ({served / max(len(decisions), 1):.1%}), "
+              f"cache {harness.decision_cache.stats()}")
+        for path, samples in harness.path_latencies.items():
+            if samples:
+                print(f"  {path:<24} {_percentiles(samples)}  ({len(samples):,} sessions)")
+    for node, samples in harness.node_latencies.items():
+        print(f"  {node:<24} {_percentiles(samples)}  ({len(samples):,} runs)")
+
+    outcomes: Dict[str, int] = {}
+    for record in decisions:
+        if "error" in record:
+            key = "error"
+        else:
+            key = record["final_decision"] or f"ended at {record['path'][-1] if record['path'] else '?'}"
+        outcomes[key] = outcomes.get(key, 0) + 1
+    print("outcomes: " + ", ".join(f"{k} {v:,}" for k, v in sorted(outcomes.items())))
+
+    print(f"LLM calls: {harness.llm.calls:,} ({harness.llm.calls / max(len(decisions), 1):.2f} per session)")
+    for task, stats in harness.router._stats.items():
+        summary = stats.summary()
+        print(f"  {task:<24} {summary['calls']:>8,} calls  escalations {summary['escalations']:,}")
+
+    sizes = sorted(harness.db.result_bytes)
+    if sizes:
+        print(f"saved state: mean {sum(sizes) / len(sizes) / 1024:.1f} KiB, "
+              f"max {sizes[-1] / 1024:.1f} KiB per application (JSON)")
+
+    if memory:
+        peak, top = memory
+        print(f"allocations: peak traced {peak / 2 ** 20:.1f} MiB, "
+              f"{peak / max(len(decisions), 1) / 1024:.1f} KiB per session at peak")
+        for stat in top:
+            print(f"  {stat.size_diff / 1024:>10.1f} KiB  {stat.count_diff:>8,} blocks  {stat.traceback[0]}")
+
+def run(args) -> int:
+    specs = dict(DEFAULT_LATENCY)
+    for entry in args.latency:
+        name, _, spec = entry.partition("=")
+        if name not in specs:
+            raise SystemExit(f"Unknown backend {name!r}; expected one of {', '.join(BACKENDS)}")
+        specs[name] = spec
+
+    sessions = load_sessions(args.input) if args.input else synthetic_sessions(args.sessions, args.seed, args.repeat_share)
+    if args.save_sessions:
+        with open(args.save_sessions, "w") as f:
+            f.writelines(json.dumps(s) + "\n" for s in sessions)
+
+    # Sanction letters are written to the working directory
+    workdir = tempfile.mkdtemp(prefix="replay-")
+    cwd = os.getcwd()
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(workdir)
+    try:
+        harness = ReplayHarness(specs, args.time_scale, args.seed, args.fast_path)
+        memory = None
+        if args.tracemalloc:
+            tracemalloc.start(10)
+            before = tracemalloc.take_snapshot()
+        start = time.perf_counter()
+        decisions = asyncio.run(harness.run(sessions, args.concurrency))
+        elapsed = time.perf_counter() - start
+        if args.tracemalloc:
+            after = tracemalloc.take_snapshot()
+            memory = (tracemalloc.get_traced_memory()[1], after.compare_to(before, "lineno")[:5])
+            tracemalloc.stop()
+    finally:
+        os.chdir(cwd)
+
+    report(harness, decisions, elapsed, memory)
+    if output:
+        with open(output, "w") as f:
+            f.writelines(json.dumps(d, sort_keys=True) + "\n" for d in decisions)
+    if baseline:
+        return 1 if compare(decisions, baseline) else 0
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="JSONL of recorded sessions; default is synthetic sessions")
+    parser.add_argument("--sessions", type=int, default=500, help="number of synthetic sessions")
+    parser.add_argument("--repeat-share", type=float, default=0.0,
+                        help="share of synthetic sessions that are a returning customer")
+    parser.add_argument("--fast-path", action="store_true", help="answer returning customers from a decision cache")
+    parser.add_argument("--save-sessions", help="write the replayed sessions to this JSONL file")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", nargs="*", default=[], metavar="BACKEND=SPEC",
+                        help=f"backends: {', '.join(BACKENDS)}")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="multiplier for every stub latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tracemalloc", action="store_true", help="trace allocations (slows the run)")
+    parser.add_argument("--output", help="write per-session decisions to this JSONL file")
+    parser.add_argument("--compare", help="decisions JSONL from another code version to diff against")
+    sys.exit(run(parser.parse_args()))
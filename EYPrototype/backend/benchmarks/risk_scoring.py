@@ -0,0 +1,110 @@
+"""Risk scoring cost: the fixed-profile formula against the learned model.
+
+Trains a model on synthetic applicants, publishes it to a registry in a
+temporary directory and measures:
+  formula   UnderwritingAgent._calculate_risk_score with the fixed profile risk
+  model     registry.score (feature extraction + dot product) per applicant
+  batch     registry.score_batch over pre-built feature matrices
+While --swap-threads score continuously, new versions are published and
+activated to check hot swaps never fail a request.
+"""
+from config import Config
+import argparse
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+
+def _applicants(count, seed):
+    rng = random.Random(seed)
+    types = ["Personal Loan", "Home Loan", "Business Loan", "Education Loan", "Auto Loan", "Gold Loan"]
+    return [{
+        "salary": rng.lognormvariate(math.log(45_000), 0.5),
+        "requested_amount": rng.choice([100_000, 250_000, 500_000, 1_000_000]),
+        "employment_type": rng.choice(["salaried", "salaried", "self_employed"]),
+        "age": rng.randint(21, 60),
+        "loan_type": rng.choice(types),
+        "salary_slip": rng.random() < 0.6
+    } for _ in range(count)]
+
+def _spec(applicants, seed):
+    import numpy as np
+    from services.risk_model import FEATURES, fit_logistic, profile_features, profile_inputs
+    rng = np.random.default_rng(seed)
+    X = np.array([profile_features(profile_inputs(a)) for a in applicants])
+    y = (rng.random(len(X)) < 1 / (1 + np.exp(3 - 0.8 * X[:, 2] - 0.7 * X[:, 6]))).astype(float)
+    weights, bias, mean, scale = fit_logistic(X, y)
+    return {"version": f"bench-{seed}", "features": FEATURES, "weights": weights.tolist(), "bias": bias,
+            "mean": mean.tolist(), "scale": scale.tolist(), "metrics": {}}
+
+def _timed(fn, rows):
+    samples = []
+    for row in rows:
+        start = time.perf_counter()
+        fn(row)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    pick = lambda p: samples[min(int(len(samples) * p), len(samples) - 1)] * 1e6
+    return pick(0.5), pick(0.99), len(samples) / sum(samples)
+
+def run(args):
+    import numpy as np
+    from agents.underwriting_agent import UnderwritingAgent
+    from services.model_registry import ModelRegistry
+    from services.risk_model import profile_features, profile_inputs
+
+    applicants = _applicants(args.rows, args.seed)
+    registry = ModelRegistry(tempfile.mkdtemp(prefix="risk-models-"))
+    registry.publish(_spec(applicants[:20_000], args.seed))
+    agent = UnderwritingAgent.__new__(UnderwritingAgent)  # only the scoring helpers are used
+
+    formula = lambda a: agent._calculate_risk_score(750, 0.8, a, Config.DEFAULT_PROFILE_RISK)
+    with_model = lambda a: agent._calculate_risk_score(750, 0.8, a, registry.score(a))
+    print(f"{'path':<22}{'p50 us':>10}{'p99 us':>10}{'rows/s':>14}")
+    for name, fn in [("formula (fixed)", formula), ("formula + model", with_model), ("model score only", registry.score)]:
+        p50, p99, rate = _timed(fn, applicants)
+        print(f"{name:<22}{p50:>10.2f}{p99:>10.2f}{rate:>14,.0f}")
+
+    start = time.perf_counter()
+    features = np.array([profile_features(profile_inputs(a)) for a in applicants])
+    extract = time.perf_counter() - start
+    start = time.perf_counter()
+    for chunk in range(0, len(features), args.batch_size):
+        registry.score_batch(features[chunk:chunk + args.batch_size])
+    scoring = time.perf_counter() - start
+    print(f"batch of {args.batch_size:,}: features {len(features) / extract:,.0f} rows/s, "
+          f"scoring {len(features) / scoring:,.0f} rows/s")
+
+    errors = []
+    stop = threading.Event()
+
+    def score_forever():
+        while not stop.is_set():
+            try:
+                if registry.score(applicants[0]) is None:
+                    errors.append("no model")
+            except Exception as e:
+                errors.append(repr(e))
+
+    threads = [threading.Thread(target=score_forever, daemon=True) for _ in range(args.swap_threads)]
+    for thread in threads:
+        thread.start()
+    for i in range(args.swaps):
+        registry.publish(_spec(applicants[:2_000], args.seed + i + 1))
+    stop.set()
+    for thread in threads:
+        thread.join()
+    print(f"{args.swaps} hot swaps under {args.swap_threads} scoring threads: {len(errors)} errors; "
+          f"now {registry.current_version}")
+    print(f"registry stats: {registry.stats()['single']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--swaps", type=int, default=50)
+    parser.add_argument("--swap-threads", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
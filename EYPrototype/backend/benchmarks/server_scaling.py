@@ -0,0 +1,92 @@
+"""Chat throughput of the production server as the worker count grows.
+
+Starts `gunicorn -c gunicorn.conf.py app:app` once per worker count, waits
+for /api/ready, then drives a fixed number of concurrent clients. /api/chat
+needs MongoDB; pass --path /api/health to measure the server alone. More
+than one worker is refused unless SOCKETIO_MESSAGE_QUEUE is set and the
+TtlStore backends are redis (see gunicorn.conf.py), so set those first.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import requests
+
+def _wait_ready(base_url: str, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/ready", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"server at {base_url} not ready after {timeout:.0f} s")
+
+def _drive(base_url: str, path: str, clients: int, duration: float):
+    payload = {
+        "message": "I need a personal loan of 2 lakh urgently",
+        "customer_data": {"name": "Load Test", "phone": "9876543210", "monthly_income": 60000}
+    }
+    deadline = time.perf_counter() + duration
+
+    def client(slot: int):
+        session = requests.Session()
+        latencies, errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if path == "/api/chat":
+                    response = session.post(f"{base_url}{path}", json=payload, timeout=60)
+                else:
+                    response = session.get(f"{base_url}{path}", timeout=60)
+                errors += response.status_code >= 500
+            except requests.RequestException:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+    samples = sorted(l for latencies, _ in results for l in latencies)
+    errors = sum(e for _, e in results)
+    return samples, errors, elapsed
+
+def run(worker_counts, path: str, clients: int, duration: float, port: int):
+    base_url = f"http://127.0.0.1:{port}"
+    baseline = None
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for workers in worker_counts:
+        env = dict(os.environ, SERVER_WORKERS=str(workers), SERVER_BIND=f"127.0.0.1:{port}")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", "/dev/null", "app:app"],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            _wait_ready(base_url, timeout=120)
+            samples, errors, elapsed = _drive(base_url, path, clients, duration)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=120)
+
+        rate = len(samples) / elapsed
+        baseline = baseline or rate
+        pct = lambda p: samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+        print(f"{workers:>7} {rate:>9,.0f} {rate / baseline:>7.2f}x {pct(0.5):>8.1f} {pct(0.99):>8.1f} {errors:>7}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count()}",
+                        help="comma separated worker counts")
+    parser.add_argument("--path", default="/api/chat")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+    counts = sorted({int(w) for w in args.workers.split(",") if w})
+    run(counts, args.path, args.clients, args.duration, args.port)
@@ -0,0 +1,120 @@
+"""Room fan-out load test: many connected sockets, updates delivered per room.
+
+Starts the app's Socket.IO server in a subprocess, connects --sockets
+websocket clients (each subscribed to one of --customers customer rooms),
+then publishes --updates loan_update events to random customers. Reports
+how many messages each update fanned out to and the delivery latency.
+--broadcast publishes without a room, as chat() used to.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import requests
+import socketio
+
+_SERVER = """
+import json, random, time, sys
+import app
+from flask import request
+
+@app.app.route('/bench/publish', methods=['POST'])
+def bench_publish():
+    spec = request.json
+    rng = random.Random(0)
+    interval = 1.0 / spec['rate']
+    for i in range(spec['updates']):
+        customer = f"C{rng.randrange(spec['customers'])}"
+        payload = {"customer_id": customer, "seq": i, "sent_at": time.time()}
+        if spec['broadcast']:
+            app.socketio.emit('loan_update', payload)
+        else:
+            app.update_publisher.publish('loan_update', app.customer_room(customer), payload)
+        time.sleep(interval)
+    app.update_publisher.flush()
+    return json.dumps(app.update_publisher.stats())
+
+app.socketio.run(app.app, host='127.0.0.1', port=int(sys.argv[1]), allow_unsafe_werkzeug=True, log_output=False)
+"""
+
+async def _connect_all(url: str, sockets: int, customers: int, batch: int):
+    received = [0] * sockets
+    latencies = []
+    clients = []
+
+    def make_handler(slot):
+        def on_update(data):
+            received[slot] += 1
+            latencies.append(time.time() - data["sent_at"])
+        return on_update
+
+    async def connect(slot):
+        client = socketio.AsyncClient(reconnection=False)
+        client.on('loan_update', make_handler(slot))
+        try:
+            await client.connect(url, transports=['websocket'], wait_timeout=60)
+        except Exception:
+            await client.disconnect()
+            raise
+        await client.emit('subscribe', {'customer_id': f"C{slot % customers}"})
+        clients.append(client)
+
+    for start in range(0, sockets, batch):
+        results = await asyncio.gather(*(connect(i) for i in range(start, min(start + batch, sockets))),
+                                       return_exceptions=True)
+        failures = [r for r in results if isinstance(r, Exception)]
+        if failures:
+            print(f"{len(failures)} connections failed, e.g. {failures[0]!r}")
+    return clients, received, latencies
+
+async def _run(url: str, args):
+    start = time.perf_counter()
+    clients, received, latencies = await _connect_all(url, args.sockets, args.customers, args.batch)
+    print(f"connected {len(clients):,} sockets in {time.perf_counter() - start:.1f} s")
+
+    loop = asyncio.get_running_loop()
+    spec = {"updates": args.updates, "rate": args.rate, "customers": args.customers, "broadcast": args.broadcast}
+    response = await loop.run_in_executor(None, lambda: requests.post(f"{url}/bench/publish", json=spec, timeout=600))
+    stats = json.loads(response.text)
+    await asyncio.sleep(2)  # let the last emits arrive
+
+    total = sum(received)
+    samples = sorted(latencies)
+    pct = lambda p: samples[min(int(len(samples) * p), len(samples) - 1)] * 1000 if samples else float("nan")
+    print(f"mode: {'broadcast' if args.broadcast else 'rooms'}, updates: {args.updates:,}, "
+          f"room emits after coalescing: {stats['emitted']:,}")
+    print(f"messages delivered: {total:,} ({total / max(args.updates, 1):,.1f} per update)")
+    print(f"delivery latency: p50 {pct(0.5):.1f} ms, p99 {pct(0.99):.1f} ms")
+    await asyncio.gather(*(c.disconnect() for c in clients), return_exceptions=True)
+
+def run(args):
+    env = dict(os.environ, SOCKETIO_COALESCE_SECONDS=str(args.coalesce), WARM_UP_ON_START="False")
+    server = subprocess.Popen([sys.executable, "-c", _SERVER, str(args.port)], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        for _ in range(120):
+            try:
+                requests.get(f"{url}/api/health", timeout=1)
+                break
+            except requests.RequestException:
+                time.sleep(0.5)
+        asyncio.run(_run(url, args))
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=10_000)
+    parser.add_argument("--customers", type=int, default=5_000)
+    parser.add_argument("--updates", type=int, default=2_000)
+    parser.add_argument("--rate", type=float, default=500.0, help="updates published per second")
+    parser.add_argument("--coalesce", type=float, default=0.1, help="SOCKETIO_COALESCE_SECONDS for the server")
+    parser.add_argument("--batch", type=int, default=200, help="concurrent connection attempts")
+    parser.add_argument("--broadcast", action="store_true")
+    parser.add_argument("--port", type=int, default=5057)
+    run(parser.parse_args())
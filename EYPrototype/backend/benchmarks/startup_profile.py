@@ -0,0 +1,73 @@
+"""Startup profile: import-time breakdown by package and time to first request"""
+from collections import defaultdict
+import argparse
+import json
+import subprocess
+import sys
+
+# Runs in a fresh interpreter so nothing is already imported
+_FIRST_REQUEST = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get('/api/health')
+first = time.perf_counter()
+timings = {"import_app": imported - start, "first_request": first - start, "status": response.status_code}
+if WARM:
+    for component in app.warm_components:
+        try:
+            component.warm()
+        except Exception as e:
+            print(f"warm-up failed: {e}")
+    timings["warm_up"] = time.perf_counter() - first
+    timings["components"] = [component.status() for component in app.warm_components]
+print("RESULT " + json.dumps(timings))
+"""
+
+def import_breakdown(module: str):
+    """Parse `python -X importtime` output into self time per top-level package"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True)
+    per_package = defaultdict(int)
+    total = 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        per_package[name.split(".")[0]] += int(self_us)
+        total += int(self_us)
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1])
+    return total, sorted(per_package.items(), key=lambda item: item[1], reverse=True)
+
+def first_request(warm: bool):
+    proc = subprocess.run([sys.executable, "-c", f"WARM = {warm}\n" + _FIRST_REQUEST],
+                          capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(proc.stderr.strip() or "startup failed")
+
+def run(module: str, top: int, warm: bool):
+    total, packages = import_breakdown(module)
+    print(f"import {module}: {total / 1000:.0f} ms total self time")
+    for name, self_us in packages[:top]:
+        print(f"  {name:<28} {self_us / 1000:8.1f} ms  {self_us / max(total, 1):6.1%}")
+
+    timings = first_request(warm)
+    print(f"import app: {timings['import_app'] * 1000:.0f} ms, "
+          f"first /api/health response: {timings['first_request'] * 1000:.0f} ms after start")
+    if warm:
+        print(f"background warm-up: {timings['warm_up']:.2f} s")
+        for component in timings["components"]:
+            print(f"  {component['name']:<20} ready={component['ready']} "
+                  f"init={component['init_seconds']} s {component['error'] or ''}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--warm", action="store_true", help="also time building the lazy components")
+    args = parser.parse_args()
+    run(args.module, args.top, args.warm)
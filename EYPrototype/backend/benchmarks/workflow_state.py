@@ -0,0 +1,68 @@
+"""Workflow state cost: allocations, time and saved size per MasterAgent request.
+
+Replays synthetic sessions one at a time through the replay harness with
+zero backend latency, so only the graph and the agents' own work is
+measured. The first --sessions run untraced to warm every path and are
+timed; the next --sessions run under tracemalloc and report the peak
+memory each request allocated above what was live before it. Sizes are the
+JSON of the final state (what /api/chat returns and loan_applications
+stores) and of its history.
+"""
+from benchmarks.replay_harness import BACKENDS, ReplayHarness, synthetic_sessions
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+def _summary(values, scale=1.0, unit=""):
+    ordered = sorted(values)
+    pick = lambda p: ordered[min(int(len(ordered) * p), len(ordered) - 1)] / scale
+    return f"mean {sum(ordered) / len(ordered) / scale:8.1f}  p50 {pick(0.5):8.1f}  p95 {pick(0.95):8.1f} {unit}"
+
+async def _measure(harness, sessions, traced: bool):
+    seconds, peaks, paths = [], [], {}
+    for session in sessions:
+        if traced:
+            tracemalloc.reset_peak()
+            live = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        record = await harness.replay(session)
+        seconds.append(time.perf_counter() - start)
+        if traced:
+            peaks.append(tracemalloc.get_traced_memory()[1] - live)
+        path = record.get("final_decision") or f"ended at {record['path'][-1]}"
+        paths[path] = paths.get(path, 0) + 1
+    return seconds, peaks, paths
+
+def run(args):
+    sessions = synthetic_sessions(2 * args.sessions, args.seed)
+    workdir = tempfile.mkdtemp(prefix="workflow-state-")  # sanction letters are written here
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        harness = ReplayHarness({name: "fixed:0" for name in BACKENDS}, 0.0, args.seed)
+        seconds, _, paths = asyncio.run(_measure(harness, sessions[:args.sessions], traced=False))
+        tracemalloc.start(args.frames)
+        _, peaks, _ = asyncio.run(_measure(harness, sessions[args.sessions:], traced=True))
+        tracemalloc.stop()
+    finally:
+        os.chdir(cwd)
+
+    results = [application["result"] for application in harness.db.applications.values()]
+    state = [len(json.dumps(result, default=str)) for result in results]
+    history = [len(json.dumps(result.get("history"), default=str)) for result in results]
+    print("paths: " + ", ".join(f"{path} {count:,}" for path, count in sorted(paths.items())))
+    print(f"{'time per request':<22}{_summary(seconds, 1e-3, 'ms')}")
+    print(f"{'allocated per request':<22}{_summary(peaks, 1024, 'KiB (traced peak)')}")
+    print(f"{'saved state':<22}{_summary(state, 1024, 'KiB JSON')}")
+    print(f"{'  of which history':<22}{_summary(history, 1024, 'KiB JSON')}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500, help="sessions per pass (timed, then traced)")
+    parser.add_argument("--frames", type=int, default=1, help="tracemalloc traceback depth")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -6,9 +6,21 @@ load_dotenv()
 class Config:
     # OpenAI Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
+    # 'openai', or 'stub' for the offline streaming model used in tests
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'openai')
+    LLM_STUB_TOKEN_DELAY = float(os.getenv('LLM_STUB_TOKEN_DELAY', '0.02'))
+    
+    # Model routing: tier per call site, e.g. "objection_handling:small,default:large"
+    LLM_MODEL_LARGE = os.getenv('LLM_MODEL_LARGE', 'gpt-4')
+    LLM_MODEL_SMALL = os.getenv('LLM_MODEL_SMALL', 'gpt-4o-mini')
+    LLM_ROUTES = os.getenv('LLM_ROUTES', '')
+    # Local intent classifier; predictions below the threshold escalate to the large model
+    INTENT_MODEL_PATH = os.getenv('INTENT_MODEL_PATH', 'models/intent_classifier.json')
+    INTENT_CONFIDENCE_THRESHOLD = float(os.getenv('INTENT_CONFIDENCE_THRESHOLD', '0.8'))
     
     # Flask Configuration
-    SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+    DEV_SECRET_KEY = 'dev-secret-key-change-in-production'  # public; room tokens are refused while it is in use
+    SECRET_KEY = os.getenv('SECRET_KEY', DEV_SECRET_KEY)
     DEBUG = os.getenv('DEBUG', 'True') == 'True'
     
     # Database Configuration
@@ -22,6 +34,7 @@ class Config:
     TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', '')
     TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', '')
     TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER', '')
+    TWILIO_SMS_NUMBER = os.getenv('TWILIO_SMS_NUMBER', '')
     
     # Credit Bureau & Offer Mart APIs
     CREDIT_BUREAU_API_KEY = os.getenv('CREDIT_BUREAU_API_KEY', '')
@@ -41,6 +54,151 @@ class Config:
     # EMI Threshold
     EMI_SALARY_RATIO_THRESHOLD = 0.50
     
+    # Document Upload Configuration
+    UPLOAD_STORE_BACKEND = os.getenv('UPLOAD_STORE_BACKEND', 'local')
+    UPLOAD_DIR = os.getenv('UPLOAD_DIR', 'uploads')
+    MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', str(100 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+    UPLOAD_SESSION_TTL_SECONDS = 24 * 60 * 60
+    # Resumable upload sessions: memory, redis or fakeredis (redis lets any worker take the next chunk)
+    UPLOAD_SESSION_STORE_BACKEND = os.getenv('UPLOAD_SESSION_STORE_BACKEND', os.getenv('OTP_STORE_BACKEND', 'memory'))
+    UPLOAD_SESSION_LOCK_SECONDS = 300  # longest a single chunk request may hold its upload
+    
+    # OCR Configuration
+    OCR_WORKERS = int(os.getenv('OCR_WORKERS', '0'))  # 0 = one per CPU core
+    OCR_LANG = os.getenv('OCR_LANG', 'eng')
+    OCR_DPI = 300
+    OCR_CACHE_SIZE = 1024
+    OCR_CACHE_DIR = os.getenv('OCR_CACHE_DIR', 'ocr_cache')
+    # Score reported while Tesseract is not installed: the fixed value verification used before local OCR
+    OCR_UNAVAILABLE_CONFIDENCE = 0.92
+    
+    # Face Match Configuration (OpenCV YuNet detector + SFace recognizer). The ONNX files come from
+    # OpenCV Zoo (github.com/opencv/opencv_zoo, models/face_detection_yunet and models/face_recognition_sface);
+    # download commands are in benchmarks/face_match_benchmark.py
+    FACE_DETECTOR_MODEL = os.getenv('FACE_DETECTOR_MODEL', 'models/face_detection_yunet_2023mar.onnx')
+    FACE_RECOGNIZER_MODEL = os.getenv('FACE_RECOGNIZER_MODEL', 'models/face_recognition_sface_2021dec.onnx')
+    FACE_MATCH_SIMILARITY_THRESHOLD = 0.363  # SFace cosine threshold
+    FACE_EMBEDDING_CACHE_SIZE = 4096
+    
+    # Duplicate Application / Fraud Ring Index
+    DUPLICATE_LOOKBACK_DAYS = 30
+    FRAUD_RING_MIN_SIZE = 5
+    FRAUD_INDEX_SYNC_INTERVAL_SECONDS = 30
+    FRAUD_INDEX_COMPACT_THRESHOLD = 100000
+    # Change-feed readers re-read this window behind their cursor: updated_at is stamped before
+    # the write commits, so a slow writer can land behind a cursor that was already passed
+    CHANGE_FEED_OVERLAP_SECONDS = float(os.getenv('CHANGE_FEED_OVERLAP_SECONDS', '5'))
+    
+    # IP Reputation Lists (comma-separated category:path, e.g. vpn:lists/vpn.txt)
+    IP_REPUTATION_LISTS = os.getenv('IP_REPUTATION_LISTS', '')
+    IP_REPUTATION_RELOAD_INTERVAL_SECONDS = 60
+    IP_UNKNOWN_RISK = 0.1
+    
+    # OTP Configuration
+    OTP_STORE_BACKEND = os.getenv('OTP_STORE_BACKEND', 'memory')  # memory, redis or fakeredis
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    OTP_STORE_SHARDS = 64
+    OTP_LENGTH = 6
+    OTP_TTL_SECONDS = 300
+    OTP_MAX_ATTEMPTS = 5
+    OTP_RESEND_COOLDOWN_SECONDS = 30
+    OTP_MAX_ISSUES_PER_WINDOW = 5
+    OTP_ISSUE_WINDOW_SECONDS = 15 * 60
+    OTP_VERIFIED_TTL_SECONDS = 15 * 60
+    # Echo the issued code in the API response; for load tests only, never enable in a deployment
+    OTP_RETURN_CODE_FOR_TESTS = os.getenv('OTP_RETURN_CODE_FOR_TESTS', 'False') == 'True'
+    
+    # Startup Configuration
+    # Warm agents, the fraud index and IP lists in the background after boot
+    # instead of blocking the first request (or waiting for /api/ready)
+    WARM_UP_ON_START = os.getenv('WARM_UP_ON_START', 'True') == 'True'
+    
+    # Streaming chat (/api/chat/stream)
+    CHAT_STREAM_WORKERS = int(os.getenv('CHAT_STREAM_WORKERS', '16'))
+    CHAT_STREAM_HEARTBEAT_SECONDS = float(os.getenv('CHAT_STREAM_HEARTBEAT_SECONDS', '15'))
+    
+    # Dashboard aggregates are re-read from MongoDB at most this often per worker
+    DASHBOARD_STATS_TTL_SECONDS = float(os.getenv('DASHBOARD_STATS_TTL_SECONDS', '5'))
+    
+    # Underwriting policy (rule tables per loan product), hot-reloaded when the file changes
+    UNDERWRITING_POLICY_PATH = os.getenv('UNDERWRITING_POLICY_PATH',
+                                         os.path.join(os.path.dirname(os.path.abspath(__file__)), 'policies', 'underwriting.json'))
+    # Optional second policy evaluated alongside the live one for A/B comparison
+    UNDERWRITING_CHALLENGER_POLICY_PATH = os.getenv('UNDERWRITING_CHALLENGER_POLICY_PATH', '')
+    UNDERWRITING_CHALLENGER_SHARE = float(os.getenv('UNDERWRITING_CHALLENGER_SHARE', '0'))  # customers decided by the challenger
+    UNDERWRITING_POLICY_RELOAD_INTERVAL_SECONDS = 30
+    
+    # Feedback store (Parquet decisions and repayment outcomes) and the profile risk model trained on it
+    FEEDBACK_DIR = os.getenv('FEEDBACK_DIR', 'feedback')
+    FEEDBACK_FLUSH_ROWS = int(os.getenv('FEEDBACK_FLUSH_ROWS', '1000'))
+    FEEDBACK_FLUSH_SECONDS = float(os.getenv('FEEDBACK_FLUSH_SECONDS', '60'))
+    RISK_MODEL_DIR = os.getenv('RISK_MODEL_DIR', 'models/risk')  # published versions and the CURRENT pointer
+    RISK_MODEL_RELOAD_INTERVAL_SECONDS = 30
+    RISK_MODEL_LATENCY_SAMPLES = 10000  # recent scoring latencies kept for percentiles
+    DEFAULT_PROFILE_RISK = 0.3  # profile risk used until a model has been trained
+    
+    # Memory-mapped customer history snapshot read by underwriting
+    CUSTOMER_SNAPSHOT_DIR = os.getenv('CUSTOMER_SNAPSHOT_DIR', 'snapshots/customers')
+    CUSTOMER_SNAPSHOT_REFRESH_SECONDS = 15  # how often workers check for a newer snapshot
+    CUSTOMER_SNAPSHOT_BUILD_INTERVAL_SECONDS = float(os.getenv('CUSTOMER_SNAPSHOT_BUILD_INTERVAL_SECONDS', '900'))  # 0 = external builds only
+    CUSTOMER_SNAPSHOT_KEEP = 3
+    
+    # Fast path: returning customers with a verified KYC, bureau score and offer-mart limit still
+    # cached get the decision made from them again, without re-running verification or underwriting
+    FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'True') == 'True'
+    FAST_PATH_STORE_BACKEND = os.getenv('FAST_PATH_STORE_BACKEND', OTP_STORE_BACKEND)  # memory, redis or fakeredis
+    FAST_PATH_KYC_TTL_SECONDS = int(os.getenv('FAST_PATH_KYC_TTL_SECONDS', str(24 * 60 * 60)))
+    FAST_PATH_BUREAU_TTL_SECONDS = int(os.getenv('FAST_PATH_BUREAU_TTL_SECONDS', str(7 * 24 * 60 * 60)))
+    FAST_PATH_OFFER_TTL_SECONDS = int(os.getenv('FAST_PATH_OFFER_TTL_SECONDS', str(24 * 60 * 60)))
+    
+    # Idempotency keys on /api/chat and uploads: a retry with the same key gets the first response
+    IDEMPOTENCY_HEADER = 'Idempotency-Key'
+    IDEMPOTENCY_STORE_BACKEND = os.getenv('IDEMPOTENCY_STORE_BACKEND', OTP_STORE_BACKEND)  # memory, redis or fakeredis
+    IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', '900'))  # how long responses are kept for retries
+    IDEMPOTENCY_LOCK_SECONDS = 180  # longest a duplicate waits for the first request to finish
+    IDEMPOTENCY_POLL_SECONDS = 0.05  # while the first request runs on another worker
+    
+    # Admission control for /api/chat (per worker process)
+    CHAT_RATE_PER_CUSTOMER = float(os.getenv('CHAT_RATE_PER_CUSTOMER', '0.2'))  # messages per second, 0 = unlimited
+    CHAT_BURST_PER_CUSTOMER = int(os.getenv('CHAT_BURST_PER_CUSTOMER', '5'))
+    CHAT_RATE_PER_IP = float(os.getenv('CHAT_RATE_PER_IP', '2'))
+    CHAT_BURST_PER_IP = int(os.getenv('CHAT_BURST_PER_IP', '30'))
+    CHAT_MAX_CONCURRENT = int(os.getenv('CHAT_MAX_CONCURRENT', '16'))
+    CHAT_MAX_QUEUE = int(os.getenv('CHAT_MAX_QUEUE', '32'))  # waiting requests per lane (emergency, normal)
+    CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv('CHAT_QUEUE_TIMEOUT_SECONDS', '10'))
+    
+    # Per-request sampling profiler (collapsed stacks for flamegraphs)
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # fraction of chat requests profiled
+    PROFILE_HEADER = os.getenv('PROFILE_HEADER', 'X-Profile')  # request header that opts in; empty to disable
+    PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')  # value the header must carry; empty ignores the header
+    PROFILE_MAX_PER_MINUTE = int(os.getenv('PROFILE_MAX_PER_MINUTE', '10'))  # cap on requested and sampled profiles
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '200'))
+    
+    # Production Server Configuration (gunicorn -c gunicorn.conf.py app:app)
+    SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:5000')
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '1'))  # one per container; scale with containers
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '32'))
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+    SERVER_DRAIN_SECONDS = float(os.getenv('SERVER_DRAIN_SECONDS', '5'))
+    # Proxies in front of the app whose X-Forwarded-* headers are trusted (0 = use the socket address);
+    # client IPs feed the per-IP rate limit, so set this to the number of load balancer hops
+    PROXY_FIX_HOPS = int(os.getenv('PROXY_FIX_HOPS', '0'))
+    
     # WebSocket Configuration
     SOCKETIO_CORS_ALLOWED_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
+    # Redis URL shared by all workers so emits reach clients connected to any of them
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    # Room updates within this window are merged into one emit (0 = emit immediately)
+    SOCKETIO_COALESCE_SECONDS = float(os.getenv('SOCKETIO_COALESCE_SECONDS', '0.1'))
+    # Customer and application rooms are joined with signed tokens returned by the chat endpoints
+    SOCKETIO_ROOM_TOKEN_TTL_SECONDS = int(os.getenv('SOCKETIO_ROOM_TOKEN_TTL_SECONDS', str(24 * 60 * 60)))
+    
+    # Staff access: shared secret for admin routes, sent as "Authorization: Bearer <token>"
+    # (empty = staff features disabled); never ship it in the frontend bundle
+    STAFF_API_TOKEN = os.getenv('STAFF_API_TOKEN', '')
+    # Lifetime of the signed dashboard-room token staff exchange their STAFF_API_TOKEN for
+    DASHBOARD_TOKEN_TTL_SECONDS = int(os.getenv('DASHBOARD_TOKEN_TTL_SECONDS', str(15 * 60)))
 
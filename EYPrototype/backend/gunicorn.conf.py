@@ -0,0 +1,89 @@
+# Production server: gunicorn -c gunicorn.conf.py app:app
+#
+# Run one worker per container and scale by adding containers behind a load
+# balancer with sticky sessions. Gunicorn hands each request to whichever of
+# its workers accepts it, so it cannot keep a Socket.IO long-polling session
+# on one worker, and no load balancer setting changes that.
+#
+# SERVER_WORKERS > 1 is refused unless SOCKETIO_MESSAGE_QUEUE is set and
+# every TtlStore (OTPs, upload sessions, idempotency keys, fast-path cache)
+# uses redis. Even then, clients must connect with the websocket transport
+# only. The app is not preloaded in the master: each worker imports it
+# after fork and warms its own agents, so no threads, process pools or Mongo
+# connections are inherited across fork. Client addresses come from the
+# load balancer's X-Forwarded-For (PROXY_FIX_HOPS).
+import os
+import signal
+import threading
+import time
+
+# Production defaults, applied before config.py is imported by the workers
+os.environ.setdefault('DEBUG', 'False')
+os.environ.setdefault('PROXY_FIX_HOPS', '1')  # one load balancer in front of the workers
+
+from config import Config
+
+bind = Config.SERVER_BIND
+workers = Config.SERVER_WORKERS
+worker_class = 'gthread'
+threads = Config.SERVER_THREADS
+graceful_timeout = Config.SERVER_GRACEFUL_TIMEOUT
+timeout = 120
+keepalive = 5
+preload_app = False
+accesslog = '-'
+
+def on_starting(server):
+    if workers <= 1:
+        return
+    stores = {
+        'OTP_STORE_BACKEND': (Config.OTP_STORE_BACKEND, "OTPs issued on one worker fail verification on another"),
+        'UPLOAD_SESSION_STORE_BACKEND': (Config.UPLOAD_SESSION_STORE_BACKEND,
+                                         "resumable uploads fail when a chunk reaches another worker"),
+        'IDEMPOTENCY_STORE_BACKEND': (Config.IDEMPOTENCY_STORE_BACKEND,
+                                      "a retry reaching another worker runs the request again"),
+        'FAST_PATH_STORE_BACKEND': (Config.FAST_PATH_STORE_BACKEND,
+                                    "documents uploaded via one worker do not invalidate another's cached decisions"),
+    }
+    problems = [f"{name}={backend}: {effect}" for name, (backend, effect) in stores.items() if backend != 'redis']
+    if not Config.SOCKETIO_MESSAGE_QUEUE:
+        problems.append("SOCKETIO_MESSAGE_QUEUE is not set: Socket.IO emits only reach clients on the same worker")
+    if problems:
+        raise RuntimeError(f"SERVER_WORKERS={workers} needs shared state; run one worker per container instead, "
+                           "or fix: " + "; ".join(problems))
+    server.log.warning("Running %d workers: Socket.IO clients must use the websocket transport only", workers)
+    # Always per worker by design
+    server.log.info("Fraud index is per worker: applications from other workers are seen after "
+                    "FRAUD_INDEX_SYNC_INTERVAL_SECONDS (%ss)", Config.FRAUD_INDEX_SYNC_INTERVAL_SECONDS)
+    server.log.info("Feedback decisions are buffered per worker (up to %d rows or %.0fs) and lost if a worker "
+                    "is killed before flushing", Config.FEEDBACK_FLUSH_ROWS, Config.FEEDBACK_FLUSH_SECONDS)
+
+def post_worker_init(worker):
+    import app as application
+
+    if Config.WARM_UP_ON_START:
+        application.start_warm_up()
+
+    # Gunicorn sends SIGTERM to drain a worker. Fail readiness first so the
+    # load balancer stops routing new requests here, then let gunicorn stop
+    # accepting and finish in-flight requests within graceful_timeout.
+    stop = signal.getsignal(signal.SIGTERM)
+
+    def _drain(signum, frame):
+        application.draining.set()
+        worker.log.info("Worker %s draining for %.0fs", worker.pid, Config.SERVER_DRAIN_SECONDS)
+
+        def _stop_later():
+            time.sleep(Config.SERVER_DRAIN_SECONDS)
+            stop(signum, frame)
+
+        threading.Thread(target=_stop_later, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, _drain)
+
+def worker_exit(server, worker):
+    # Write decisions still buffered for the feedback store
+    import app as application
+
+    if application.feedback_store.is_initialized:
+        application.feedback_store.flush()
@@ -1,6 +1,42 @@
-from .database import DatabaseService
-from .credit_bureau import CreditBureauService
-from .offer_mart import OfferMartService
+import importlib
 
-__all__ = ['DatabaseService', 'CreditBureauService', 'OfferMartService']
+# Services are imported on first use so that importing the package (or one
+# light service) does not pull in numpy, OpenCV, pymongo and friends
+_EXPORTS = {
+    'DatabaseService': '.database',
+    'CreditBureauService': '.credit_bureau',
+    'OfferMartService': '.offer_mart',
+    'DocumentUploadService': '.document_upload',
+    'UploadRejected': '.document_upload',
+    'OcrService': '.ocr',
+    'FaceMatchService': '.face_match',
+    'DuplicateApplicationIndex': '.fraud_index',
+    'IpReputationService': '.ip_reputation',
+    'OtpService': '.otp',
+    'OtpRateLimited': '.otp',
+    'LazyProxy': '.lazy',
+    'UpdatePublisher': '.realtime',
+    'IntentClassifier': '.intent_classifier',
+    'RequestProfiler': '.profiler',
+    'AdmissionController': '.admission',
+    'AdmissionRejected': '.admission',
+    'DashboardStats': '.dashboard_stats',
+    'PolicyStore': '.underwriting_policy',
+    'FeedbackStore': '.feedback_store',
+    'RiskModel': '.risk_model',
+    'ModelRegistry': '.model_registry',
+    'SnapshotStore': '.customer_snapshot',
+    'DecisionCache': '.decision_cache',
+    'IdempotencyStore': '.idempotency',
+    'IdempotencyRejected': '.idempotency',
+}
 
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+__all__ = list(_EXPORTS)
@@ -0,0 +1,169 @@
+"""Admission control for expensive endpoints: token-bucket rate limits and a
+concurrency cap with a bounded, prioritised wait queue.
+
+Limits are kept in process memory, so with several gunicorn workers each
+worker enforces them separately.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from config import Config
+import heapq
+import itertools
+import math
+import threading
+import time
+
+EMERGENCY = 0
+NORMAL = 1
+
+class AdmissionRejected(Exception):
+    """Raised when a request is rate limited or the server is too busy to queue it"""
+
+    def __init__(self, message: str, retry_after: int, reason: str):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.reason = reason
+
+class TokenBucketLimiter:
+    """Token bucket per key: `burst` requests at once, refilled at `rate` per second"""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Spend one token for key; returns 0 if allowed, else seconds until a token is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.rate
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float):
+        # Buckets idle long enough to be full again carry no state
+        full_after = self.burst / self.rate
+        for key in [k for k, (_, updated_at) in self._buckets.items() if now - updated_at >= full_after]:
+            del self._buckets[key]
+
+class ConcurrencyLimiter:
+    """At most `max_concurrent` requests run; up to `max_queue` per lane wait, emergencies first"""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self._waiting: List[Tuple[int, int, threading.Event]] = []
+        self._queued = {EMERGENCY: 0, NORMAL: 0}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._service_time = 1.0  # moving average, for Retry-After estimates
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def acquire(self, priority: int = NORMAL) -> float:
+        """Wait for a slot; returns seconds spent queued or raises AdmissionRejected"""
+        with self._lock:
+            if self.running < self.max_concurrent and not self._waiting:
+                self.running += 1
+                self.admitted += 1
+                return 0.0
+            if self._queued[priority] >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected("Server is busy, please retry shortly", self._retry_after(), "overloaded")
+            ready = threading.Event()
+            entry = (priority, next(self._sequence), ready)
+            heapq.heappush(self._waiting, entry)
+            self._queued[priority] += 1
+
+        start = time.monotonic()
+        admitted = ready.wait(self.queue_timeout)
+        with self._lock:
+            if not admitted and not ready.is_set():
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._queued[priority] -= 1
+                self.timed_out += 1
+                raise AdmissionRejected("Timed out waiting for capacity, please retry", self._retry_after(), "queue_timeout")
+        return time.monotonic() - start
+
+    def release(self, service_time: Optional[float] = None):
+        """Free a slot, handing it straight to the highest-priority waiter"""
+        with self._lock:
+            if service_time is not None:
+                self._service_time += 0.1 * (service_time - self._service_time)
+            if self._waiting:
+                priority, _, ready = heapq.heappop(self._waiting)
+                self._queued[priority] -= 1
+                self.admitted += 1
+                ready.set()  # the slot passes to the waiter, running is unchanged
+            else:
+                self.running -= 1
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiting) + 1
+        return max(1, math.ceil(backlog * self._service_time / max(self.max_concurrent, 1)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "max_concurrent": self.max_concurrent,
+            "queued": {"emergency": self._queued[EMERGENCY], "normal": self._queued[NORMAL]},
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_service_seconds": round(self._service_time, 3)
+        }
+
+class AdmissionController:
+    """Per-customer and per-IP rate limits in front of a shared concurrency cap"""
+
+    def __init__(self, customer_limiter: Optional[TokenBucketLimiter] = None,
+                 ip_limiter: Optional[TokenBucketLimiter] = None,
+                 concurrency: Optional[ConcurrencyLimiter] = None):
+        self.customer_limiter = customer_limiter or TokenBucketLimiter(
+            Config.CHAT_RATE_PER_CUSTOMER, Config.CHAT_BURST_PER_CUSTOMER)
+        self.ip_limiter = ip_limiter or TokenBucketLimiter(Config.CHAT_RATE_PER_IP, Config.CHAT_BURST_PER_IP)
+        self.concurrency = concurrency or ConcurrencyLimiter(
+            Config.CHAT_MAX_CONCURRENT, Config.CHAT_MAX_QUEUE, Config.CHAT_QUEUE_TIMEOUT_SECONDS)
+        self.rate_limited = 0
+
+    def check_rate(self, customer_key: Optional[str], ip: Optional[str]):
+        """Raise AdmissionRejected if the customer or IP has exhausted its bucket.
+
+        Without a customer key the request is charged to an anonymous
+        customer for its IP, so unidentified traffic still has a customer
+        limit rather than none.
+        """
+        customer_key = customer_key or f"anonymous:{ip or 'unknown'}"
+        for limiter, key, scope in [(self.ip_limiter, ip, "ip"), (self.customer_limiter, customer_key, "customer")]:
+            if not key:
+                continue
+            wait = limiter.take(key)
+            if wait:
+                self.rate_limited += 1
+                raise AdmissionRejected("Too many messages, please slow down",
+                                        max(1, math.ceil(wait)), f"rate_limited_{scope}")
+
+    def admit(self, customer_key: Optional[str], ip: Optional[str], priority: int = NORMAL) -> float:
+        """Rate-check then take a concurrency slot (release it with release()); returns seconds queued"""
+        self.check_rate(customer_key, ip)
+        return self.concurrency.acquire(priority)
+
+    def release(self, service_time: Optional[float] = None):
+        self.concurrency.release(service_time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rate_limited": self.rate_limited, **self.concurrency.stats()}
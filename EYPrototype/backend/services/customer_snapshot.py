@@ -0,0 +1,388 @@
+"""Memory-mapped snapshot of per-customer history for underwriting.
+
+A snapshot is one file: a JSON header, an open-addressing hash index over
+64-bit key hashes ("id:<customer_id>" and "pan:<PAN>") and one fixed-width
+column per feature, all 8-byte aligned. Readers map it read-only and build
+numpy views over it, so lookups touch no network and every worker process
+on a host shares the same pages. Builds run a $group over loan_applications,
+write a new file, and repoint CURRENT with an atomic rename. Readers poll
+CURRENT and swap their snapshot reference, the same scheme the risk-model
+registry uses.
+
+Build by hand (workers also rebuild every CUSTOMER_SNAPSHOT_BUILD_INTERVAL_SECONDS,
+one worker per host at a time):
+    python -m services.customer_snapshot --build
+"""
+from typing import Dict, Any, Iterable, Optional
+from array import array
+from datetime import datetime
+from config import Config
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b"CSNP"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<4sII")  # magic, format version, header length
+
+DECISIONS = ["reject", "approve", "counter_offer"]
+
+# name -> (array typecode, numpy dtype)
+COLUMNS = {
+    "applications": ("q", "<i8"),
+    "approvals": ("q", "<i8"),
+    "rejections": ("q", "<i8"),
+    "counter_offers": ("q", "<i8"),
+    "last_decision": ("q", "<i8"),  # index into DECISIONS, -1 if none
+    "first_applied_at": ("d", "<f8"),  # epoch seconds
+    "last_applied_at": ("d", "<f8"),
+    "last_salary": ("d", "<f8"),
+    "max_salary": ("d", "<f8"),
+    "min_salary": ("d", "<f8"),
+    "salary_observations": ("q", "<i8"),
+    "sanctioned_amount": ("d", "<f8"),
+    "last_credit_score": ("d", "<f8"),
+    "last_risk_score": ("d", "<f8"),
+}
+
+_AGGREGATION = [
+    {"$match": {"customer_id": {"$nin": [None, ""]}}},
+    {"$sort": {"created_at": 1}},
+    {"$project": {
+        "customer_id": 1,
+        "created_at": 1,
+        "decision": "$result.final_decision",
+        "salary": {"$ifNull": ["$result.customer_data.salary_slip_data.net_salary", "$result.customer_data.salary"]},
+        "pan": "$result.customer_data.pan_number",
+        "credit_score": "$result.underwriting_result.credit_score",
+        "risk_score": "$result.underwriting_result.risk_score",
+        "amount": "$result.underwriting_result.loan_amount",
+    }},
+    {"$group": {
+        "_id": "$customer_id",
+        "applications": {"$sum": 1},
+        "approvals": {"$sum": {"$cond": [{"$eq": ["$decision", "approve"]}, 1, 0]}},
+        "rejections": {"$sum": {"$cond": [{"$eq": ["$decision", "reject"]}, 1, 0]}},
+        "counter_offers": {"$sum": {"$cond": [{"$eq": ["$decision", "counter_offer"]}, 1, 0]}},
+        "last_decision": {"$last": "$decision"},
+        "first_applied_at": {"$first": "$created_at"},
+        "last_applied_at": {"$last": "$created_at"},
+        "last_salary": {"$last": "$salary"},
+        "max_salary": {"$max": "$salary"},
+        "min_salary": {"$min": "$salary"},
+        "salary_observations": {"$sum": {"$cond": [{"$gt": ["$salary", 0]}, 1, 0]}},
+        "sanctioned_amount": {"$sum": {"$cond": [{"$in": ["$decision", ["approve", "counter_offer"]]},
+                                                 {"$ifNull": ["$amount", 0]}, 0]}},
+        "last_credit_score": {"$last": "$credit_score"},
+        "last_risk_score": {"$last": "$risk_score"},
+        "pans": {"$addToSet": "$pan"},
+    }},
+]
+
+def _data_start(header_length: int) -> int:
+    end = PREAMBLE.size + header_length
+    return end + (-end % 8)
+
+def key_hash(key: str) -> int:
+    value = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+    return value or 1  # 0 marks an empty slot
+
+def _value(name: str, raw: Any) -> float:
+    if name == "last_decision":
+        return DECISIONS.index(raw) if raw in DECISIONS else -1
+    if isinstance(raw, datetime):
+        return raw.timestamp()
+    try:
+        return float(raw or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def write_snapshot(customers: Iterable[Dict[str, Any]], path: str) -> int:
+    """Write grouped customer rows (shaped like the $group output) to a snapshot file; returns rows"""
+    import numpy as np
+    columns = {name: array(typecode) for name, (typecode, _) in COLUMNS.items()}
+    hashes = array("Q")
+    rows = array("q")
+    count = 0
+    for customer in customers:
+        for name, (typecode, _) in COLUMNS.items():
+            value = _value(name, customer.get(name))
+            columns[name].append(int(value) if typecode == "q" else value)
+        hashes.append(key_hash(f"id:{customer['_id']}"))
+        rows.append(count)
+        for pan in customer.get("pans") or []:
+            if pan:
+                hashes.append(key_hash(f"pan:{str(pan).upper()}"))
+                rows.append(count)
+        count += 1
+
+    # Open addressing with linear probing at a load factor of at most 0.5
+    keys = np.frombuffer(hashes, dtype=np.uint64) if len(hashes) else np.zeros(0, np.uint64)
+    targets = np.frombuffer(rows, dtype=np.int64) if len(rows) else np.zeros(0, np.int64)
+    _, last = np.unique(keys[::-1], return_index=True)  # a PAN shared by customers maps to the last one
+    keep = len(keys) - 1 - last
+    keys, targets = keys[keep], targets[keep]
+    slots = 1 << max(4, (2 * len(keys) - 1).bit_length())
+    slot_hashes = np.zeros(slots, dtype="<u8")
+    slot_rows = np.full(slots, -1, dtype="<i8")
+    mask = slots - 1
+    # Insert in rounds: each pending key takes its probe slot if free (first claimant wins),
+    # otherwise moves one slot on, so every slot from home to final position ends up occupied
+    probe = (keys & np.uint64(mask)).astype(np.int64)
+    pending = np.arange(len(keys))
+    while len(pending):
+        candidates = probe[pending]
+        free = slot_hashes[candidates] == 0
+        _, first = np.unique(candidates[free], return_index=True)
+        placed = pending[free][first]
+        slot_hashes[probe[placed]] = keys[placed]
+        slot_rows[probe[placed]] = targets[placed]
+        pending = np.setdiff1d(pending, placed, assume_unique=True)
+        probe[pending] = (probe[pending] + 1) & mask
+
+    blocks = [("slot_hashes", slot_hashes), ("slot_rows", slot_rows)] + \
+             [(name, np.frombuffer(columns[name], dtype=COLUMNS[name][1]) if count else np.zeros(0, COLUMNS[name][1]))
+              for name in COLUMNS]
+    # Block offsets are relative to the data section, which starts 8-byte aligned after the header
+    header = {"rows": count, "slots": slots, "built_at": datetime.now().isoformat(), "blocks": {}}
+    offset = 0
+    for name, block in blocks:
+        header["blocks"][name] = [offset, block.dtype.str, len(block)]
+        offset += block.nbytes + (-block.nbytes % 8)
+    header_bytes = json.dumps(header).encode()
+    data_start = _data_start(len(header_bytes))
+
+    temporary = os.path.join(os.path.dirname(path) or ".", f".{os.path.basename(path)}.tmp")
+    with open(temporary, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, block in blocks:
+            f.write(b"\0" * (data_start + header["blocks"][name][0] - f.tell()))
+            f.write(block.tobytes())
+    os.replace(temporary, path)
+    return count
+
+class CustomerSnapshot:
+    """One mapped snapshot file"""
+
+    def __init__(self, path: str):
+        import numpy as np
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, header_length = PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} customer snapshot")
+        header = json.loads(self._map[PREAMBLE.size:PREAMBLE.size + header_length])
+        self.rows = header["rows"]
+        self.built_at = header["built_at"]
+        self.version = os.path.basename(path).rsplit(".", 1)[0]
+        data_start = _data_start(header_length)
+        views = {name: np.frombuffer(self._map, dtype=dtype, count=count, offset=data_start + offset)
+                 for name, (offset, dtype, count) in header["blocks"].items()}
+        self._slot_hashes = views.pop("slot_hashes")
+        self._slot_rows = views.pop("slot_rows")
+        self._mask = len(self._slot_hashes) - 1
+        self.columns = views
+
+    def _row(self, key: str) -> int:
+        target = key_hash(key)
+        slot = target & self._mask
+        while True:
+            found = int(self._slot_hashes[slot])
+            if found == target:
+                return int(self._slot_rows[slot])
+            if found == 0:
+                return -1
+            slot = (slot + 1) & self._mask
+
+    def lookup(self, customer_id: Optional[str] = None, pan: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """History for a customer by id, falling back to PAN; None for a new customer.
+
+        "matched_on" says which key found the row. A PAN is whatever the
+        applicant typed and a PAN shared by several customers maps to the
+        last of them, so a "pan" match may be someone else's history.
+        """
+        row = self._row(f"id:{customer_id}") if customer_id else -1
+        matched_on = "customer_id"
+        if row < 0 and pan:
+            row = self._row(f"pan:{str(pan).upper()}")
+            matched_on = "pan"
+        if row < 0:
+            return None
+        history = {name: column[row].item() for name, column in self.columns.items()}
+        decision = history["last_decision"]
+        history["last_decision"] = DECISIONS[decision] if decision >= 0 else None
+        history["matched_on"] = matched_on
+        return history
+
+class SnapshotStore:
+    """The current snapshot for this process, swapped when a new one is published"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or Config.CUSTOMER_SNAPSHOT_DIR
+        self.current: Optional[CustomerSnapshot] = None
+        self._current_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+        self._build_thread: Optional[threading.Thread] = None
+        self.lookups = 0
+        self.hits = 0
+        self.last_build: Optional[Dict[str, Any]] = None
+        self.refresh()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def refresh(self, force: bool = False) -> bool:
+        """Map the snapshot named by CURRENT if it changed; returns True if swapped"""
+        try:
+            mtime = os.path.getmtime(self._path("CURRENT"))
+        except OSError:
+            return False
+        if not force and mtime == self._current_mtime:
+            return False
+        with self._lock:
+            with open(self._path("CURRENT")) as f:
+                name = f.read().strip()
+            if self.current is not None and os.path.basename(self.current.path) == name:
+                self._current_mtime = mtime
+                return False
+            # Lookups in flight keep the previous mapping alive through their reference
+            self.current = CustomerSnapshot(self._path(name))
+            self._current_mtime = mtime
+            return True
+
+    def lookup(self, customer_id: Optional[str] = None, pan: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        snapshot = self.current
+        if snapshot is None:
+            return None
+        self.lookups += 1
+        history = snapshot.lookup(customer_id, pan)
+        if history is not None:
+            self.hits += 1
+        return history
+
+    def build(self, customers: Optional[Iterable[Dict[str, Any]]] = None, db_service=None,
+              max_age: Optional[float] = None) -> Optional[int]:
+        """Write a new snapshot and make it current; returns rows, or None if skipped.
+
+        Without `customers`, rows come from a $group over loan_applications.
+        Skipped when another process is building, or when max_age is given and
+        the current snapshot is younger than that.
+        """
+        import fcntl
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(".build.lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            if max_age is not None and os.path.exists(self._path("CURRENT")) and \
+                    time.time() - os.path.getmtime(self._path("CURRENT")) < max_age:
+                return None
+            started = time.perf_counter()
+            if customers is None:
+                if db_service is None:
+                    from services.database import DatabaseService
+                    db_service = DatabaseService()
+                customers = db_service.loan_applications.aggregate(_AGGREGATION, allowDiskUse=True)
+            name = f"customers-{datetime.now().strftime('%Y%m%d%H%M%S%f')}.snap"
+            rows = write_snapshot(customers, self._path(name))
+            temporary = self._path(".CURRENT.tmp")
+            with open(temporary, "w") as f:
+                f.write(name)
+            os.replace(temporary, self._path("CURRENT"))
+            self._prune(keep=name)
+            self.last_build = {"file": name, "rows": rows, "seconds": round(time.perf_counter() - started, 2)}
+        self.refresh(force=True)
+        return rows
+
+    def _prune(self, keep: str):
+        # Unlinking a mapped file is safe: readers keep their pages until they swap
+        snapshots = sorted(n for n in os.listdir(self.directory) if n.startswith("customers-") and n.endswith(".snap"))
+        for name in snapshots[:-Config.CUSTOMER_SNAPSHOT_KEEP]:
+            if name != keep:
+                os.remove(self._path(name))
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Poll CURRENT and swap to newer snapshots in a daemon thread"""
+        if self._watch_thread:
+            return
+        interval = interval or Config.CUSTOMER_SNAPSHOT_REFRESH_SECONDS
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Customer snapshot refresh failed, keeping the current one: {str(e)}")
+
+        self._watch_thread = threading.Thread(target=_run, name="customer-snapshot-refresh", daemon=True)
+        self._watch_thread.start()
+
+    def start_building(self, db_service=None, interval: Optional[float] = None):
+        """Rebuild from loan_applications every `interval` seconds in a daemon thread (0 disables).
+
+        Every worker may run this: the build lock and the age check leave one
+        build per interval per host.
+        """
+        interval = Config.CUSTOMER_SNAPSHOT_BUILD_INTERVAL_SECONDS if interval is None else interval
+        if self._build_thread or interval <= 0:
+            return
+
+        def _run():
+            while True:
+                try:
+                    self.build(db_service=db_service, max_age=interval * 0.9)
+                except Exception as e:
+                    print(f"Customer snapshot build failed: {str(e)}")
+                time.sleep(interval)
+
+        self._build_thread = threading.Thread(target=_run, name="customer-snapshot-build", daemon=True)
+        self._build_thread.start()
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.current
+        return {
+            "file": os.path.basename(snapshot.path) if snapshot else None,
+            "rows": snapshot.rows if snapshot else 0,
+            "built_at": snapshot.built_at if snapshot else None,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "last_build": self.last_build
+        }
+
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+def get_customer_snapshots() -> SnapshotStore:
+    """Process-wide snapshot store, swapping to new snapshots as they are published"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = SnapshotStore()
+                store.start_watching()
+                _store = store
+    return _store
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--build", action="store_true", help="build a snapshot from loan_applications")
+    parser.add_argument("--lookup", metavar="CUSTOMER_ID_OR_PAN", help="print one customer's history")
+    args = parser.parse_args()
+
+    store = SnapshotStore()
+    if args.build:
+        rows = store.build()
+        print(f"built {store.last_build}" if rows is not None else "another process is building a snapshot")
+    if args.lookup:
+        print(store.lookup(customer_id=args.lookup, pan=args.lookup))
+    print(store.stats())
@@ -0,0 +1,197 @@
+"""Dashboard aggregates maintained incrementally as applications are written.
+
+Counters live in the `dashboard_stats` collection: one "totals" document
+(counts by status, loan type and decision, sanctioned totals) and one
+"day:YYYY-MM-DD" document per creation day (approval funnel). Every write
+through DatabaseService applies the difference it makes with $inc, so
+reading the dashboard touches a handful of small documents whatever the
+size of the book.
+
+Rebuild from the applications collection (e.g. after deploying onto an
+existing database):
+    python -m services.dashboard_stats --rebuild
+"""
+from typing import Dict, Any, Optional
+from datetime import datetime, date, timedelta
+from config import Config
+import argparse
+import copy
+import threading
+import time
+
+FUNNEL_STAGES = ["submitted", "interested", "decided", "approved", "sanctioned"]
+IN_PROGRESS_STATUSES = ["underwriting", "verification", "processing"]
+APPROVED_DECISIONS = ["approve", "counter_offer"]
+
+# Fields read when rebuilding, enough for application_counters
+_PROJECTION = {
+    "status": 1, "loan_type": 1, "loan_amount": 1, "created_at": 1,
+    "result.final_decision": 1, "result.sales_result.interested": 1,
+    "result.underwriting_result.loan_amount": 1, "result.sanction_result.status": 1
+}
+
+def _key(value: Any) -> str:
+    # Counter names become field names, which may not contain "." or start with "$"
+    return str(value).replace(".", "_").replace("$", "_") if value not in (None, "") else "unknown"
+
+def _day(created_at: Any) -> str:
+    if isinstance(created_at, (datetime, date)):
+        return created_at.strftime("%Y-%m-%d")
+    return str(created_at)[:10] if created_at else datetime.now().strftime("%Y-%m-%d")
+
+def application_counters(application: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Counter values one application contributes, by stats document id"""
+    result = application.get("result") or {}
+    decision = result.get("final_decision")
+    status = application.get("status", "pending")
+    approved = decision in APPROVED_DECISIONS or status == "approved"
+    # A fast-path repeat points at the sanction of an earlier application
+    repeat = (result.get("sanction_result") or {}).get("status") == "previously_delivered"
+    sanctioned_amount = 0.0
+    if approved and not repeat:
+        sanctioned_amount = float((result.get("underwriting_result") or {}).get("loan_amount")
+                                  or application.get("loan_amount") or 0)
+
+    totals = {
+        "applications": 1,
+        f"by_status.{_key(status)}": 1,
+        f"by_loan_type.{_key(application.get('loan_type', 'Personal Loan'))}": 1,
+    }
+    if decision:
+        totals[f"by_decision.{_key(decision)}"] = 1
+    if approved and not repeat:
+        totals["sanctioned_count"] = 1
+        totals["sanctioned_amount"] = sanctioned_amount
+
+    stages = {
+        "submitted": True,
+        "interested": bool((result.get("sales_result") or {}).get("interested")),
+        "decided": bool(decision),
+        "approved": approved,
+        "sanctioned": (result.get("sanction_result") or {}).get("status") == "delivered",
+    }
+    daily = {f"funnel.{stage}": 1 for stage, reached in stages.items() if reached}
+    if approved and not repeat:
+        daily["sanctioned_amount"] = sanctioned_amount
+    return {"totals": totals, f"day:{_day(application.get('created_at'))}": daily}
+
+def counter_delta(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Increments that turn the counters for `before` into those for `after` (either may be None)"""
+    delta: Dict[str, Dict[str, float]] = {}
+    for sign, application in [(-1, before), (1, after)]:
+        if application is None:
+            continue
+        for doc_id, counters in application_counters(application).items():
+            target = delta.setdefault(doc_id, {})
+            for field, value in counters.items():
+                target[field] = target.get(field, 0) + sign * value
+    return {doc_id: {f: v for f, v in counters.items() if v} for doc_id, counters in delta.items()
+            if any(counters.values())}
+
+def apply_set(document: Dict[str, Any], updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a document with a $set applied, including dotted paths"""
+    document = copy.deepcopy(document)
+    for path, value in updates.items():
+        target = document
+        *parents, leaf = path.split(".")
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = value
+    return document
+
+class DashboardStats:
+    """Reads and updates the dashboard counters, with a short in-process cache"""
+
+    def __init__(self, db_service, ttl: Optional[float] = None):
+        self.db_service = db_service
+        self.ttl = Config.DASHBOARD_STATS_TTL_SECONDS if ttl is None else ttl
+        self._cache: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def collection(self):
+        return self.db_service.dashboard_stats
+
+    def record(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        """Apply the change from one application write; never fails the write itself"""
+        try:
+            delta = counter_delta(before, after)
+            if not delta:
+                return
+            from pymongo import UpdateOne
+            self.collection.bulk_write([
+                UpdateOne({"_id": doc_id}, {"$inc": counters}, upsert=True) for doc_id, counters in delta.items()
+            ], ordered=False)
+            self._cache.clear()
+        except Exception as e:
+            print(f"Error updating dashboard stats: {str(e)}")
+
+    def snapshot(self, days: int = 14) -> Dict[str, Any]:
+        """Dashboard cards, breakdowns and the daily funnel for the last `days` days"""
+        now = time.monotonic()
+        cached = self._cache.get(days)
+        if cached and now - cached[0] < self.ttl:
+            return cached[1]
+        with self._lock:
+            cached = self._cache.get(days)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            stats = self._read(days)
+            self._cache[days] = (time.monotonic(), stats)
+            return stats
+
+    def _read(self, days: int) -> Dict[str, Any]:
+        today = datetime.now().date()
+        day_ids = [f"day:{(today - timedelta(days=offset)).isoformat()}" for offset in range(days - 1, -1, -1)]
+        documents = {doc["_id"]: doc for doc in self.collection.find({"_id": {"$in": ["totals"] + day_ids}})}
+        totals = documents.get("totals", {})
+        by_status = totals.get("by_status", {})
+        return {
+            "total_applications": totals.get("applications", 0),
+            "approved": by_status.get("approved", 0),
+            "in_progress": sum(by_status.get(status, 0) for status in IN_PROGRESS_STATUSES),
+            "pending": by_status.get("pending", 0),
+            "by_status": by_status,
+            "by_loan_type": totals.get("by_loan_type", {}),
+            "by_decision": totals.get("by_decision", {}),
+            "sanctioned_count": totals.get("sanctioned_count", 0),
+            "sanctioned_amount": totals.get("sanctioned_amount", 0),
+            "daily": [{
+                "date": day_id[4:],
+                **{stage: documents.get(day_id, {}).get("funnel", {}).get(stage, 0) for stage in FUNNEL_STAGES},
+                "sanctioned_amount": documents.get(day_id, {}).get("sanctioned_amount", 0)
+            } for day_id in day_ids],
+            "generated_at": datetime.now().isoformat()
+        }
+
+    def rebuild(self, batch_size: int = 5000) -> int:
+        """Recompute every counter from the applications collection; returns applications counted.
+
+        Writes that land while this runs may be lost from the counters, so run
+        it when the service is quiet.
+        """
+        documents: Dict[str, Dict[str, float]] = {}
+        count = 0
+        for application in self.db_service.loan_applications.find({}, _PROJECTION, batch_size=batch_size):
+            count += 1
+            for doc_id, counters in application_counters(application).items():
+                target = documents.setdefault(doc_id, {})
+                for field, value in counters.items():
+                    target[field] = target.get(field, 0) + value
+
+        self.collection.delete_many({})
+        if documents:
+            self.collection.insert_many([{"_id": doc_id, **apply_set({}, counters)} for doc_id, counters in documents.items()])
+        self._cache.clear()
+        return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="recompute counters from loan_applications")
+    args = parser.parse_args()
+
+    from services.database import DatabaseService
+    db_service = DatabaseService()
+    if args.rebuild:
+        print(f"rebuilt dashboard stats from {db_service.aggregates.rebuild():,} applications")
+    print(db_service.aggregates.snapshot())
@@ -1,17 +1,77 @@
-from pymongo import MongoClient
 from config import Config
-from typing import Dict, Any, Optional
-from datetime import datetime
+from .dashboard_stats import DashboardStats, apply_set
+from typing import Dict, Any, Optional, List, Tuple
+from datetime import datetime, timedelta
+import threading
+
+def change_cursor(application: Dict[str, Any]) -> str:
+    """Opaque position of an application in the change feed (updated_at, then _id)"""
+    # MongoDB stores milliseconds; a microsecond cursor would skip later writes in the same millisecond
+    updated_at = application['updated_at']
+    updated_at = updated_at.replace(microsecond=updated_at.microsecond // 1000 * 1000)
+    return f"{updated_at.strftime('%Y-%m-%dT%H:%M:%S.%f')}|{application['_id']}"
+
+def new_application_id():
+    """An application _id allocated before the application is saved, so it can be reported early"""
+    from bson import ObjectId
+    return ObjectId()
+
+def parse_change_cursor(cursor: str) -> Tuple[datetime, Any]:
+    """Inverse of change_cursor; raises ValueError for a malformed cursor"""
+    from bson import ObjectId
+    timestamp, _, object_id = cursor.partition("|")
+    return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%f'), ObjectId(object_id) if ObjectId.is_valid(object_id) else object_id
 
 class DatabaseService:
     """Database service for MongoDB operations"""
     
     def __init__(self):
-        self.client = MongoClient(Config.MONGODB_URI)
-        self.db = self.client.get_database()
-        self.customers = self.db.customers
-        self.loan_applications = self.db.loan_applications
-        self.feedback_data = self.db.feedback_data
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.aggregates = DashboardStats(self)
+    
+    @property
+    def client(self):
+        """MongoDB client, created on first use so startup does not import pymongo"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from pymongo import MongoClient
+                    self._client = MongoClient(Config.MONGODB_URI)
+        return self._client
+    
+    @property
+    def db(self):
+        return self.client.get_database()
+    
+    @property
+    def customers(self):
+        return self.db.customers
+    
+    @property
+    def loan_applications(self):
+        return self.db.loan_applications
+    
+    @property
+    def feedback_data(self):
+        return self.db.feedback_data
+    
+    @property
+    def dashboard_stats(self):
+        return self.db.dashboard_stats
+    
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None
+    
+    def ping(self) -> bool:
+        """Round-trip to the server; used by the readiness check"""
+        try:
+            self.client.admin.command("ping")
+            return True
+        except Exception as e:
+            print(f"Database ping failed: {str(e)}")
+            return False
     
     def create_customer(self, customer_data: Dict[str, Any]) -> str:
         """Create a new customer record"""
@@ -34,32 +94,78 @@ class DatabaseService:
         return result.modified_count > 0
     
     def create_loan_application(self, application_data: Dict[str, Any]) -> str:
-        """Create a new loan application"""
+        """Create a new loan application (under application_data["_id"] if one was allocated)"""
         application_data["created_at"] = datetime.now()
         application_data["updated_at"] = datetime.now()
         application_data["status"] = "pending"
         result = self.loan_applications.insert_one(application_data)
+        self.aggregates.record(None, application_data)
         return str(result.inserted_id)
     
     def update_loan_application(self, application_id: str, updates: Dict[str, Any]) -> bool:
         """Update loan application"""
+        from pymongo import ReturnDocument
         updates["updated_at"] = datetime.now()
-        result = self.loan_applications.update_one(
+        before = self.loan_applications.find_one_and_update(
             {"_id": application_id},
-            {"$set": updates}
+            {"$set": updates},
+            return_document=ReturnDocument.BEFORE
         )
-        return result.modified_count > 0
+        if before is None:
+            return False
+        self.aggregates.record(before, apply_set(before, updates))
+        return True
     
     def get_loan_application(self, application_id: str) -> Optional[Dict[str, Any]]:
         """Get loan application by ID"""
         return self.loan_applications.find_one({"_id": application_id})
     
-    def get_all_applications(self) -> list:
-        """Get all loan applications from database"""
+    def get_all_applications(self, limit: Optional[int] = None) -> list:
+        """Get all loan applications from database, or the `limit` most recent"""
         try:
+            if limit:
+                return list(self.loan_applications.find({}).sort("created_at", -1).limit(limit))
             applications = list(self.loan_applications.find({}))
             return applications
         except Exception as e:
             print(f"Error fetching applications: {str(e)}")
             return []
     
+    def get_dashboard_stats(self, days: int = 14) -> Dict[str, Any]:
+        """Dashboard counts, totals and daily funnel from the incremental aggregates"""
+        return self.aggregates.snapshot(days)
+    
+    def ensure_indexes(self):
+        """Create indexes used by incremental (delta) readers"""
+        self.loan_applications.create_index([("updated_at", 1), ("_id", 1)])
+    
+    def get_application_changes(self, cursor: Optional[str], limit: int = 500) -> List[Dict[str, Any]]:
+        """Applications created or updated after a change_cursor, in feed order.
+
+        Ties on updated_at are broken by _id, so paging with a limit never
+        skips an application that shares a timestamp with the page boundary.
+        """
+        query = {}
+        if cursor:
+            updated_at, object_id = parse_change_cursor(cursor)
+            query = {"$or": [
+                {"updated_at": {"$gt": updated_at}},
+                {"updated_at": updated_at, "_id": {"$gt": object_id}}
+            ]}
+        return list(self.loan_applications.find(query).sort([("updated_at", 1), ("_id", 1)]).limit(limit))
+    
+    def get_application_changes_behind(self, cursor: str, seconds: float, limit: int = 500) -> List[Dict[str, Any]]:
+        """Applications stamped up to `seconds` before a change_cursor, in feed order.
+
+        Writes that committed late behind a cursor are only found here; the
+        result overlaps what the reader has seen, so readers dedupe by _id.
+        """
+        updated_at, _ = parse_change_cursor(cursor)
+        query = {"updated_at": {"$gte": updated_at - timedelta(seconds=seconds), "$lte": updated_at}}
+        return list(self.loan_applications.find(query).sort([("updated_at", 1), ("_id", 1)]).limit(limit))
+    
+    def get_latest_change_cursor(self) -> Optional[str]:
+        """Cursor at the newest change, for clients that just loaded the full list"""
+        latest = self.loan_applications.find_one({"updated_at": {"$exists": True}},
+                                                 sort=[("updated_at", -1), ("_id", -1)])
+        return change_cursor(latest) if latest else None
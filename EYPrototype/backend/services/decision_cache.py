@@ -0,0 +1,173 @@
+"""Cached verification inputs and decisions for returning customers (the fast path).
+
+Each full workflow run stores, per customer, the inputs underwriting used:
+the KYC result (only while it is verified), the bureau score and the
+offer-mart limit, each with its own TTL. Once decided, the outcome is stored
+with a fingerprint of everything it depended on: those three results, the
+decision-relevant customer data and documents, the history snapshot
+fields underwriting reads, and the policy and risk-model versions in force.
+
+A later message from the customer is answered from the cached outcome when
+all three inputs are still live, the fingerprint still matches and a fresh
+fraud check (duplicate and ring lookups against applications made since)
+does not flag the customer. Anything else (expired KYC, different
+documents, a new amount or salary, a new policy or model version, a fraud
+flag) is a miss and the full workflow runs and refreshes the cache. Entries
+live in a TtlStore, so with the Redis backend every worker shares them.
+"""
+from typing import Dict, Any, List, Optional
+from config import Config
+from .otp import TtlStore, create_ttl_store
+import hashlib
+import json
+import threading
+
+# Customer data that does not affect the decision: one-time codes and raw images
+VOLATILE_FIELDS = {"otp_code", "selfie_image"}
+
+# Snapshot fields underwriting reads that the cached decision did not itself change; the prior
+# application/approval/rejection counters move with every application, including the one decided
+SNAPSHOT_FIELDS = ["last_salary"]
+
+# Final-state fields replayed on a fast-path hit
+OUTCOME_FIELDS = ["final_decision", "underwriting_result", "sanction_result", "feedback_data", "status"]
+
+# Cached input -> the workflow state field it was fetched into
+INPUTS = {"kyc": "verification_result", "bureau": "credit_score", "offer": "offer_mart_data"}
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+
+class DecisionCache:
+    """Per-customer KYC, bureau, offer and decision entries with fingerprint invalidation"""
+
+    def __init__(self, store: Optional[TtlStore] = None):
+        self.store = store or create_ttl_store(Config.FAST_PATH_STORE_BACKEND)
+        self.ttls = {
+            "kyc": Config.FAST_PATH_KYC_TTL_SECONDS,
+            "bureau": Config.FAST_PATH_BUREAU_TTL_SECONDS,
+            "offer": Config.FAST_PATH_OFFER_TTL_SECONDS
+        }
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses: Dict[str, int] = {}
+        self.stored = 0
+
+    @staticmethod
+    def _key(kind: str, customer_id: str) -> str:
+        return f"fast:{kind}:{customer_id}"
+
+    def record_inputs(self, customer_id: Optional[str], verification: Optional[Dict[str, Any]],
+                      credit_score: Optional[Dict[str, Any]], offer_mart: Optional[Dict[str, Any]]):
+        """Store the results fetched by a full verification step"""
+        if not customer_id:
+            return
+        if verification and verification.get("status") == "verified":
+            self.store.set(self._key("kyc", customer_id), _dumps(verification), self.ttls["kyc"])
+        else:
+            self.store.delete(self._key("kyc", customer_id))  # a failed re-check ends the fast path
+        if credit_score:
+            self.store.set(self._key("bureau", customer_id), _dumps(credit_score), self.ttls["bureau"])
+        if offer_mart and offer_mart.get("eligibility", True):
+            self.store.set(self._key("offer", customer_id), _dumps(offer_mart), self.ttls["offer"])
+        else:
+            self.store.delete(self._key("offer", customer_id))
+
+    def _fingerprint(self, customer_id: str, customer_data: Dict[str, Any],
+                     documents: Optional[List[Dict[str, Any]]], inputs: Dict[str, str]) -> str:
+        from .customer_snapshot import get_customer_snapshots
+        from .model_registry import get_model_registry
+        from .underwriting_policy import get_policy_store
+        policies = get_policy_store()
+        challenger = policies.challenger
+        # Underwriting ignores history matched only by PAN, so such a row is not an input
+        history = get_customer_snapshots().lookup(customer_id, customer_data.get("pan_number"))
+        if history and history["matched_on"] == "customer_id":
+            history = {field: history.get(field) for field in SNAPSHOT_FIELDS}
+        else:
+            history = None
+        parts = [
+            _dumps({k: v for k, v in customer_data.items() if k not in VOLATILE_FIELDS}),
+            _dumps(documents or []),
+            *(inputs[kind] for kind in INPUTS),
+            _dumps(history),
+            policies.champion.version if policies.champion else "",
+            f"{challenger.version}:{policies.challenger_share}" if challenger else "",
+            get_model_registry().current_version or ""
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    def _inputs(self, customer_id: str) -> Optional[Dict[str, str]]:
+        inputs = {kind: self.store.get(self._key(kind, customer_id)) for kind in INPUTS}
+        return inputs if all(inputs.values()) else None
+
+    def record_decision(self, customer_id: Optional[str], customer_data: Dict[str, Any],
+                        documents: Optional[List[Dict[str, Any]]], state: Dict[str, Any]) -> bool:
+        """Cache the outcome of a full run; only done while all its inputs are cached"""
+        if not customer_id:
+            return False
+        inputs = self._inputs(customer_id)
+        if inputs is None:
+            return False
+        ttl = min(self.store.ttl(self._key(kind, customer_id)) for kind in INPUTS)
+        if ttl <= 0:
+            return False
+        entry = {
+            "fingerprint": self._fingerprint(customer_id, customer_data, documents, inputs),
+            "outcome": {field: state.get(field) for field in OUTCOME_FIELDS if state.get(field) is not None}
+        }
+        self.store.set(self._key("decision", customer_id), _dumps(entry), ttl)  # never outlives an input
+        with self._lock:
+            self.stored += 1
+        return True
+
+    def lookup(self, customer_id: Optional[str], customer_data: Dict[str, Any],
+               documents: Optional[List[Dict[str, Any]]] = None,
+               fraud_check: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """The cached outcome and its inputs, as workflow state fields, if every input is live and unchanged.
+
+        fraud_check is a fresh fraud detection result for the customer; one that
+        requires review is a miss.
+        """
+        reason = None
+        outcome = None
+        if not customer_id:
+            reason = "no_customer_id"
+        else:
+            cached = self.store.get(self._key("decision", customer_id))
+            inputs = self._inputs(customer_id) if cached else None
+            if cached is None:
+                reason = "no_decision"
+            elif inputs is None:
+                reason = "input_expired"
+            elif fraud_check and fraud_check.get("requires_review"):
+                reason = "fraud_flagged"
+                self.store.delete(self._key("decision", customer_id))
+            else:
+                entry = json.loads(cached)
+                if entry["fingerprint"] != self._fingerprint(customer_id, customer_data, documents, inputs):
+                    reason = "input_changed"
+                    self.store.delete(self._key("decision", customer_id))
+                else:
+                    outcome = {**entry["outcome"], **{INPUTS[kind]: json.loads(inputs[kind]) for kind in INPUTS}}
+        with self._lock:
+            if outcome is not None:
+                self.hits += 1
+            else:
+                self.misses[reason] = self.misses.get(reason, 0) + 1
+        return outcome
+
+    def invalidate(self, customer_id: str):
+        """Drop every cached entry for a customer, e.g. when they upload new documents"""
+        for kind in [*INPUTS, "decision"]:
+            self.store.delete(self._key(kind, customer_id))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + sum(self.misses.values())
+            return {
+                "hits": self.hits,
+                "misses": dict(self.misses),
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "decisions_stored": self.stored
+            }
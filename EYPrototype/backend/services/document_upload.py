@@ -0,0 +1,254 @@
+from typing import Dict, Any, Optional, Tuple, BinaryIO
+from config import Config
+from contextlib import contextmanager
+from .object_store import ObjectStore, create_object_store
+from .otp import TtlStore, create_ttl_store
+import hashlib
+import json
+import threading
+import time
+
+# Magic-byte signatures for the document formats we accept
+CONTENT_SIGNATURES = [
+    (b"%PDF-", "application/pdf", "pdf"),
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"II*\x00", "image/tiff", "tif"),
+    (b"MM\x00*", "image/tiff", "tif"),
+]
+SNIFF_BYTES = 16
+
+def sniff_content_type(head: bytes) -> Optional[Tuple[str, str]]:
+    """Return (content_type, extension) detected from the leading bytes"""
+    for signature, content_type, extension in CONTENT_SIGNATURES:
+        if head.startswith(signature):
+            return content_type, extension
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    return None
+
+class UploadRejected(ValueError):
+    """Raised when an upload violates size, type or offset constraints"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+class DocumentUploadService:
+    """Streams uploaded documents into the object store.
+
+    Data is copied in fixed-size chunks while the SHA-256 digest and content
+    type are computed on the fly, so memory use does not depend on file size.
+    Objects are stored under their content hash, which deduplicates repeat
+    uploads of the same document.
+
+    Resumable sessions keep their metadata in a TtlStore (shared by all
+    workers with the Redis backend) and their bytes in the object store's
+    staging area, so any worker can take the next chunk and an upload can
+    resume after a restart. The offset is always the staged size. A worker
+    keeps the running hash of uploads whose every chunk it received; when
+    another worker took part, completion rehashes the staged file instead.
+    """
+
+    def __init__(self, store: ObjectStore = None, sessions: TtlStore = None):
+        self.store = store or create_object_store()
+        self.sessions = sessions or create_ttl_store(Config.UPLOAD_SESSION_STORE_BACKEND)
+        self.chunk_size = Config.UPLOAD_CHUNK_SIZE
+        self.max_bytes = Config.MAX_UPLOAD_BYTES
+        self._hashing: Dict[str, Dict[str, Any]] = {}  # upload_id -> running hash state on this worker
+        self._hashing_lock = threading.Lock()
+        self._purged_at = 0.0
+
+    def save_stream(self, stream: BinaryIO, customer_id: str, document_type: str) -> Dict[str, Any]:
+        """Store a complete document read from a file-like stream"""
+        handle = self.store.begin()
+        state = self._new_state()
+        try:
+            with self.store.open_append(handle) as out:
+                self._copy(stream, out, state)
+            return self._finalize(handle, state, customer_id, document_type)
+        except Exception:
+            self.store.abort(handle)
+            raise
+
+    def start_upload(self, customer_id: str, document_type: str,
+                     total_size: Optional[int] = None) -> Dict[str, Any]:
+        """Open a resumable upload session for large scanned bundles"""
+        if total_size is not None and total_size > self.max_bytes:
+            raise UploadRejected(f"File exceeds maximum size of {self.max_bytes} bytes", 413)
+
+        self._expire_sessions()
+        upload_id = self.store.begin()
+        self.sessions.set(self._session_key(upload_id), json.dumps({
+            "customer_id": customer_id,
+            "document_type": document_type,
+            "total_size": total_size,
+            "started_at": time.time()
+        }), Config.UPLOAD_SESSION_TTL_SECONDS)
+        with self._hashing_lock:
+            self._hashing[upload_id] = {**self._new_state(), "started_at": time.time()}
+
+        return {"upload_id": upload_id, "offset": 0, "chunk_size": self.chunk_size}
+
+    def get_upload_offset(self, upload_id: str) -> int:
+        """Bytes received so far, used by clients to resume an interrupted upload"""
+        self._get_session(upload_id)
+        return self._staged_size(upload_id)
+
+    def append_chunk(self, upload_id: str, offset: int, stream: BinaryIO) -> int:
+        """Append a chunk at the given offset and return the new offset"""
+        session = self._get_session(upload_id)
+        with self._session_lock(upload_id):
+            current = self._staged_size(upload_id)
+            if offset != current:
+                raise UploadRejected(f"Offset mismatch: upload is at byte {current}", 409)
+
+            state = self._hash_state(upload_id, current)
+            with self.store.open_append(upload_id) as out:
+                self._copy(stream, out, state)
+
+            total_size = session.get("total_size")
+            if total_size is not None and state["size"] > total_size:
+                raise UploadRejected("Received more bytes than the declared size", 413)
+            return state["size"]
+
+    def complete_upload(self, upload_id: str) -> Dict[str, Any]:
+        """Finalize a resumable upload and publish it to the object store"""
+        session = self._get_session(upload_id)
+        with self._session_lock(upload_id):
+            size = self._staged_size(upload_id)
+            total_size = session.get("total_size")
+            if total_size is not None and size != total_size:
+                raise UploadRejected(f"Upload incomplete: {size} of {total_size} bytes received")
+
+            state = self._hash_state(upload_id, size)
+            if state["hasher"] is None:
+                state = self._rehash(upload_id)  # chunks arrived on another worker or before a restart
+
+            self.sessions.delete(self._session_key(upload_id))
+            with self._hashing_lock:
+                self._hashing.pop(upload_id, None)
+            try:
+                return self._finalize(upload_id, state, session["customer_id"], session["document_type"])
+            except Exception:
+                self.store.abort(upload_id)
+                raise
+
+    def abort_upload(self, upload_id: str) -> None:
+        """Cancel a resumable upload and discard staged data"""
+        self.sessions.delete(self._session_key(upload_id))
+        with self._hashing_lock:
+            self._hashing.pop(upload_id, None)
+        self.store.abort(upload_id)
+
+    def _new_state(self) -> Dict[str, Any]:
+        return {"hasher": hashlib.sha256(), "size": 0, "head": b""}
+
+    def _copy(self, stream: BinaryIO, out: BinaryIO, state: Dict[str, Any]):
+        """Copy stream to out in chunks, updating hash (if tracked), size and sniff buffer"""
+        hasher = state["hasher"]
+        while True:
+            chunk = stream.read(self.chunk_size)
+            if not chunk:
+                break
+            if state["size"] + len(chunk) > self.max_bytes:
+                raise UploadRejected(f"File exceeds maximum size of {self.max_bytes} bytes", 413)
+
+            out.write(chunk)
+            # Only account for bytes once they are written so a failed
+            # chunk leaves the state consistent with the staged data
+            if hasher is not None:
+                hasher.update(chunk)
+            state["size"] += len(chunk)
+            if len(state["head"]) < SNIFF_BYTES:
+                state["head"] += chunk[:SNIFF_BYTES - len(state["head"])]
+
+    def _finalize(self, handle: str, state: Dict[str, Any],
+                  customer_id: str, document_type: str) -> Dict[str, Any]:
+        if state["size"] == 0:
+            raise UploadRejected("Empty file")
+
+        sniffed = sniff_content_type(state["head"])
+        if not sniffed:
+            raise UploadRejected("Unsupported document format", 415)
+        content_type, extension = sniffed
+
+        digest = state["hasher"].hexdigest()
+        key = f"{digest}.{extension}"
+        duplicate = self.store.exists(key)
+        if duplicate:
+            self.store.abort(handle)
+        else:
+            self.store.commit(handle, key)
+
+        return {
+            "type": document_type,
+            "customer_id": customer_id,
+            "filename": key,
+            "url": self.store.url(key),
+            "sha256": digest,
+            "content_type": content_type,
+            "size": state["size"],
+            "duplicate": duplicate
+        }
+
+    def _rehash(self, upload_id: str) -> Dict[str, Any]:
+        """Hash, size and sniff buffer rebuilt by reading the staged file"""
+        state = self._new_state()
+        with self.store.open_staged(upload_id) as staged:
+            while True:
+                chunk = staged.read(self.chunk_size)
+                if not chunk:
+                    return state
+                state["hasher"].update(chunk)
+                state["size"] += len(chunk)
+                if len(state["head"]) < SNIFF_BYTES:
+                    state["head"] += chunk[:SNIFF_BYTES - len(state["head"])]
+
+    def _hash_state(self, upload_id: str, size: int) -> Dict[str, Any]:
+        """This worker's running hash if it saw all `size` staged bytes, else a size-only state"""
+        with self._hashing_lock:
+            state = self._hashing.get(upload_id)
+            if state is not None and state["size"] == size:
+                return state
+            self._hashing.pop(upload_id, None)  # another worker appended since; rehash on completion
+        return {"hasher": None, "size": size, "head": b""}
+
+    @staticmethod
+    def _session_key(upload_id: str) -> str:
+        return f"upload:{upload_id}"
+
+    @contextmanager
+    def _session_lock(self, upload_id: str):
+        """Serialize chunk and complete requests for one upload across workers"""
+        key = f"{self._session_key(upload_id)}:lock"
+        if not self.sessions.add(key, "1", Config.UPLOAD_SESSION_LOCK_SECONDS):
+            raise UploadRejected("Another request for this upload is in progress", 409)
+        try:
+            yield
+        finally:
+            self.sessions.delete(key)
+
+    def _staged_size(self, upload_id: str) -> int:
+        try:
+            return self.store.staged_size(upload_id)
+        except KeyError:
+            raise UploadRejected("Upload session not found", 404)
+
+    def _get_session(self, upload_id: str) -> Dict[str, Any]:
+        raw = self.sessions.get(self._session_key(upload_id))
+        if not raw:
+            raise UploadRejected("Upload session not found", 404)
+        return json.loads(raw)
+
+    def _expire_sessions(self):
+        """Drop hash state and staged data of resumable sessions abandoned by the client"""
+        cutoff = time.time() - Config.UPLOAD_SESSION_TTL_SECONDS
+        with self._hashing_lock:
+            expired = [uid for uid, s in self._hashing.items() if s["started_at"] < cutoff]
+            for upload_id in expired:
+                self._hashing.pop(upload_id, None)
+        # Session metadata expires in the TtlStore; staged files are swept by age, once a minute
+        if time.time() - self._purged_at >= 60:
+            self._purged_at = time.time()
+            self.store.purge_staged(Config.UPLOAD_SESSION_TTL_SECONDS)
@@ -0,0 +1,205 @@
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict, deque
+from config import Config
+from .object_store import ObjectStore, create_object_store
+from .document_upload import sniff_content_type, SNIFF_BYTES
+import numpy as np
+import asyncio
+import base64
+import binascii
+import threading
+import time
+
+ID_DOCUMENT_TYPES = ["aadhaar", "pan", "passport"]
+
+class FaceNotFound(ValueError):
+    """Raised when no face can be detected in an image"""
+    pass
+
+class FaceMatchService:
+    """CPU-only face verification using OpenCV's YuNet detector and SFace embeddings.
+
+    Embeddings of ID documents are cached by object key (the content hash), so
+    a selfie retry only has to embed the new selfie. Embeddings are L2
+    normalized, which turns cosine similarity into a dot product and lets the
+    batch path score a whole backlog with one matrix operation.
+    """
+
+    def __init__(self, store: ObjectStore = None, cache_size: int = None):
+        self.store = store or create_object_store()
+        self.cache_size = cache_size or Config.FACE_EMBEDDING_CACHE_SIZE
+        self._detector = None
+        self._recognizer = None
+        self._model_lock = threading.Lock()
+        self._embeddings: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _load_models(self):
+        import cv2
+        self._detector = cv2.FaceDetectorYN.create(Config.FACE_DETECTOR_MODEL, "", (320, 320), 0.8)
+        self._recognizer = cv2.FaceRecognizerSF.create(Config.FACE_RECOGNIZER_MODEL, "")
+
+    async def match(self, documents: List[Dict[str, Any]], selfie_image: str) -> Dict[str, Any]:
+        """Match a selfie against the customer's ID document photo"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.match_sync, documents, selfie_image)
+
+    def match_sync(self, documents: List[Dict[str, Any]], selfie_image: str) -> Dict[str, Any]:
+        id_document = self._find_id_document(documents)
+        if not id_document or not selfie_image:
+            return {
+                "status": "failed",
+                "confidence": 0.0,
+                "reason": "Missing selfie or ID document"
+            }
+
+        start = time.perf_counter()
+        try:
+            id_embedding = self.document_embedding(id_document)
+            selfie_embedding = self._embed(self._decode(self._load_selfie(selfie_image)))
+        except Exception as e:
+            return {"status": "failed", "confidence": 0.0, "reason": str(e)}
+
+        similarity = float(np.dot(id_embedding, selfie_embedding))
+        self._latencies.append(time.perf_counter() - start)
+        return self._result(similarity)
+
+    def match_batch(self, cases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Re-verify a backlog of {documents, selfie_image} cases in one pass"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(cases)
+        id_rows, selfie_rows, positions = [], [], []
+
+        for i, case in enumerate(cases):
+            id_document = self._find_id_document(case.get("documents", []))
+            selfie_image = case.get("selfie_image")
+            if not id_document or not selfie_image:
+                results[i] = {"status": "failed", "confidence": 0.0, "reason": "Missing selfie or ID document"}
+                continue
+            try:
+                id_embedding = self.document_embedding(id_document)
+                selfie_embedding = self._embed(self._decode(self._load_selfie(selfie_image)))
+            except Exception as e:
+                results[i] = {"status": "failed", "confidence": 0.0, "reason": str(e)}
+                continue
+            id_rows.append(id_embedding)
+            selfie_rows.append(selfie_embedding)
+            positions.append(i)
+
+        if positions:
+            # Row-wise dot products of normalized embeddings = cosine similarities
+            similarities = np.einsum("ij,ij->i", np.vstack(id_rows), np.vstack(selfie_rows))
+            for i, similarity in zip(positions, similarities):
+                results[i] = self._result(float(similarity))
+
+        return results
+
+    def document_embedding(self, document: Dict[str, Any]) -> np.ndarray:
+        """Face embedding of an ID document, computed once per stored object"""
+        key = document.get("filename")
+        if not key:
+            raise ValueError("ID document has not been uploaded")
+
+        with self._cache_lock:
+            embedding = self._embeddings.get(key)
+            if embedding is not None:
+                self._embeddings.move_to_end(key)
+                self.cache_hits += 1
+                return embedding
+            self.cache_misses += 1
+
+        embedding = self._embed(self._read_document_image(self.store.local_path(key)))
+        with self._cache_lock:
+            self._embeddings[key] = embedding
+            while len(self._embeddings) > self.cache_size:
+                self._embeddings.popitem(last=False)
+        return embedding
+
+    def _embed(self, image: np.ndarray) -> np.ndarray:
+        """Detect the largest face in a BGR image and return its unit embedding"""
+        with self._model_lock:
+            if self._recognizer is None:
+                self._load_models()
+            height, width = image.shape[:2]
+            self._detector.setInputSize((width, height))
+            _, faces = self._detector.detect(image)
+            if faces is None or len(faces) == 0:
+                raise FaceNotFound("No face detected")
+            face = max(faces, key=lambda f: f[2] * f[3])
+            aligned = self._recognizer.alignCrop(image, face)
+            feature = self._recognizer.feature(aligned)
+
+        embedding = feature.flatten().astype(np.float32)
+        return embedding / np.linalg.norm(embedding)
+
+    def _result(self, similarity: float) -> Dict[str, Any]:
+        confidence = self._similarity_to_confidence(similarity)
+        return {
+            "status": "matched" if confidence > 0.80 else "not_matched",
+            "confidence": confidence,
+            "similarity": round(similarity, 4),
+            "threshold": 0.80
+        }
+
+    def _similarity_to_confidence(self, similarity: float) -> float:
+        """Map SFace cosine similarity onto the 0-1 confidence scale used by verification"""
+        # The model's decision threshold lands exactly on the 0.80 match threshold
+        threshold = Config.FACE_MATCH_SIMILARITY_THRESHOLD
+        if similarity >= threshold:
+            confidence = 0.80 + 0.20 * (similarity - threshold) / (1.0 - threshold)
+        else:
+            confidence = 0.80 * max(similarity, 0.0) / threshold
+        return round(min(confidence, 1.0), 3)
+
+    def _find_id_document(self, documents: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        return next((doc for doc in documents if doc.get("type") in ID_DOCUMENT_TYPES), None)
+
+    def _load_selfie(self, selfie_image: str) -> bytes:
+        """Selfies arrive as an uploaded object key, a data URI or raw base64"""
+        if selfie_image.startswith("data:"):
+            return base64.b64decode(selfie_image.split(",", 1)[1])
+        try:
+            if self.store.exists(selfie_image):
+                with open(self.store.local_path(selfie_image), "rb") as f:
+                    return f.read()
+        except KeyError:
+            pass
+        try:
+            return base64.b64decode(selfie_image, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("Unrecognized selfie image reference")
+
+    def _decode(self, data: bytes) -> np.ndarray:
+        import cv2
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Unreadable image")
+        return image
+
+    def _read_document_image(self, path: str) -> np.ndarray:
+        with open(path, "rb") as f:
+            data = f.read()
+        sniffed = sniff_content_type(data[:SNIFF_BYTES])
+        if sniffed and sniffed[0] == "application/pdf":
+            # Scanned ID cards uploaded as PDF: the photo is on the first page
+            from pdf2image import convert_from_bytes
+            page = convert_from_bytes(data, dpi=200, first_page=1, last_page=1)[0]
+            return np.asarray(page.convert("RGB"))[:, :, ::-1].copy()
+        return self._decode(data)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = np.array(self._latencies) * 1000 if self._latencies else None
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            cache = {
+                "entries": len(self._embeddings),
+                "hit_ratio": round(self.cache_hits / lookups, 3) if lookups else 0.0
+            }
+        return {
+            "matches": len(self._latencies),
+            "latency_ms_p50": round(float(np.percentile(latencies, 50)), 2) if latencies is not None else None,
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)), 2) if latencies is not None else None,
+            "embedding_cache": cache
+        }
@@ -0,0 +1,221 @@
+"""Columnar store of underwriting decisions and their repayment outcomes.
+
+Decisions are buffered in memory by each worker and written as Parquet part
+files under FEEDBACK_DIR/decisions/dt=YYYY-MM-DD/ (one file per flush, so
+workers never write the same file). Repayment outcomes arrive later as CSV
+or Parquet files keyed by decision_id or application_id and are copied into
+FEEDBACK_DIR/outcomes/. training_table() joins the two for the risk model.
+
+    python -m services.feedback_store --load-outcomes repayments.csv
+    python -m services.feedback_store --stats
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+from config import Config
+import argparse
+import os
+import threading
+import time
+import uuid
+
+# Column name -> pyarrow type name; records may omit columns (written as null)
+DECISION_COLUMNS = {
+    "decision_id": "string",
+    "customer_id": "string",
+    "decided_at": "timestamp",
+    "decision": "string",
+    "fast_path": "bool",  # reused a cached decision, see services.decision_cache
+    "product": "string",
+    "policy_version": "string",
+    "credit_score": "float64",
+    "verification_confidence": "float64",
+    "risk_score": "float64",
+    "profile_risk": "float64",
+    "risk_model_version": "string",
+    "pre_approval_limit": "float64",
+    "loan_amount": "float64",
+    "interest_rate": "float64",
+    "tenure_months": "int32",
+    # profile inputs, see services.risk_model.PROFILE_INPUTS
+    "salary": "float64",
+    "requested_amount": "float64",
+    "has_salary_slip": "bool",
+    "age": "float64",
+    "employment_type": "string",
+    "loan_type": "string",
+}
+
+OUTCOME_COLUMNS = {"decision_id": "string", "defaulted": "bool", "observed_at": "timestamp"}
+
+def _write_parquet(table, path: str):
+    # Write under a dot-prefixed name (which dataset readers skip) and rename,
+    # so readers never see a partial file
+    import pyarrow.parquet as pq
+    temporary = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+    pq.write_table(table, temporary)
+    os.replace(temporary, path)
+
+def _schema(columns: Dict[str, str]):
+    import pyarrow as pa
+    types = {"string": pa.string(), "float64": pa.float64(), "int32": pa.int32(), "bool": pa.bool_(),
+             "timestamp": pa.timestamp("ms")}
+    return pa.schema([(name, types[kind]) for name, kind in columns.items()])
+
+class FeedbackStore:
+    """Appends decisions to Parquet and joins them with outcomes for training"""
+
+    def __init__(self, directory: Optional[str] = None, flush_rows: Optional[int] = None):
+        self.directory = directory or Config.FEEDBACK_DIR
+        self.flush_rows = Config.FEEDBACK_FLUSH_ROWS if flush_rows is None else flush_rows
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flush_thread: Optional[threading.Thread] = None
+        self.written = 0
+
+    @property
+    def decisions_dir(self) -> str:
+        return os.path.join(self.directory, "decisions")
+
+    @property
+    def outcomes_dir(self) -> str:
+        return os.path.join(self.directory, "outcomes")
+
+    def append(self, record: Dict[str, Any]):
+        """Buffer one decision; writes a part file once flush_rows are buffered"""
+        record = {name: record.get(name) for name in DECISION_COLUMNS}
+        record["decided_at"] = record["decided_at"] or datetime.now()
+        with self._lock:
+            self._buffer.append(record)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def flush(self) -> Optional[str]:
+        """Write buffered decisions to a new part file; returns its path"""
+        with self._flush_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+            if not records:
+                return None
+            import pyarrow as pa
+            try:
+                table = pa.Table.from_pylist(records, schema=_schema(DECISION_COLUMNS))
+                day = records[0]["decided_at"].strftime("%Y-%m-%d")
+                directory = os.path.join(self.decisions_dir, f"dt={day}")
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet")
+                _write_parquet(table, path)
+            except Exception as e:
+                print(f"Error writing feedback decisions: {str(e)}")
+                with self._lock:
+                    self._buffer[:0] = records  # retry with the next flush
+                return None
+            self.written += len(records)
+            return path
+
+    def start_flushing(self, interval: Optional[float] = None):
+        """Flush buffered decisions periodically in a daemon thread"""
+        if self._flush_thread:
+            return
+        interval = interval or Config.FEEDBACK_FLUSH_SECONDS
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                self.flush()
+
+        self._flush_thread = threading.Thread(target=_run, name="feedback-flush", daemon=True)
+        self._flush_thread.start()
+
+    def _read(self, directory: str, columns: Dict[str, str]):
+        import pyarrow.dataset as ds
+        if not os.path.isdir(directory):
+            return _schema(columns).empty_table()
+        # The declared schema lets part files written before a column was added read it as null
+        dataset = ds.dataset(directory, schema=_schema(columns), format="parquet", partitioning="hive",
+                             exclude_invalid_files=True)
+        return dataset.to_table(columns=list(columns))
+
+    def decisions(self):
+        """Every flushed decision as one pyarrow Table"""
+        return self._read(self.decisions_dir, DECISION_COLUMNS)
+
+    def outcomes(self):
+        return self._read(self.outcomes_dir, OUTCOME_COLUMNS)
+
+    def load_outcomes(self, path: str, db_service=None) -> int:
+        """Copy a repayment file (CSV or Parquet) into the store; returns rows loaded.
+
+        The file needs a `defaulted` column (true/1 for a default) and either
+        `decision_id` or `application_id`; application ids are resolved to
+        decision ids through loan_applications. `observed_at` is optional.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.csv as csv
+        import pyarrow.parquet as pq
+        table = pq.read_table(path) if path.endswith(".parquet") else csv.read_csv(path)
+        if "decision_id" not in table.column_names:
+            if "application_id" not in table.column_names:
+                raise ValueError("outcome file needs a decision_id or application_id column")
+            decision_ids = self._decision_ids(table.column("application_id").cast(pa.string()).to_pylist(), db_service)
+            table = table.append_column("decision_id", pa.array(decision_ids, pa.string()))
+        if "observed_at" not in table.column_names:
+            table = table.append_column("observed_at", pa.array([datetime.now()] * len(table), pa.timestamp("ms")))
+        table = table.filter(pc.is_valid(table.column("decision_id")))
+        outcomes = pa.table({
+            "decision_id": table.column("decision_id").cast(pa.string()),
+            "defaulted": table.column("defaulted").cast(pa.bool_()),
+            "observed_at": table.column("observed_at").cast(pa.timestamp("ms"))
+        })
+        os.makedirs(self.outcomes_dir, exist_ok=True)
+        target = os.path.join(self.outcomes_dir, f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet")
+        _write_parquet(outcomes, target)
+        return len(outcomes)
+
+    @staticmethod
+    def _decision_ids(application_ids: List[Optional[str]], db_service=None) -> List[Optional[str]]:
+        from bson import ObjectId
+        if db_service is None:
+            from services.database import DatabaseService
+            db_service = DatabaseService()
+        keys = [ObjectId(a) if a and ObjectId.is_valid(a) else a for a in application_ids]
+        found = {}
+        for start in range(0, len(keys), 10_000):
+            for application in db_service.loan_applications.find(
+                    {"_id": {"$in": keys[start:start + 10_000]}}, {"result.feedback_data.decision_id": 1}):
+                found[str(application["_id"])] = ((application.get("result") or {}).get("feedback_data") or {}).get("decision_id")
+        return [found.get(str(a)) for a in application_ids]
+
+    def training_table(self):
+        """Decisions that led to a loan, with `defaulted` true if any outcome reported a default"""
+        import pyarrow.compute as pc
+        outcomes = self.outcomes().group_by("decision_id").aggregate([("defaulted", "max")])
+        outcomes = outcomes.rename_columns(["defaulted" if c == "defaulted_max" else c for c in outcomes.column_names])
+        decisions = self.decisions()
+        decisions = decisions.filter(pc.is_in(decisions.column("decision"), value_set=_approved_decisions()))
+        return decisions.join(outcomes, "decision_id", join_type="inner")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            buffered = len(self._buffer)
+        return {"directory": self.directory, "buffered": buffered, "written": self.written}
+
+def _approved_decisions():
+    import pyarrow as pa
+    from services.dashboard_stats import APPROVED_DECISIONS
+    return pa.array(APPROVED_DECISIONS, pa.string())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--load-outcomes", metavar="FILE", help="CSV or Parquet of repayment outcomes")
+    parser.add_argument("--stats", action="store_true", help="print decision, outcome and training row counts")
+    args = parser.parse_args()
+
+    store = FeedbackStore()
+    if args.load_outcomes:
+        print(f"loaded {store.load_outcomes(args.load_outcomes):,} outcomes")
+    if args.stats or not args.load_outcomes:
+        print(f"decisions {store.decisions().num_rows:,}, outcomes {store.outcomes().num_rows:,}, "
+              f"training rows {store.training_table().num_rows:,}")
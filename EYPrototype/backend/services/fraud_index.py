@@ -0,0 +1,444 @@
+from typing import Dict, Any, List, Optional
+from config import Config
+from .identifiers import (
+    IDENTIFIER_KINDS, MAX_DOCUMENT_KEYS, normalize_identifier, identifier_hash, extract_identifiers
+)
+from .database import change_cursor
+import numpy as np
+import threading
+import time
+
+KEYS_PER_APPLICATION = len(IDENTIFIER_KINDS) - 1 + MAX_DOCUMENT_KEYS
+
+class _GrowableArray:
+    """Amortized O(1) append on top of a numpy array"""
+
+    def __init__(self, dtype, width: int = 0, capacity: int = 1024):
+        shape = (capacity, width) if width else (capacity,)
+        self.data = np.zeros(shape, dtype=dtype)
+        self.size = 0
+
+    def append(self, value) -> int:
+        if self.size == len(self.data):
+            grown = np.zeros((len(self.data) * 2,) + self.data.shape[1:], dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.data[self.size] = value
+        self.size += 1
+        return self.size - 1
+
+    def extend(self, values: np.ndarray) -> int:
+        start = self.size
+        needed = start + len(values)
+        if needed > len(self.data):
+            capacity = max(needed, len(self.data) * 2)
+            grown = np.zeros((capacity,) + self.data.shape[1:], dtype=self.data.dtype)
+            grown[:start] = self.data[:start]
+            self.data = grown
+        self.data[start:needed] = values
+        self.size = needed
+        return start
+
+    def view(self) -> np.ndarray:
+        return self.data[:self.size]
+
+class DuplicateApplicationIndex:
+    """In-memory index from identifiers (phone, email, PAN, device, IP, document hash)
+    to loan applications, used for duplicate-application and fraud-ring checks.
+
+    Postings are kept as a sorted pair of numpy arrays (identifier hash,
+    application slot) plus a small unsorted delta for recent inserts. Lookups
+    are a vectorized binary search over the sorted segment and a scan of the
+    delta; the delta is merged back once it grows past a fraction of the main
+    segment, which keeps inserts amortized O(log n).
+
+    Connected components (fraud rings) are maintained incrementally with a
+    union-find over application slots: two applications are linked whenever
+    they share any identifier, and all applications of one customer are
+    linked to each other. Sizes count distinct customers, not applications,
+    and a customer's own earlier applications are never counted against
+    them, so a returning customer is not a duplicate or a ring.
+    """
+
+    def __init__(self, db_service=None):
+        self.db_service = db_service
+        self._lock = threading.RLock()
+
+        self._app_ids: List[str] = []
+        self._app_slots: Dict[str, int] = {}
+        self._created_at = _GrowableArray(np.float64)
+        self._keys = _GrowableArray(np.uint64, width=KEYS_PER_APPLICATION)
+        self._parent = _GrowableArray(np.int64)
+        self._component_size = _GrowableArray(np.int64)  # distinct customers, valid at roots
+        self._owners = _GrowableArray(np.int64)  # customer code per slot, -1 when unknown
+        self._customer_codes: Dict[str, int] = {}
+        self._customer_first_slot: List[int] = []  # code -> the customer's first application slot
+
+        self._sorted_keys = np.zeros(0, dtype=np.uint64)
+        self._sorted_slots = np.zeros(0, dtype=np.int64)
+        self._delta: Dict[int, List[int]] = {}
+        self._delta_postings = 0
+
+        self._sync_cursor = None
+        self._sync_thread: Optional[threading.Thread] = None
+        self._stop_sync = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._app_ids)
+
+    @staticmethod
+    def _hash_identifiers(identifiers: Dict[str, List[str]]) -> np.ndarray:
+        row = np.zeros(KEYS_PER_APPLICATION, dtype=np.uint64)
+        column = 0
+        for kind in IDENTIFIER_KINDS:
+            limit = MAX_DOCUMENT_KEYS if kind == "document" else 1
+            for value in identifiers.get(kind, [])[:limit]:
+                row[column] = identifier_hash(kind, value)
+                column += 1
+        return row
+
+    def _owner(self, customer_id: Optional[str], slot: int) -> int:
+        """Customer code for a new slot (-1 without a customer id), registering first-seen customers"""
+        if not customer_id:
+            return -1
+        code = self._customer_codes.get(customer_id)
+        if code is None:
+            code = self._customer_codes[customer_id] = len(self._customer_first_slot)
+            self._customer_first_slot.append(slot)
+        return code
+
+    def add_application(self, application_id: str, identifiers: Dict[str, List[str]],
+                        created_at: Optional[float] = None, customer_id: Optional[str] = None):
+        """Index an application; re-adding an existing id links its new identifiers"""
+        row = self._hash_identifiers(identifiers)
+        created_at = created_at if created_at is not None else time.time()
+
+        with self._lock:
+            slot = self._app_slots.get(application_id)
+            if slot is None:
+                slot = len(self._app_ids)
+                owner = self._owner(customer_id, slot)
+                first = owner < 0 or self._customer_first_slot[owner] == slot
+                self._app_ids.append(application_id)
+                self._app_slots[application_id] = slot
+                self._created_at.append(created_at)
+                self._keys.append(row)
+                self._owners.append(owner)
+                self._parent.append(slot)
+                self._component_size.append(1 if first else 0)  # a repeat customer adds no one
+                if not first:
+                    self._union(slot, self._customer_first_slot[owner])
+            else:
+                # Identifiers can change on update; keep the old postings, they are still evidence
+                existing = self._keys.data[slot]
+                new_keys = [k for k in row if k and k not in existing]
+                free = [i for i, k in enumerate(existing) if not k]
+                for column, key in zip(free, new_keys):
+                    existing[column] = key
+                row = np.array(new_keys, dtype=np.uint64)
+
+            for key in row:
+                key = int(key)
+                if not key:
+                    continue
+                linked = self._first_posting(key)
+                if linked is not None:
+                    self._union(slot, linked)
+                self._delta.setdefault(key, []).append(slot)
+                self._delta_postings += 1
+
+            if self._delta_postings > max(Config.FRAUD_INDEX_COMPACT_THRESHOLD, len(self._sorted_keys) // 8):
+                self._compact()
+
+    def bulk_load(self, application_ids: List[str], key_matrix: np.ndarray, created_at: np.ndarray,
+                  customer_ids: Optional[List[Optional[str]]] = None):
+        """Build the index from pre-hashed identifiers in one vectorized pass.
+
+        key_matrix is (n, KEYS_PER_APPLICATION) uint64 with 0 for missing
+        identifiers; customer_ids (None entries allowed) is the owner of
+        each application. Intended for startup rebuilds from a full export.
+        """
+        with self._lock:
+            base = len(self._app_ids)
+            count = len(application_ids)
+            slots = np.arange(base, base + count, dtype=np.int64)
+            owners = [self._owner(customer_id, slot)
+                      for customer_id, slot in zip(customer_ids or [None] * count, range(base, base + count))]
+
+            self._app_ids.extend(application_ids)
+            self._app_slots.update(zip(application_ids, range(base, base + count)))
+            self._created_at.extend(np.asarray(created_at, dtype=np.float64))
+            self._keys.extend(key_matrix.astype(np.uint64))
+            self._owners.extend(np.array(owners, dtype=np.int64))
+            self._parent.extend(slots)
+            self._component_size.extend(np.ones(count, dtype=np.int64))
+
+            flat_keys = key_matrix.reshape(-1)
+            flat_slots = np.repeat(slots, key_matrix.shape[1])
+            present = flat_keys != 0
+            self._merge_postings(flat_keys[present].astype(np.uint64), flat_slots[present])
+            self._relabel_components()
+
+    def count_shared(self, identifiers: Dict[str, List[str]], days: Optional[int] = None,
+                     exclude_application_id: Optional[str] = None,
+                     customer_id: Optional[str] = None) -> Dict[str, Any]:
+        """How many other customers applied in the last N days with any of these identifiers.
+
+        Applications by customer_id itself are skipped. ring_size is the
+        number of distinct customers, this one included, that would be
+        linked through shared identifiers.
+        """
+        days = days if days is not None else Config.DUPLICATE_LOOKBACK_DAYS
+        cutoff = time.time() - days * 86400
+
+        with self._lock:
+            exclude = self._app_slots.get(exclude_application_id, -1)
+            own = self._customer_codes.get(customer_id, -2) if customer_id else -2  # -1 marks unknown owners
+            matched = []
+            by_kind = {}
+            for kind in IDENTIFIER_KINDS:
+                for value in identifiers.get(kind, []):
+                    slots = self._postings(identifier_hash(kind, value))
+                    if len(slots) == 0:
+                        continue
+                    slots = slots[(self._created_at.data[slots] >= cutoff) & (slots != exclude) &
+                                  (self._owners.data[slots] != own)]
+                    if len(slots):
+                        by_kind[kind] = by_kind.get(kind, 0) + self._distinct_customers(np.unique(slots))
+                        matched.append(slots)
+
+            slots = np.unique(np.concatenate(matched)) if matched else np.zeros(0, dtype=np.int64)
+            roots = {self._find(int(s)) for s in slots}
+            # The applicant's own component counts once, whichever of their applications is in it
+            if own >= 0:
+                roots.add(self._find(self._customer_first_slot[own]))
+            if exclude >= 0:
+                roots.add(self._find(exclude))
+            ring_size = int(self._component_size.data[sorted(roots)].sum()) if roots else 0
+            if own < 0 and exclude < 0:
+                ring_size += 1
+
+        return {"count": self._distinct_customers(slots), "by_identifier": by_kind, "ring_size": ring_size}
+
+    def ring(self, application_id: str, limit: int = 1000) -> Dict[str, Any]:
+        """Applications connected to this one through any chain of shared identifiers; size counts customers"""
+        with self._lock:
+            slot = self._app_slots.get(application_id)
+            if slot is None:
+                return {"size": 0, "members": []}
+
+            root = self._find(slot)
+            size = int(self._component_size.data[root])
+
+            # Breadth-first walk over shared identifiers, capped for huge components
+            seen = {slot}
+            frontier = [slot]
+            while frontier and len(seen) < limit:
+                keys = self._keys.data[frontier].reshape(-1)
+                frontier = []
+                for key in np.unique(keys[keys != 0]):
+                    for linked in self._postings(int(key)):
+                        linked = int(linked)
+                        if linked not in seen and len(seen) < limit:
+                            seen.add(linked)
+                            frontier.append(linked)
+
+            return {"size": size, "members": [self._app_ids[s] for s in sorted(seen)]}
+
+    def rings(self, min_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """All components with at least min_size distinct customers, largest first"""
+        min_size = min_size or Config.FRAUD_RING_MIN_SIZE
+        with self._lock:
+            # Flatten the union-find by pointer jumping so every slot points at its root
+            parents = self._parent.view()
+            while True:
+                jumped = parents[parents]
+                if np.array_equal(jumped, parents):
+                    break
+                parents[:] = jumped
+            sizes = self._component_size.view()
+            roots = np.flatnonzero((parents == np.arange(len(parents))) & (sizes >= min_size))
+            roots = roots[np.argsort(-sizes[roots], kind="stable")]
+            return [{
+                "ring_id": self._app_ids[int(root)],
+                "size": int(sizes[root])
+            } for root in roots]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "applications": len(self._app_ids),
+                "customers": len(self._customer_first_slot),
+                "postings": int(len(self._sorted_keys) + self._delta_postings),
+                "delta_postings": self._delta_postings,
+                "memory_bytes": int(
+                    self._sorted_keys.nbytes + self._sorted_slots.nbytes +
+                    self._keys.data.nbytes + self._created_at.data.nbytes +
+                    self._parent.data.nbytes + self._component_size.data.nbytes + self._owners.data.nbytes
+                ),
+                "sync_cursor": self._sync_cursor
+            }
+
+    # Incremental sync from MongoDB
+
+    def sync_once(self, batch_size: int = 5000) -> int:
+        """Pull applications written since the last sync and index them.
+
+        Returns how many applications past the previous cursor were indexed; the
+        overlap window behind it is re-read too (re-adding an application is safe).
+        """
+        if not self.db_service:
+            return 0
+        if self._sync_cursor and Config.CHANGE_FEED_OVERLAP_SECONDS > 0:
+            for application in self.db_service.get_application_changes_behind(
+                    self._sync_cursor, Config.CHANGE_FEED_OVERLAP_SECONDS, batch_size):
+                self._index_change(application)
+        ingested = 0
+        while True:
+            applications = self.db_service.get_application_changes(self._sync_cursor, batch_size)
+            for application in applications:
+                self._index_change(application)
+                if application.get("updated_at"):
+                    self._sync_cursor = change_cursor(application)
+            ingested += len(applications)
+            if len(applications) < batch_size:
+                return ingested
+
+    def _index_change(self, application: Dict[str, Any]):
+        result = application.get("result") or {}
+        identifiers = extract_identifiers(
+            result.get("customer_data") or {},
+            result.get("documents") or []
+        )
+        created = application.get("created_at")
+        self.add_application(
+            str(application["_id"]),
+            identifiers,
+            created.timestamp() if created else None,
+            application.get("customer_id")
+        )
+
+    def start_sync(self, interval: Optional[float] = None):
+        """Keep the index current with a periodic delta pull in a daemon thread"""
+        if not self.db_service or self._sync_thread:
+            return
+        interval = interval or Config.FRAUD_INDEX_SYNC_INTERVAL_SECONDS
+
+        def _run():
+            try:
+                self.db_service.ensure_indexes()
+            except Exception as e:
+                print(f"Fraud index could not ensure indexes: {str(e)}")
+            while not self._stop_sync.is_set():
+                try:
+                    self.sync_once()
+                except Exception as e:
+                    print(f"Fraud index sync failed: {str(e)}")
+                self._stop_sync.wait(interval)
+
+        self._sync_thread = threading.Thread(target=_run, name="fraud-index-sync", daemon=True)
+        self._sync_thread.start()
+
+    def stop_sync(self):
+        self._stop_sync.set()
+
+    # Internals (callers hold self._lock)
+
+    def _distinct_customers(self, slots: np.ndarray) -> int:
+        """Customers behind these (unique) slots; applications without a customer count individually"""
+        owners = self._owners.data[slots]
+        return int(len(np.unique(owners[owners >= 0])) + np.count_nonzero(owners < 0))
+
+    def _postings(self, key: int) -> np.ndarray:
+        key_array = np.uint64(key)
+        left = np.searchsorted(self._sorted_keys, key_array, side="left")
+        right = np.searchsorted(self._sorted_keys, key_array, side="right")
+        delta = self._delta.get(key)
+        if delta:
+            return np.concatenate([self._sorted_slots[left:right], np.asarray(delta, dtype=np.int64)])
+        return self._sorted_slots[left:right]
+
+    def _first_posting(self, key: int) -> Optional[int]:
+        delta = self._delta.get(key)
+        if delta:
+            return delta[0]
+        key_array = np.uint64(key)
+        left = np.searchsorted(self._sorted_keys, key_array, side="left")
+        if left < len(self._sorted_keys) and self._sorted_keys[left] == key_array:
+            return int(self._sorted_slots[left])
+        return None
+
+    def _compact(self):
+        keys = np.fromiter((k for k, slots in self._delta.items() for _ in slots),
+                           dtype=np.uint64, count=self._delta_postings)
+        slots = np.fromiter((s for slots in self._delta.values() for s in slots),
+                            dtype=np.int64, count=self._delta_postings)
+        self._delta = {}
+        self._delta_postings = 0
+        self._merge_postings(keys, slots)
+
+    def _merge_postings(self, keys: np.ndarray, slots: np.ndarray):
+        keys = np.concatenate([self._sorted_keys, keys])
+        slots = np.concatenate([self._sorted_slots, slots])
+        order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[order]
+        self._sorted_slots = slots[order]
+
+    def _find(self, slot: int) -> int:
+        parent = self._parent.data
+        root = slot
+        while parent[root] != root:
+            root = int(parent[root])
+        while parent[slot] != root:
+            parent[slot], slot = root, int(parent[slot])
+        return root
+
+    def _union(self, a: int, b: int):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return
+        sizes = self._component_size.data
+        if sizes[root_a] < sizes[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent.data[root_b] = root_a
+        sizes[root_a] += sizes[root_b]
+
+    def _relabel_components(self):
+        """Recompute all components with vectorized label propagation.
+
+        Each application takes the minimum label among applications sharing
+        any identifier, then labels are pointer-jumped until stable. The
+        result is a flattened union-find (every slot points at its root).
+        """
+        count = len(self._app_ids)
+        if count == 0:
+            return
+        if self._delta_postings:
+            self._compact()
+
+        # Groups of slots that must share a label: one per identifier, and one per customer
+        owners = self._owners.view()
+        owned = np.flatnonzero(owners >= 0)
+        owned = owned[np.argsort(owners[owned], kind="stable")]
+        groups = []
+        for keys, slots in [(self._sorted_keys, self._sorted_slots), (owners[owned], owned)]:
+            if len(keys):
+                starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+                groups.append((slots, starts, np.diff(np.append(starts, len(keys)))))
+
+        labels = np.arange(count, dtype=np.int64)
+        while groups:
+            updated = labels.copy()
+            for slots, starts, lengths in groups:
+                group_min = np.minimum.reduceat(updated[slots], starts)
+                np.minimum.at(updated, slots, np.repeat(group_min, lengths))
+            updated = updated[updated]
+            if np.array_equal(updated, labels):
+                break
+            labels = updated
+
+        # Each customer is counted at their first application only
+        first = owners < 0
+        first[self._customer_first_slot] = True
+        self._parent.data[:count] = labels
+        self._component_size.data[:count] = np.bincount(labels, weights=first, minlength=count).astype(np.int64)
@@ -0,0 +1,124 @@
+"""Idempotency keys: a retried request gets the first attempt's response.
+
+Clients send an Idempotency-Key header on requests that create things (chat
+messages, uploads). The first request with a key claims it and runs; its
+response is kept for IDEMPOTENCY_TTL_SECONDS and returned to retries with
+the same key without running the handler again, so a retry does not create
+another customer, application, sanction letter or notification.
+
+A duplicate that arrives while the first request is still running waits for
+its result instead of starting its own: on the same worker through an
+in-process event, across workers by polling the shared store while the
+first one holds the key's lock. Reusing a key for a different request is
+refused. Server errors and 429s are not kept, so a retry after one runs
+again.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+from config import Config
+from .otp import TtlStore, create_ttl_store
+import json
+import threading
+import time
+
+class IdempotencyRejected(Exception):
+    """Raised when a key is reused for a different request or its first request never finishes"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class _Flight:
+    """A request running on this worker and the duplicates waiting for it"""
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.done = threading.Event()
+        self.response: Optional[Tuple[Any, int]] = None
+
+def _keep(status: int) -> bool:
+    return status < 500 and status != 429
+
+class IdempotencyStore:
+    """Runs a handler at most once per (scope, key) and replays its response"""
+
+    def __init__(self, store: Optional[TtlStore] = None):
+        self.store = store or create_ttl_store(Config.IDEMPOTENCY_STORE_BACKEND)
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self.counts = {"executed": 0, "replayed": 0, "joined": 0, "rejected": 0}
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.counts[outcome] += 1
+
+    def _stored(self, name: str, fingerprint: str) -> Optional[Tuple[Any, int]]:
+        raw = self.store.get(name)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if entry["fingerprint"] != fingerprint:
+            self._count("rejected")
+            raise IdempotencyRejected("Idempotency-Key was already used for a different request", 422)
+        return entry["body"], entry["status"]
+
+    def run(self, scope: str, key: str, fingerprint: str,
+            handler: Callable[[], Tuple[Any, int]]) -> Tuple[Any, int, bool]:
+        """Handler result (body, status) for this key; the flag is True if it was not run for this call.
+
+        body must be JSON-serialisable (e.g. the response text).
+        """
+        name = f"idem:{scope}:{key}"
+        deadline = time.monotonic() + Config.IDEMPOTENCY_LOCK_SECONDS
+        while True:
+            stored = self._stored(name, fingerprint)
+            if stored is not None:
+                self._count("replayed")
+                return (*stored, True)
+
+            with self._lock:
+                flight = self._flights.get(name)
+                owner = flight is None
+                if owner:
+                    flight = self._flights[name] = _Flight(fingerprint)
+
+            if not owner:
+                # Same key already running on this worker: wait for its response
+                if flight.fingerprint != fingerprint:
+                    self._count("rejected")
+                    raise IdempotencyRejected("Idempotency-Key is in use by a different request", 422)
+                if not flight.done.wait(max(deadline - time.monotonic(), 0)):
+                    raise IdempotencyRejected("A request with this Idempotency-Key is still in progress", 409)
+                if flight.response is not None:
+                    self._count("joined")
+                    return (*flight.response, True)
+                continue  # it was running on another worker; check the store again
+
+            try:
+                if self.store.add(f"{name}:lock", fingerprint, Config.IDEMPOTENCY_LOCK_SECONDS):
+                    try:
+                        body, status = handler()
+                        if _keep(status):
+                            self.store.set(name, json.dumps({"fingerprint": fingerprint, "status": status,
+                                                             "body": body}), Config.IDEMPOTENCY_TTL_SECONDS)
+                    finally:
+                        self.store.delete(f"{name}:lock")
+                    flight.response = (body, status)
+                    self._count("executed")
+                    return body, status, False
+                holder = self.store.get(f"{name}:lock")
+            finally:
+                with self._lock:
+                    self._flights.pop(name, None)
+                flight.done.set()
+
+            # Another worker holds the key: poll until its response is stored or its lock lapses
+            if holder is not None and holder != fingerprint:
+                self._count("rejected")
+                raise IdempotencyRejected("Idempotency-Key is in use by a different request", 422)
+            if time.monotonic() >= deadline:
+                raise IdempotencyRejected("A request with this Idempotency-Key is still in progress", 409)
+            time.sleep(Config.IDEMPOTENCY_POLL_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counts, "in_flight": len(self._flights)}
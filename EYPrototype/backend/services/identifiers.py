@@ -0,0 +1,46 @@
+from typing import Dict, Any, List, Optional, Iterable
+import hashlib
+
+# Identifier kinds tracked per application, in column order
+IDENTIFIER_KINDS = ["phone", "email", "pan", "device", "ip", "document"]
+MAX_DOCUMENT_KEYS = 2
+
+def normalize_identifier(kind: str, value: Any) -> Optional[str]:
+    """Canonical form of an identifier so trivial variations still collide"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    if kind == "phone":
+        digits = "".join(ch for ch in value if ch.isdigit())
+        return digits[-10:] if len(digits) >= 10 else None
+    if kind == "email":
+        return value.lower()
+    if kind == "pan":
+        return value.upper()
+    return value
+
+def identifier_hash(kind: str, value: str) -> int:
+    """Stable 64-bit hash of a normalized identifier (0 is reserved for 'missing')"""
+    digest = hashlib.blake2b(f"{kind}:{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+def extract_identifiers(customer_data: Dict[str, Any],
+                        documents: Iterable[Dict[str, Any]] = ()) -> Dict[str, List[str]]:
+    """Collect the identifiers of an application from customer data and uploaded documents"""
+    raw = {
+        "phone": [customer_data.get("phone")],
+        "email": [customer_data.get("email")],
+        "pan": [customer_data.get("pan_number")],
+        "device": [customer_data.get("device_id")],
+        "ip": [customer_data.get("ip_address")],
+        "document": [doc.get("sha256") or doc.get("filename") for doc in documents][:MAX_DOCUMENT_KEYS]
+    }
+    identifiers = {}
+    for kind, values in raw.items():
+        normalized = [normalize_identifier(kind, v) for v in values]
+        normalized = [v for v in normalized if v]
+        if normalized:
+            identifiers[kind] = normalized
+    return identifiers
@@ -0,0 +1,122 @@
+"""Tiny local intent classifier (multinomial naive Bayes over words and bigrams).
+
+Train from logged messages:
+    python -m services.intent_classifier --input logs.jsonl --output models/intent_classifier.json
+    python -m services.intent_classifier --from-db --output models/intent_classifier.json
+Input lines are JSON objects with "message" and "intent".
+"""
+from typing import Dict, Any, List, Iterable, Tuple
+from collections import Counter
+import argparse
+import json
+import math
+import os
+import re
+
+INTENT_LABELS = ["application", "inquiry", "general"]
+
+_WORD = re.compile(r"[a-z0-9₹]+")
+
+def tokenize(text: str) -> List[str]:
+    words = _WORD.findall(text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+class IntentClassifier:
+    """Naive Bayes text classifier; predicts in microseconds with no external dependencies"""
+
+    def __init__(self, log_priors: Dict[str, float], log_likelihoods: Dict[str, Dict[str, float]],
+                 log_unseen: Dict[str, float]):
+        self.labels = list(log_priors)
+        self.log_priors = log_priors
+        self.log_likelihoods = log_likelihoods
+        self.log_unseen = log_unseen
+
+    @classmethod
+    def train(cls, examples: Iterable[Tuple[str, str]], alpha: float = 1.0) -> "IntentClassifier":
+        label_counts: Counter = Counter()
+        token_counts: Dict[str, Counter] = {}
+        vocabulary = set()
+        for text, label in examples:
+            tokens = tokenize(text)
+            label_counts[label] += 1
+            token_counts.setdefault(label, Counter()).update(tokens)
+            vocabulary.update(tokens)
+        if not label_counts:
+            raise ValueError("No training examples")
+
+        total = sum(label_counts.values())
+        log_priors, log_likelihoods, log_unseen = {}, {}, {}
+        for label, count in label_counts.items():
+            counts = token_counts[label]
+            denominator = sum(counts.values()) + alpha * (len(vocabulary) + 1)
+            log_priors[label] = math.log(count / total)
+            log_likelihoods[label] = {t: math.log((c + alpha) / denominator) for t, c in counts.items()}
+            log_unseen[label] = math.log(alpha / denominator)
+        return cls(log_priors, log_likelihoods, log_unseen)
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """Most likely label and its posterior probability"""
+        tokens = tokenize(text)
+        scores = {}
+        for label in self.labels:
+            likelihoods = self.log_likelihoods[label]
+            unseen = self.log_unseen[label]
+            scores[label] = self.log_priors[label] + sum(likelihoods.get(t, unseen) for t in tokens)
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({
+                "log_priors": self.log_priors,
+                "log_likelihoods": self.log_likelihoods,
+                "log_unseen": self.log_unseen
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["log_priors"], data["log_likelihoods"], data["log_unseen"])
+
+def load_examples(path: str) -> List[Tuple[str, str]]:
+    examples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record.get("message") and record.get("intent"):
+                    examples.append((record["message"], record["intent"]))
+    return examples
+
+def examples_from_applications(db_service) -> List[Tuple[str, str]]:
+    """Messages and intents recorded on past loan applications.
+
+    The labels are what the Sales Agent decided at the time (keyword rules or
+    an escalation to the large model), not human labels; intents predicted by
+    the local classifier itself are skipped.
+    """
+    examples = []
+    for application in db_service.loan_applications.find(
+            {}, {"message": 1, "result.sales_result.intent.type": 1, "result.sales_result.intent.source": 1}):
+        intent = ((application.get("result") or {}).get("sales_result") or {}).get("intent") or {}
+        if application.get("message") and intent.get("type") and intent.get("source") != "local":
+            examples.append((application["message"], intent["type"]))
+    return examples
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="JSONL file of {message, intent}")
+    parser.add_argument("--from-db", action="store_true", help="train on loan applications in MongoDB")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    if args.from_db:
+        from services.database import DatabaseService
+        examples = examples_from_applications(DatabaseService())
+    else:
+        examples = load_examples(args.input)
+    IntentClassifier.train(examples).save(args.output)
+    print(f"trained on {len(examples):,} messages: {dict(Counter(label for _, label in examples))}")
@@ -0,0 +1,253 @@
+from typing import Dict, Any, List, Optional, Tuple
+from array import array
+from bisect import bisect_right
+from config import Config
+import numpy as np
+import os
+import socket
+import threading
+import time
+
+# Risk contributed by each list category; an address takes the max of its matches
+CATEGORY_RISK = {
+    "bad_actor": 0.9,
+    "tor": 0.7,
+    "proxy": 0.5,
+    "vpn": 0.4,
+}
+
+V4_DIRECTORY_SHIFT = 16
+V4_DIRECTORY_SIZE = 1 << (32 - V4_DIRECTORY_SHIFT)
+
+def _parse_ipv4(address: str) -> int:
+    return int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big")
+
+def _parse_ipv6(address: str) -> int:
+    return int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big")
+
+def parse_cidr(cidr: str) -> Tuple[int, int, int]:
+    """Return (family, first, last) for a CIDR or bare address"""
+    address, _, prefix = cidr.partition("/")
+    if ":" in address:
+        bits, value = 128, _parse_ipv6(address)
+    else:
+        bits, value = 32, _parse_ipv4(address)
+    prefix_len = int(prefix) if prefix else bits
+    if not 0 <= prefix_len <= bits:
+        raise ValueError(f"Invalid prefix length in {cidr}")
+    host_bits = bits - prefix_len
+    first = (value >> host_bits) << host_bits
+    return bits, first, first | ((1 << host_bits) - 1)
+
+class IpRangeTable:
+    """Immutable lookup table of disjoint address ranges with a category bitmask.
+
+    Overlapping prefixes from all lists are flattened into sorted, disjoint
+    segments: boundaries[i] is the first address of segment i and masks[i] the
+    set of categories covering it. IPv4 boundaries are a packed array of
+    64-bit ints (8 bytes each) with a 65536-entry directory on the top 16
+    bits, so a lookup is one table read plus a binary search over a handful
+    of cache-resident entries. IPv6 lists are small and kept as Python ints.
+    """
+
+    def __init__(self, categories: List[str], v4: Tuple[array, bytes], v6: Tuple[List[int], bytes],
+                 prefix_count: int):
+        self.categories = categories
+        self.v4_boundaries, self.v4_masks = v4
+        self.v6_boundaries, self.v6_masks = v6
+        self.prefix_count = prefix_count
+
+        # v4_directory[p] is the first segment starting at or after p << 16
+        top = np.arange(V4_DIRECTORY_SIZE + 1, dtype=np.uint64) << np.uint64(V4_DIRECTORY_SHIFT)
+        boundaries = np.frombuffer(self.v4_boundaries, dtype=np.uint64) if self.v4_masks else np.zeros(0, np.uint64)
+        self.v4_directory = array("I", np.searchsorted(boundaries, top).astype(np.uint32).tobytes())
+
+    @classmethod
+    def build(cls, prefixes: Dict[str, List[str]]) -> "IpRangeTable":
+        """Build from {category: [cidr, ...]}; at most 8 categories"""
+        categories = list(prefixes)[:8]
+        v4_ranges: List[Tuple[List[int], List[int]]] = []
+        v6_ranges: List[Tuple[int, int, int]] = []
+        count = 0
+
+        for bit, category in enumerate(categories):
+            starts, ends = [], []
+            for cidr in prefixes[category]:
+                try:
+                    family, first, last = parse_cidr(cidr)
+                except (ValueError, OSError):
+                    continue
+                count += 1
+                if family == 32:
+                    starts.append(first)
+                    ends.append(last + 1)
+                else:
+                    v6_ranges.append((first, last + 1, 1 << bit))
+            v4_ranges.append((starts, ends))
+
+        return cls(categories, cls._flatten_v4(v4_ranges), cls._flatten_v6(v6_ranges), count)
+
+    @staticmethod
+    def _flatten_v4(ranges: List[Tuple[List[int], List[int]]]) -> Tuple[array, bytes]:
+        all_points = [np.asarray(points, dtype=np.uint64) for starts, ends in ranges for points in (starts, ends)]
+        if not any(len(points) for points in all_points):
+            return array("Q"), b""
+
+        boundaries = np.unique(np.concatenate(all_points + [np.zeros(1, dtype=np.uint64)]))
+        masks = np.zeros(len(boundaries), dtype=np.uint8)
+        for bit, (starts, ends) in enumerate(ranges):
+            if not starts:
+                continue
+            # Difference array over boundaries: +1 where a range opens, -1 where it closes
+            coverage = np.zeros(len(boundaries) + 1, dtype=np.int64)
+            np.add.at(coverage, np.searchsorted(boundaries, np.asarray(starts, dtype=np.uint64)), 1)
+            np.add.at(coverage, np.searchsorted(boundaries, np.asarray(ends, dtype=np.uint64)), -1)
+            masks |= (np.cumsum(coverage[:-1]) > 0).astype(np.uint8) << np.uint8(bit)
+
+        # Merge neighbouring segments that carry the same categories
+        keep = np.concatenate(([True], masks[1:] != masks[:-1]))
+        return array("Q", boundaries[keep].tobytes()), masks[keep].tobytes()
+
+    @staticmethod
+    def _flatten_v6(ranges: List[Tuple[int, int, int]]) -> Tuple[List[int], bytes]:
+        if not ranges:
+            return [], b""
+        events: Dict[int, List[int]] = {0: []}
+        for start, end, bit in ranges:
+            events.setdefault(start, []).append(bit)
+            events.setdefault(end, []).append(-bit)
+
+        boundaries, masks = [], bytearray()
+        active = [0] * 8
+        for point in sorted(events):
+            for delta in events[point]:
+                index = abs(delta).bit_length() - 1
+                active[index] += 1 if delta > 0 else -1
+            mask = sum(1 << i for i, n in enumerate(active) if n > 0)
+            if not masks or masks[-1] != mask:
+                boundaries.append(point)
+                masks.append(mask)
+        return boundaries, bytes(masks)
+
+    def lookup_mask(self, address: str) -> int:
+        if ":" in address:
+            if not self.v6_masks:
+                return 0
+            return self.v6_masks[bisect_right(self.v6_boundaries, _parse_ipv6(address)) - 1]
+
+        if not self.v4_masks:
+            return 0
+        value = _parse_ipv4(address)
+        top = value >> V4_DIRECTORY_SHIFT
+        directory = self.v4_directory
+        return self.v4_masks[bisect_right(self.v4_boundaries, value, directory[top], directory[top + 1]) - 1]
+
+    def lookup(self, address: str) -> List[str]:
+        """Categories whose lists contain the address"""
+        mask = self.lookup_mask(address)
+        return [c for bit, c in enumerate(self.categories) if mask & (1 << bit)]
+
+    def memory_bytes(self) -> int:
+        return (self.v4_boundaries.itemsize * len(self.v4_boundaries) + len(self.v4_masks) +
+                self.v4_directory.itemsize * len(self.v4_directory) +
+                16 * len(self.v6_boundaries) + len(self.v6_masks))
+
+class IpReputationService:
+    """Local IP reputation backed by VPN / proxy / bad-actor CIDR lists.
+
+    Lists are configured as category:path pairs in IP_REPUTATION_LISTS. A
+    reload builds a complete new table and swaps one reference, so requests
+    never wait on a rebuild and always see either the old or the new lists.
+    """
+
+    def __init__(self, sources: Optional[Dict[str, str]] = None):
+        self.sources = sources if sources is not None else self._configured_sources()
+        self._table = IpRangeTable.build({})
+        self._mtimes: Dict[str, float] = {}
+        self._reload_lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+        self.loaded_at: Optional[float] = None
+        self.build_seconds = 0.0
+        self.reload()
+
+    @staticmethod
+    def _configured_sources() -> Dict[str, str]:
+        sources = {}
+        for entry in Config.IP_REPUTATION_LISTS.split(","):
+            category, _, path = entry.strip().partition(":")
+            if category and path:
+                sources[category] = path
+        return sources
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild the table if any list changed on disk; returns True if swapped"""
+        with self._reload_lock:
+            mtimes = {path: os.path.getmtime(path) for path in self.sources.values() if os.path.exists(path)}
+            if not force and self.loaded_at and mtimes == self._mtimes:
+                return False
+
+            start = time.perf_counter()
+            prefixes = {}
+            for category, path in self.sources.items():
+                if path not in mtimes:
+                    print(f"IP reputation list missing for {category}: {path}")
+                    continue
+                with open(path) as f:
+                    prefixes[category] = [
+                        line.split("#", 1)[0].strip() for line in f
+                        if line.strip() and not line.lstrip().startswith("#")
+                    ]
+            table = IpRangeTable.build(prefixes)
+
+            self._table = table
+            self._mtimes = mtimes
+            self.loaded_at = time.time()
+            self.build_seconds = time.perf_counter() - start
+            return True
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Poll the list files and hot-reload them in a daemon thread"""
+        if self._watch_thread or not self.sources:
+            return
+        interval = interval or Config.IP_REPUTATION_RELOAD_INTERVAL_SECONDS
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"IP reputation reload failed: {str(e)}")
+
+        self._watch_thread = threading.Thread(target=_run, name="ip-reputation-reload", daemon=True)
+        self._watch_thread.start()
+
+    def check(self, address: Optional[str]) -> Dict[str, Any]:
+        """Reputation of an address: matched categories and a 0-1 risk"""
+        if not address:
+            return {"ip_address": address, "categories": [], "risk": Config.IP_UNKNOWN_RISK, "status": "unknown"}
+
+        table = self._table
+        try:
+            categories = table.lookup(address.strip())
+        except (OSError, ValueError):
+            return {"ip_address": address, "categories": [], "risk": Config.IP_UNKNOWN_RISK, "status": "invalid"}
+
+        risk = max((CATEGORY_RISK.get(c, 0.5) for c in categories), default=0.0)
+        return {
+            "ip_address": address,
+            "categories": categories,
+            "risk": risk,
+            "status": "listed" if categories else "clean"
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        table = self._table
+        return {
+            "prefixes": table.prefix_count,
+            "v4_segments": len(table.v4_boundaries),
+            "v6_segments": len(table.v6_boundaries),
+            "memory_bytes": table.memory_bytes(),
+            "build_seconds": round(self.build_seconds, 3),
+            "loaded_at": self.loaded_at
+        }
@@ -0,0 +1,62 @@
+from typing import Callable, Any, Optional
+import threading
+import time
+
+class LazyProxy:
+    """Stands in for an expensive object and builds it on first attribute access.
+
+    The factory runs at most once, under a lock, so concurrent first requests
+    share a single construction. warm() builds it ahead of time (e.g. from a
+    readiness probe) without changing the behaviour of callers.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+        object.__setattr__(self, "_error", None)
+        object.__setattr__(self, "init_seconds", None)
+
+    def _get(self) -> Any:
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                start = time.perf_counter()
+                try:
+                    object.__setattr__(self, "_instance", self._factory())
+                    object.__setattr__(self, "_error", None)
+                except Exception as e:
+                    object.__setattr__(self, "_error", str(e))
+                    raise
+                object.__setattr__(self, "init_seconds", time.perf_counter() - start)
+            return self._instance
+
+    def warm(self) -> Any:
+        """Construct the underlying object now"""
+        return self._get()
+
+    @property
+    def is_initialized(self) -> bool:
+        return self._instance is not None
+
+    def status(self) -> dict:
+        seconds: Optional[float] = self.init_seconds
+        return {
+            "name": self._name,
+            "ready": self.is_initialized,
+            "init_seconds": round(seconds, 3) if seconds is not None else None,
+            "error": self._error
+        }
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._get(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._get(), attr, value)
+
+    def __repr__(self) -> str:
+        state = repr(self._instance) if self.is_initialized else "not initialized"
+        return f"<LazyProxy {self._name}: {state}>"
@@ -0,0 +1,191 @@
+"""Registry of published risk-model versions, memory-mapped and hot-swapped.
+
+Each version is two files in RISK_MODEL_DIR: <version>.bin, the folded
+coefficients and bias as raw little-endian float64 after a 16-byte header,
+and <version>.json with its features and metrics. The file CURRENT names the
+active version. Workers memory-map the .bin read-only, so every process on
+a host shares one copy of the coefficients through the page cache. Workers
+poll CURRENT and swap their model reference when it changes, so one
+publish() or activate() moves every worker to the new version without a
+restart.
+
+Scoring latency is kept per path (single rows and batches) in fixed-size
+reservoirs and reported as percentiles by stats().
+"""
+from typing import Dict, Any, List, Optional
+from collections import deque
+from config import Config
+from .risk_model import FEATURES, RiskModel, fold_standardisation, profile_features, profile_inputs
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b"RMDL"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIII")  # magic, format version, feature count, reserved
+
+def _percentiles(samples) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50_us": None, "p95_us": None, "p99_us": None}
+    pick = lambda p: round(ordered[min(int(len(ordered) * p), len(ordered) - 1)] * 1e6, 2)
+    return {"p50_us": pick(0.5), "p95_us": pick(0.95), "p99_us": pick(0.99)}
+
+class ModelRegistry:
+    """Published model versions and the active one, with single-row and batch scoring"""
+
+    def __init__(self, directory: Optional[str] = None, latency_samples: Optional[int] = None):
+        self.directory = directory or Config.RISK_MODEL_DIR
+        self.current: Optional[RiskModel] = None
+        self._current_mtime: Optional[float] = None
+        self._lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+        samples = Config.RISK_MODEL_LATENCY_SAMPLES if latency_samples is None else latency_samples
+        self._single_latency: deque = deque(maxlen=samples)
+        self._batch_latency: deque = deque(maxlen=samples)  # per-row seconds of each batch
+        self.scored = 0
+        self.batch_rows = 0
+        self.refresh()
+
+    @property
+    def current_version(self) -> Optional[str]:
+        model = self.current
+        return model.version if model else None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def versions(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.directory) if name.endswith(".bin"))
+
+    def publish(self, spec: Dict[str, Any], activate: bool = True) -> str:
+        """Write a trained spec (see risk_model.train) as a new version; returns the version"""
+        if spec.get("features") != FEATURES:
+            raise ValueError("model was trained on a different feature set")
+        version = spec["version"]
+        weights, bias = fold_standardisation(spec)
+        os.makedirs(self.directory, exist_ok=True)
+        metadata = {key: spec[key] for key in ["version", "trained_at", "features", "metrics"] if key in spec}
+        self._write(f"{version}.json", json.dumps(metadata, indent=2).encode())
+        self._write(f"{version}.bin", HEADER.pack(MAGIC, FORMAT_VERSION, len(weights), 0) +
+                    struct.pack(f"<{len(weights) + 1}d", *weights, bias))
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version: str):
+        """Make a published version current for every worker watching this directory"""
+        if not os.path.exists(self._path(f"{version}.bin")):
+            raise ValueError(f"unknown model version {version!r}")
+        self._write("CURRENT", version.encode())
+        self.refresh(force=True)
+
+    def _write(self, name: str, data: bytes):
+        temporary = self._path(f".{name}.tmp")
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, self._path(name))  # readers see the old file or the new one, never half
+
+    def _load(self, version: str) -> RiskModel:
+        import numpy as np
+        with open(self._path(f"{version}.bin"), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, format_version, count, _ = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION or mapped.size() != HEADER.size + 8 * (count + 1):
+            mapped.close()
+            raise ValueError(f"{version}.bin is not a version {FORMAT_VERSION} risk model")
+        values = np.frombuffer(mapped, dtype="<f8", count=count + 1, offset=HEADER.size)
+        with open(self._path(f"{version}.json")) as f:
+            metadata = json.load(f)
+        if metadata.get("features") != FEATURES:
+            raise ValueError(f"{version} was trained on a different feature set")
+        return RiskModel(version, values[:count], float(values[count]), metadata.get("metrics"))
+
+    def refresh(self, force: bool = False) -> bool:
+        """Load the version named by CURRENT if it changed; returns True if the model was swapped"""
+        try:
+            mtime = os.path.getmtime(self._path("CURRENT"))
+        except OSError:
+            return False
+        if not force and mtime == self._current_mtime:
+            return False
+        with self._lock:
+            with open(self._path("CURRENT")) as f:
+                version = f.read().strip()
+            if version == self.current_version:
+                self._current_mtime = mtime
+                return False
+            model = self._load(version)
+            # Requests already scoring keep the previous model; its mapping is
+            # released once the last reference to its coefficients goes away
+            self.current = model
+            self._current_mtime = mtime
+            return True
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Poll CURRENT and hot-swap the model in a daemon thread"""
+        if self._watch_thread:
+            return
+        interval = interval or Config.RISK_MODEL_RELOAD_INTERVAL_SECONDS
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Risk model reload failed, keeping {self.current_version}: {str(e)}")
+
+        self._watch_thread = threading.Thread(target=_run, name="risk-model-reload", daemon=True)
+        self._watch_thread.start()
+
+    def score(self, customer_data: Dict[str, Any]) -> Optional[float]:
+        """Default probability for one applicant under the current model, or None if there is none"""
+        model = self.current
+        if model is None:
+            return None
+        start = time.perf_counter()
+        probability = model.predict_features(profile_features(profile_inputs(customer_data)))
+        self._single_latency.append(time.perf_counter() - start)
+        self.scored += 1
+        return probability
+
+    def score_batch(self, features) -> Optional[Any]:
+        """Default probabilities for a (rows, features) array, or None if there is no model"""
+        model = self.current
+        if model is None or not len(features):
+            return None
+        start = time.perf_counter()
+        probabilities = model.predict_batch(features)
+        self._batch_latency.append((time.perf_counter() - start) / len(features))
+        self.batch_rows += len(features)
+        return probabilities
+
+    def stats(self) -> Dict[str, Any]:
+        model = self.current
+        return {
+            "current": model.version if model else None,
+            "metrics": model.metrics if model else None,
+            "versions": self.versions(),
+            "single": {"scored": self.scored, **_percentiles(self._single_latency)},
+            "batch": {"rows": self.batch_rows, "per_row": _percentiles(self._batch_latency)}
+        }
+
+_registry: Optional[ModelRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_model_registry() -> ModelRegistry:
+    """Process-wide registry, watching RISK_MODEL_DIR for new versions"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = ModelRegistry()
+                registry.start_watching()
+                _registry = registry
+    return _registry
@@ -0,0 +1,143 @@
+from abc import ABC, abstractmethod
+from typing import BinaryIO
+from config import Config
+import os
+import time
+import uuid
+
+class ObjectStore(ABC):
+    """Pluggable blob store used for uploaded documents.
+
+    Writes go through a staging handle: data is appended to the handle and
+    then atomically committed under its final key, so readers never observe
+    a partially written object.
+    """
+
+    @abstractmethod
+    def begin(self) -> str:
+        """Open a new staging handle and return its id"""
+        pass
+
+    @abstractmethod
+    def open_append(self, handle: str) -> BinaryIO:
+        """Return a binary file object that appends to the staging handle"""
+        pass
+
+    @abstractmethod
+    def staged_size(self, handle: str) -> int:
+        """Number of bytes written to the staging handle so far (-1 if unknown)"""
+        pass
+
+    @abstractmethod
+    def open_staged(self, handle: str) -> BinaryIO:
+        """Open the staging handle for reading"""
+        pass
+
+    @abstractmethod
+    def commit(self, handle: str, key: str) -> None:
+        """Atomically publish the staged data under key"""
+        pass
+
+    @abstractmethod
+    def abort(self, handle: str) -> None:
+        """Discard the staging handle"""
+        pass
+
+    @abstractmethod
+    def purge_staged(self, max_age: float) -> int:
+        """Discard staging handles not written to for max_age seconds; returns how many"""
+        pass
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Check whether an object has been committed under key"""
+        pass
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """Public URL for a committed object"""
+        pass
+
+    @abstractmethod
+    def local_path(self, key: str) -> str:
+        """Filesystem path of a committed object, fetching it locally if needed"""
+        pass
+
+class LocalObjectStore(ObjectStore):
+    """Object store backed by a local directory (development / single node)"""
+
+    def __init__(self, root: str = None):
+        self.root = root or Config.UPLOAD_DIR
+        self.staging_dir = os.path.join(self.root, ".staging")
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+    def _staging_path(self, handle: str) -> str:
+        # Handles come from clients on resumable uploads, never trust them as paths
+        if not handle or os.path.basename(handle) != handle or handle.startswith("."):
+            raise KeyError(handle)
+        return os.path.join(self.staging_dir, handle)
+
+    def _object_path(self, key: str) -> str:
+        # Fan out by key prefix so a single directory does not grow unbounded
+        return os.path.join(self.root, key[:2], key)
+
+    def begin(self) -> str:
+        handle = uuid.uuid4().hex
+        open(self._staging_path(handle), "wb").close()
+        return handle
+
+    def open_append(self, handle: str) -> BinaryIO:
+        path = self._staging_path(handle)
+        if not os.path.exists(path):
+            raise KeyError(handle)
+        return open(path, "ab")
+
+    def staged_size(self, handle: str) -> int:
+        path = self._staging_path(handle)
+        if not os.path.exists(path):
+            raise KeyError(handle)
+        return os.path.getsize(path)
+
+    def open_staged(self, handle: str) -> BinaryIO:
+        return open(self._staging_path(handle), "rb")
+
+    def commit(self, handle: str, key: str) -> None:
+        target = self._object_path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(self._staging_path(handle), target)
+
+    def abort(self, handle: str) -> None:
+        try:
+            os.remove(self._staging_path(handle))
+        except (FileNotFoundError, KeyError):
+            pass
+
+    def purge_staged(self, max_age: float) -> int:
+        cutoff = time.time() - max_age
+        purged = 0
+        for entry in os.scandir(self.staging_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    purged += 1
+            except FileNotFoundError:
+                pass  # completed or purged concurrently
+        return purged
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._object_path(key))
+
+    def url(self, key: str) -> str:
+        return f"/uploads/{key[:2]}/{key}"
+
+    def local_path(self, key: str) -> str:
+        if not key or os.path.basename(key) != key:
+            raise KeyError(key)
+        return self._object_path(key)
+
+def create_object_store(backend: str = None) -> ObjectStore:
+    """Build the object store configured by UPLOAD_STORE_BACKEND"""
+    backend = backend or Config.UPLOAD_STORE_BACKEND
+    if backend == "local":
+        return LocalObjectStore()
+    raise ValueError(f"Unsupported upload store backend: {backend}")
@@ -0,0 +1,335 @@
+from typing import Dict, Any, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from config import Config
+from .object_store import ObjectStore, create_object_store
+from .document_upload import sniff_content_type, SNIFF_BYTES
+import asyncio
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+
+PAN_PATTERN = re.compile(r'\b[A-Z]{5}[0-9]{4}[A-Z]\b')
+AADHAAR_PATTERN = re.compile(r'\b[2-9]\d{3}\s?\d{4}\s?\d{4}\b')
+PASSPORT_PATTERN = re.compile(r'\b[A-PR-WY][1-9]\d{5}[1-9]\b')
+DOB_PATTERN = re.compile(r'\b(\d{2})[/\-.](\d{2})[/\-.](\d{4})\b')
+PINCODE_PATTERN = re.compile(r'\b\d{6}\b')
+HEX_DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+ID_NUMBER_PATTERNS = {
+    "pan": [PAN_PATTERN],
+    "aadhaar": [AADHAAR_PATTERN],
+    "passport": [PASSPORT_PATTERN],
+}
+
+_tesseract_available: Optional[bool] = None
+
+def tesseract_available() -> bool:
+    """Whether pytesseract and the tesseract binary are installed (checked once per process)"""
+    global _tesseract_available
+    if _tesseract_available is None:
+        _tesseract_available = bool(importlib.util.find_spec("pytesseract") and shutil.which("tesseract"))
+        if not _tesseract_available:
+            print("Tesseract is not installed; OCR is reported as unavailable")
+    return _tesseract_available
+
+def _ocr_page(path: str, content_type: str, page_number: int, lang: str, dpi: int) -> Dict[str, Any]:
+    """Rasterize and OCR a single page (runs inside a worker process)"""
+    import pytesseract
+    from PIL import Image
+
+    if content_type == "application/pdf":
+        from pdf2image import convert_from_path
+        image = convert_from_path(path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+    else:
+        image = Image.open(path)
+        image.seek(page_number - 1)
+
+    data = pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT)
+
+    # Rebuild text line by line and average word confidences (-1 marks non-words)
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        word = word.strip()
+        if not word:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidence = float(data["conf"][i])
+        if confidence >= 0:
+            confidences.append(confidence)
+
+    return {
+        "page": page_number,
+        "text": "\n".join(" ".join(words) for _, words in sorted(lines.items())),
+        "confidence": round(sum(confidences) / len(confidences) / 100.0, 3) if confidences else 0.0
+    }
+
+def _count_pages(path: str, content_type: str) -> int:
+    """Number of pages in a PDF or (multi-frame) image"""
+    if content_type == "application/pdf":
+        from pdf2image import pdfinfo_from_path
+        return int(pdfinfo_from_path(path)["Pages"])
+
+    from PIL import Image
+    with Image.open(path) as image:
+        return getattr(image, "n_frames", 1)
+
+def _labelled_value(lines: List[str], label: str) -> Optional[str]:
+    """Value following a label, either on the same line or the next one"""
+    for i, line in enumerate(lines):
+        match = re.match(rf'^\s*{label}\b\s*[:\-]?\s*(.*)$', line, re.IGNORECASE)
+        if not match:
+            continue
+        if match.group(1).strip():
+            return match.group(1).strip()
+        following = next((l.strip() for l in lines[i + 1:] if l.strip()), None)
+        if following:
+            return following
+    return None
+
+def extract_fields(doc_type: str, text: str) -> Dict[str, Any]:
+    """Extract structured KYC fields from OCR text"""
+    lines = [line for line in text.splitlines() if line.strip()]
+    fields = {"name": None, "dob": None, "address": None, "id_number": None}
+
+    for pattern in ID_NUMBER_PATTERNS.get(doc_type, [PAN_PATTERN, AADHAAR_PATTERN, PASSPORT_PATTERN]):
+        match = pattern.search(text)
+        if match:
+            fields["id_number"] = re.sub(r'\s', '', match.group())
+            break
+
+    dob_match = DOB_PATTERN.search(text)
+    if dob_match:
+        day, month, year = dob_match.groups()
+        fields["dob"] = f"{year}-{month}-{day}"
+
+    fields["name"] = _labelled_value(lines, "name")
+    if not fields["name"] and dob_match:
+        # Aadhaar cards print the holder's name on the line above the DOB
+        dob_line = next((i for i, line in enumerate(lines) if dob_match.group() in line), 0)
+        if dob_line > 0:
+            fields["name"] = lines[dob_line - 1].strip()
+
+    address = _labelled_value(lines, "address")
+    if address:
+        # Addresses wrap over a few lines and end with the PIN code
+        start = next(i for i, line in enumerate(lines) if address in line)
+        address_lines = [address]
+        for line in lines[start + 1:start + 4]:
+            if PINCODE_PATTERN.search(address_lines[-1]):
+                break
+            address_lines.append(line.strip())
+        fields["address"] = ", ".join(address_lines)
+
+    return fields
+
+class OcrResultCache:
+    """OCR results keyed by document content hash and the OCR settings used.
+
+    An in-process LRU sits in front of an optional on-disk JSON cache so that
+    results are shared between worker processes and survive restarts.
+    """
+
+    def __init__(self, max_entries: int = None, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries or Config.OCR_CACHE_SIZE
+        self.cache_dir = cache_dir if cache_dir is not None else Config.OCR_CACHE_DIR
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry
+
+        if self.cache_dir:
+            try:
+                with open(self._path(digest)) as f:
+                    entry = json.load(f)
+                self._remember(digest, entry)
+                with self._lock:
+                    self.hits += 1
+                return entry
+            except (FileNotFoundError, ValueError):
+                pass
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, digest: str, entry: Dict[str, Any]):
+        self._remember(digest, entry)
+        if self.cache_dir:
+            path = self._path(digest)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+
+    def _remember(self, digest: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries)
+            }
+
+class OcrService:
+    """Local Tesseract OCR with page-level parallelism over a process pool"""
+
+    def __init__(self, store: ObjectStore = None, max_workers: int = None,
+                 cache: OcrResultCache = None):
+        self.store = store or create_object_store()
+        self.max_workers = max_workers or Config.OCR_WORKERS or os.cpu_count()
+        self.cache = cache or OcrResultCache()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Created on first use so importing the agents does not start workers. Workers
+        # come from a forkserver, not a fork of this process, which by then has
+        # event-loop, gunicorn and client threads whose locks a fork would copy
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("forkserver"))
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    async def extract(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """OCR all documents concurrently and return per-type results.
+
+        With Tesseract installed, no documents or failed pages score 0.0. Without
+        it the status is "unavailable" and the confidence is the fixed
+        OCR_UNAVAILABLE_CONFIDENCE, so such deployments verify as before.
+        """
+        if not tesseract_available():
+            return {
+                "status": "unavailable",
+                "results": {},
+                "confidence": Config.OCR_UNAVAILABLE_CONFIDENCE,
+                "reason": "Tesseract is not installed"
+            }
+        if not documents:
+            return {
+                "status": "skipped",
+                "results": {},
+                "confidence": 0.0,
+                "reason": "No documents provided"
+            }
+
+        doc_results = await asyncio.gather(*(self.extract_document(doc) for doc in documents))
+
+        ocr_results = {}
+        for doc, doc_result in zip(documents, doc_results):
+            ocr_results[doc.get("type", "unknown")] = doc_result
+
+        failures = sum(1 for r in doc_results if r.get("error"))
+        if failures == 0:
+            status = "success"
+        elif failures < len(doc_results):
+            status = "partial"
+        else:
+            status = "failed"
+
+        return {
+            "status": status,
+            "results": ocr_results,
+            "confidence": round(sum(r["confidence"] for r in doc_results) / len(doc_results), 3)
+        }
+
+    async def extract_document(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """OCR a single uploaded document, reusing cached results by content hash"""
+        doc_type = document.get("type", "unknown")
+        loop = asyncio.get_running_loop()
+
+        try:
+            if not document.get("filename"):
+                raise ValueError("Document has not been uploaded")
+            path = self.store.local_path(document["filename"])
+            digest, content_type = await loop.run_in_executor(None, self._identify, path)
+
+            # Changing OCR_LANG or OCR_DPI changes the text, so it is part of the key
+            cache_key = f"{digest}-{Config.OCR_LANG}-{Config.OCR_DPI}"
+            entry = self.cache.get(cache_key)
+            cached = entry is not None
+            if not cached:
+                page_count = await loop.run_in_executor(None, _count_pages, path, content_type)
+                pool = self._get_pool()
+                pages = await asyncio.gather(*(
+                    loop.run_in_executor(pool, _ocr_page, path, content_type, page,
+                                         Config.OCR_LANG, Config.OCR_DPI)
+                    for page in range(1, page_count + 1)
+                ))
+                entry = {
+                    "extracted_text": "\n\f\n".join(p["text"] for p in pages),
+                    "confidence": round(sum(p["confidence"] for p in pages) / len(pages), 3) if pages else 0.0,
+                    "pages": len(pages)
+                }
+                self.cache.put(cache_key, entry)
+        except Exception as e:
+            return {
+                "extracted_text": "",
+                "fields": extract_fields(doc_type, ""),
+                "confidence": 0.0,
+                "error": str(e)
+            }
+
+        return {
+            "extracted_text": entry["extracted_text"],
+            "fields": extract_fields(doc_type, entry["extracted_text"]),
+            "confidence": entry["confidence"],
+            "pages": entry["pages"],
+            "sha256": digest,
+            "cached": cached
+        }
+
+    def _identify(self, path: str) -> Tuple[str, str]:
+        """Content hash and type of a stored document"""
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+            sniffed = sniff_content_type(head)
+            if not sniffed:
+                raise ValueError("Unsupported document format")
+
+            # Stored objects are named by their SHA-256, so avoid rehashing them
+            stem = os.path.basename(path).split(".")[0]
+            if HEX_DIGEST_PATTERN.match(stem):
+                return stem, sniffed[0]
+
+            hasher = hashlib.sha256(head)
+            for chunk in iter(lambda: f.read(Config.UPLOAD_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+            return hasher.hexdigest(), sniffed[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"available": tesseract_available(), "workers": self.max_workers, "cache": self.cache.stats()}
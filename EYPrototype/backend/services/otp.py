@@ -0,0 +1,271 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional
+from config import Config
+from .identifiers import normalize_identifier
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+class TtlStore(ABC):
+    """Minimal key/value store with per-key expiry used for OTP state"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        """Set only if the key is absent; returns True if it was set"""
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def incr(self, key: str, ttl: float) -> int:
+        """Atomically increment a counter, starting its TTL on first use"""
+        pass
+
+    @abstractmethod
+    def ttl(self, key: str) -> float:
+        """Seconds until the key expires (0 if missing)"""
+        pass
+
+class InMemoryTtlStore(TtlStore):
+    """Process-local TTL store split into independently locked shards.
+
+    Keys expire lazily on access; each shard also purges expired entries
+    every SWEEP_EVERY writes so abandoned OTPs do not accumulate.
+    """
+
+    SWEEP_EVERY = 4096
+
+    def __init__(self, shards: int = None):
+        self._shards = [({}, threading.Lock(), [0]) for _ in range(shards or Config.OTP_STORE_SHARDS)]
+
+    def _shard(self, key: str):
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _live(self, entries: Dict, key: str, now: float):
+        entry = entries.get(key)
+        if entry is not None and entry[1] <= now:
+            del entries[key]
+            return None
+        return entry
+
+    def _written(self, entries: Dict, writes: list, now: float):
+        writes[0] += 1
+        if writes[0] % self.SWEEP_EVERY == 0:
+            for key in [k for k, (_, expires_at) in entries.items() if expires_at <= now]:
+                del entries[key]
+
+    def get(self, key: str) -> Optional[str]:
+        entries, lock, _ = self._shard(key)
+        with lock:
+            entry = self._live(entries, key, time.monotonic())
+            return entry[0] if entry else None
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        entries, lock, writes = self._shard(key)
+        now = time.monotonic()
+        with lock:
+            entries[key] = (value, now + ttl)
+            self._written(entries, writes, now)
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        entries, lock, writes = self._shard(key)
+        now = time.monotonic()
+        with lock:
+            if self._live(entries, key, now):
+                return False
+            entries[key] = (value, now + ttl)
+            self._written(entries, writes, now)
+            return True
+
+    def delete(self, key: str) -> bool:
+        entries, lock, _ = self._shard(key)
+        with lock:
+            return entries.pop(key, None) is not None
+
+    def incr(self, key: str, ttl: float) -> int:
+        entries, lock, writes = self._shard(key)
+        now = time.monotonic()
+        with lock:
+            entry = self._live(entries, key, now)
+            if entry is None:
+                entries[key] = ("1", now + ttl)
+                self._written(entries, writes, now)
+                return 1
+            count = int(entry[0]) + 1
+            entries[key] = (str(count), entry[1])
+            return count
+
+    def ttl(self, key: str) -> float:
+        entries, lock, _ = self._shard(key)
+        now = time.monotonic()
+        with lock:
+            entry = self._live(entries, key, now)
+            return entry[1] - now if entry else 0.0
+
+class RedisTtlStore(TtlStore):
+    """TTL store on any Redis-protocol client (redis-py, or fakeredis locally)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(self.client.set(key, value, px=int(ttl * 1000), nx=True))
+
+    def delete(self, key: str) -> bool:
+        return self.client.delete(key) > 0
+
+    def incr(self, key: str, ttl: float) -> int:
+        # SET NX starts the TTL on first use and INCR keeps it; unlike PEXPIRE NX this needs no Redis 7
+        pipe = self.client.pipeline()
+        pipe.set(key, 0, px=int(ttl * 1000), nx=True)
+        pipe.incr(key)
+        _, count = pipe.execute()
+        return int(count)
+
+    def ttl(self, key: str) -> float:
+        remaining = self.client.pttl(key)
+        return remaining / 1000.0 if remaining and remaining > 0 else 0.0
+
+def create_ttl_store(backend: str = None) -> TtlStore:
+    """Build the OTP store configured by OTP_STORE_BACKEND"""
+    backend = backend or Config.OTP_STORE_BACKEND
+    if backend == "memory":
+        return InMemoryTtlStore()
+    if backend == "redis":
+        import redis
+        return RedisTtlStore(redis.Redis.from_url(Config.REDIS_URL))
+    if backend == "fakeredis":
+        # In-process Redis stand-in for development and tests
+        import fakeredis
+        return RedisTtlStore(fakeredis.FakeRedis())
+    raise ValueError(f"Unsupported OTP store backend: {backend}")
+
+class OtpRateLimited(Exception):
+    """Raised when a phone number requests OTPs too often"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class OtpService:
+    """Issues and verifies one-time passwords sent to a customer's phone.
+
+    Only an HMAC of each code is stored, keyed by phone with a TTL, so a
+    verification is a couple of O(1) store operations and never touches
+    MongoDB. Every attempt is counted before the code is compared, which
+    keeps the attempt limit exact under concurrent guesses.
+    """
+
+    def __init__(self, store: TtlStore = None):
+        self.store = store or create_ttl_store()
+        self._secret = Config.SECRET_KEY.encode()
+
+    def _hash(self, phone: str, code: str) -> str:
+        return hmac.new(self._secret, f"{phone}:{code}".encode(), hashlib.sha256).hexdigest()
+
+    def issue(self, phone: str) -> Dict[str, Any]:
+        """Generate, store and deliver a new OTP"""
+        normalized = normalize_identifier("phone", phone)
+        if not normalized:
+            raise ValueError("A valid 10 digit phone number is required")
+
+        if not self.store.add(f"otp:cooldown:{normalized}", "1", Config.OTP_RESEND_COOLDOWN_SECONDS):
+            retry_after = int(self.store.ttl(f"otp:cooldown:{normalized}")) + 1
+            raise OtpRateLimited("Please wait before requesting another OTP", retry_after)
+
+        issued = self.store.incr(f"otp:issued:{normalized}", Config.OTP_ISSUE_WINDOW_SECONDS)
+        if issued > Config.OTP_MAX_ISSUES_PER_WINDOW:
+            retry_after = int(self.store.ttl(f"otp:issued:{normalized}")) + 1
+            raise OtpRateLimited("Too many OTP requests for this number", retry_after)
+
+        code = f"{secrets.randbelow(10 ** Config.OTP_LENGTH):0{Config.OTP_LENGTH}d}"
+        self.store.set(f"otp:code:{normalized}", self._hash(normalized, code), Config.OTP_TTL_SECONDS)
+        self.store.delete(f"otp:attempts:{normalized}")
+
+        delivery = self._deliver(normalized, code)
+        result = {
+            "status": "sent",
+            "phone": normalized,
+            "expires_in": Config.OTP_TTL_SECONDS,
+            "delivery": delivery
+        }
+        if Config.OTP_RETURN_CODE_FOR_TESTS:
+            result["debug_code"] = code
+        return result
+
+    def verify(self, phone: str, code: Optional[str], customer_id: Optional[str] = None) -> Dict[str, Any]:
+        """Check a submitted code; a correct code is consumed and cannot be reused.
+
+        The verified marker is bound to customer_id, so it only counts for the
+        customer who entered the code (none is kept without a customer_id).
+        """
+        normalized = normalize_identifier("phone", phone)
+        if not normalized or not code:
+            return {"status": "failed", "reason": "Phone number and code are required"}
+
+        code_key = f"otp:code:{normalized}"
+        stored = self.store.get(code_key)
+        if stored is None:
+            return {"status": "expired", "reason": "No active OTP for this number"}
+
+        attempts = self.store.incr(f"otp:attempts:{normalized}", Config.OTP_TTL_SECONDS)
+        if attempts > Config.OTP_MAX_ATTEMPTS:
+            self.store.delete(code_key)
+            return {"status": "locked", "reason": "Too many incorrect attempts, request a new OTP"}
+
+        if hmac.compare_digest(stored, self._hash(normalized, str(code).strip())) and self.store.delete(code_key):
+            self.store.delete(f"otp:attempts:{normalized}")
+            if customer_id:
+                self.store.set(f"otp:verified:{normalized}", str(customer_id), Config.OTP_VERIFIED_TTL_SECONDS)
+            return {"status": "verified"}
+
+        return {
+            "status": "failed",
+            "reason": "Incorrect code",
+            "attempts_remaining": Config.OTP_MAX_ATTEMPTS - attempts
+        }
+
+    def is_verified(self, phone: str, customer_id: Optional[str]) -> bool:
+        """Whether this customer passed OTP verification for the phone recently"""
+        normalized = normalize_identifier("phone", phone)
+        if not normalized or not customer_id:
+            return False
+        verified_for = self.store.get(f"otp:verified:{normalized}")
+        return verified_for is not None and hmac.compare_digest(verified_for.encode(), str(customer_id).encode())
+
+    def _deliver(self, phone: str, code: str) -> Dict[str, Any]:
+        """Send the OTP by SMS via Twilio"""
+        if not (Config.TWILIO_ACCOUNT_SID and Config.TWILIO_AUTH_TOKEN and Config.TWILIO_SMS_NUMBER):
+            return {"status": "skipped", "channel": "sms", "reason": "Twilio not configured"}
+
+        from twilio.rest import Client
+
+        try:
+            client = Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
+            client.messages.create(
+                from_=Config.TWILIO_SMS_NUMBER,
+                body=f"Your verification code is {code}. It expires in {Config.OTP_TTL_SECONDS // 60} minutes.",
+                to=f"+91{phone}"
+            )
+            return {"status": "sent", "channel": "sms"}
+        except Exception as e:
+            return {"status": "failed", "channel": "sms", "error": str(e)}
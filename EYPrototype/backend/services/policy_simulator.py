@@ -0,0 +1,298 @@
+"""What-if simulation of underwriting settings over the historical book.
+
+Streams applications that reached underwriting out of `loan_applications`
+(or a JSONL export), keeps only the inputs UnderwritingAgent decides on, and
+re-runs its decision logic with numpy over chunks of --chunk-size rows, once
+per candidate. Memory is bounded by the chunk size whatever the size of the
+book; only per-candidate counters are kept across chunks.
+
+Candidates override Config values and/or point at another underwriting
+policy file, and are compared against the current settings:
+    python -m services.policy_simulator \\
+        --candidate emi40:EMI_SALARY_RATIO_THRESHOLD=0.4 \\
+        --candidate strict:UNDERWRITING_POLICY_PATH=policies/strict.json,LOW_RISK_THRESHOLD=0.8
+"""
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+from collections import Counter
+from config import Config
+from .underwriting_policy import CompiledPolicy
+import argparse
+import json
+import time
+import numpy as np
+
+DECISIONS = ["reject", "approve", "counter_offer"]
+REJECT, APPROVE, COUNTER_OFFER = range(3)
+RISK_LEVELS = ["low", "medium", "high"]
+
+# Settings a candidate may override
+TUNABLES = ["EMI_SALARY_RATIO_THRESHOLD", "VERIFICATION_CONFIDENCE_HIGH", "LOW_RISK_THRESHOLD",
+            "MEDIUM_RISK_THRESHOLD", "UNDERWRITING_POLICY_PATH"]
+
+_PROJECTION = {
+    "loan_type": 1,
+    "result.customer_data.loan_type": 1,
+    "result.customer_data.requested_amount": 1,
+    "result.customer_data.salary": 1,
+    "result.customer_data.salary_slip": 1,
+    "result.customer_data.salary_slip_data.net_salary": 1,
+    "result.underwriting_result.risk_score": 1,
+    "result.underwriting_result.credit_score": 1,
+    "result.underwriting_result.verification_confidence": 1,
+    "result.underwriting_result.pre_approval_limit": 1,
+    "result.underwriting_result.decision": 1,
+    "result.underwriting_result.loan_amount": 1,
+}
+
+NUMERIC_COLUMNS = ["risk_score", "credit_score", "verification_confidence", "pre_approval_limit",
+                   "requested_amount", "salary", "recorded_amount"]
+
+def _annuity_factor(rate, tenure_months):
+    """Loan amount serviced by an EMI of 1 (inverse of the EMI formula); scalars or arrays"""
+    monthly_rate = rate / 12
+    growth = (1 + monthly_rate) ** tenure_months
+    return (growth - 1) / (monthly_rate * growth)
+
+def _row(application: Dict[str, Any]) -> Optional[Tuple]:
+    result = application.get("result") or {}
+    underwriting = result.get("underwriting_result")
+    if not underwriting:
+        return None
+    customer = result.get("customer_data") or {}
+    net_salary = (customer.get("salary_slip_data") or {}).get("net_salary")
+    return (
+        customer.get("loan_type") or application.get("loan_type"),
+        underwriting.get("decision"),
+        bool(customer.get("salary_slip")),
+        float(underwriting.get("risk_score") or 0),
+        float(underwriting.get("credit_score") or 0),
+        float(underwriting.get("verification_confidence") or 0),
+        float(underwriting.get("pre_approval_limit") or 0),
+        float(customer.get("requested_amount") or 0),
+        float(net_salary or customer.get("salary") or 0),
+        float(underwriting.get("loan_amount") or 0),
+    )
+
+def iter_chunks(applications: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[Dict[str, np.ndarray]]:
+    """Columnar chunks of underwriting inputs; applications without an underwriting result are skipped"""
+    rows: List[Tuple] = []
+    for application in applications:
+        row = _row(application)
+        if row is None:
+            continue
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield _columns(rows)
+            rows = []
+    if rows:
+        yield _columns(rows)
+
+def _columns(rows: List[Tuple]) -> Dict[str, np.ndarray]:
+    loan_types, decisions, salary_slips, *numeric = zip(*rows)
+    columns = {name: np.array(values, dtype=np.float64) for name, values in zip(NUMERIC_COLUMNS, numeric)}
+    columns["loan_type"] = np.array(loan_types, dtype=object)
+    columns["recorded_decision"] = np.array([DECISIONS.index(d) if d in DECISIONS else -1 for d in decisions],
+                                            dtype=np.int8)  # -1: not recorded
+    columns["salary_slip"] = np.array(salary_slips, dtype=bool)
+    return columns
+
+class Candidate:
+    """One set of underwriting settings: Config values plus a compiled policy"""
+
+    def __init__(self, name: str, overrides: Optional[Dict[str, Any]] = None):
+        unknown = set(overrides or {}) - set(TUNABLES)
+        if unknown:
+            raise ValueError(f"{name}: cannot override {', '.join(sorted(unknown))}")
+        self.name = name
+        self.settings = {key: (overrides or {}).get(key, getattr(Config, key)) for key in TUNABLES}
+        self.policy = CompiledPolicy.load(self.settings["UNDERWRITING_POLICY_PATH"])
+
+    @classmethod
+    def parse(cls, spec: str) -> "Candidate":
+        """'name:KEY=VALUE,KEY=VALUE' (numeric values are converted)"""
+        name, _, assignments = spec.partition(":")
+        overrides = {}
+        for assignment in filter(None, assignments.split(",")):
+            key, _, value = assignment.partition("=")
+            try:
+                overrides[key.strip()] = float(value)
+            except ValueError:
+                overrides[key.strip()] = value.strip()
+        return cls(name, overrides)
+
+    def decide(self, columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Vectorised UnderwritingAgent._make_decision: decision codes, loan amounts, risk level codes, products"""
+        settings = self.settings
+        risk = columns["risk_score"]
+        pre_approval = columns["pre_approval_limit"]
+        salary = columns["salary"]
+        requested = np.where(columns["requested_amount"] > 0, columns["requested_amount"], pre_approval)
+
+        risk_level = np.full(len(risk), 2, dtype=np.int8)
+        risk_level[risk <= 1.0 - settings["MEDIUM_RISK_THRESHOLD"]] = 1
+        risk_level[risk <= 1.0 - settings["LOW_RISK_THRESHOLD"]] = 0
+
+        policy = self.policy.evaluate_batch(columns["loan_type"], {
+            "risk_score": risk,
+            "credit_score": columns["credit_score"],
+            "verification_confidence": columns["verification_confidence"],
+            "requested_amount": requested,
+            "pre_approval_limit": pre_approval,
+            "salary": salary
+        })
+        approved = policy["approve"]
+        capped = np.minimum(np.minimum(requested, pre_approval), policy["max_amount"])
+
+        # EMI check runs only when a salary slip was uploaded and verification was not conclusive,
+        # on the capped amount at the rate and tenure it would be approved at
+        checked = columns["salary_slip"] & (columns["verification_confidence"] < settings["VERIFICATION_CONFIDENCE_HIGH"])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            emi = capped / _annuity_factor(policy["interest_rate"], policy["tenure_months"])
+            affordable = (salary > 0) & (emi / salary <= settings["EMI_SALARY_RATIO_THRESHOLD"])
+        needs_counter = approved & checked & ~affordable
+
+        # Counter-offers are priced on each product's counter-offer terms and never exceed the capped amount
+        counter_factor = np.zeros(len(risk))
+        for key, product in self.policy.products.items():
+            rows = policy["product"] == key
+            counter_factor[rows] = _annuity_factor(product.counter_offer_rate, product.counter_offer_tenure_months)
+        counter_amount = np.minimum(np.round(salary * settings["EMI_SALARY_RATIO_THRESHOLD"] * counter_factor), capped)
+
+        decision = np.full(len(risk), REJECT, dtype=np.int8)
+        amount = np.zeros(len(risk))
+        plain = approved & ~needs_counter
+        decision[plain] = APPROVE
+        amount[plain] = capped[plain]
+        countered = needs_counter & (counter_amount > 0)
+        decision[countered] = COUNTER_OFFER
+        amount[countered] = counter_amount[countered]
+        return decision, amount, risk_level, policy["product"]
+
+class CandidateTotals:
+    """Counters accumulated for one candidate across chunks"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.decisions = np.zeros(len(DECISIONS), dtype=np.int64)
+        self.exposure = np.zeros(len(DECISIONS))
+        self.risk_levels = np.zeros(len(RISK_LEVELS), dtype=np.int64)
+        self.transitions = np.zeros((len(DECISIONS), len(DECISIONS)), dtype=np.int64)  # [current, candidate]
+        self.by_product: Counter = Counter()  # (product, decision) -> count
+
+    def add(self, decision: np.ndarray, amount: np.ndarray, risk_level: np.ndarray, products: np.ndarray,
+            current: np.ndarray):
+        self.decisions += np.bincount(decision, minlength=len(DECISIONS))
+        self.exposure += np.bincount(decision, weights=amount, minlength=len(DECISIONS))
+        self.risk_levels += np.bincount(risk_level, minlength=len(RISK_LEVELS))
+        self.transitions += np.bincount(current * len(DECISIONS) + decision,
+                                        minlength=len(DECISIONS) ** 2).reshape(len(DECISIONS), len(DECISIONS))
+        product_keys, product_index = np.unique(products.astype(str), return_inverse=True)
+        counts = np.bincount(product_index * len(DECISIONS) + decision, minlength=len(product_keys) * len(DECISIONS))
+        for flat, count in enumerate(counts):
+            if count:
+                self.by_product[(product_keys[flat // len(DECISIONS)], DECISIONS[flat % len(DECISIONS)])] += int(count)
+
+    def to_dict(self, baseline: "CandidateTotals") -> Dict[str, Any]:
+        total = max(int(self.decisions.sum()), 1)
+        return {
+            "name": self.name,
+            "decisions": {d: int(n) for d, n in zip(DECISIONS, self.decisions)},
+            "decision_delta": {d: int(n) for d, n in zip(DECISIONS, self.decisions - baseline.decisions)},
+            "approval_rate": round(float(self.decisions[APPROVE] + self.decisions[COUNTER_OFFER]) / total, 4),
+            "exposure": {d: round(float(x), 2) for d, x in zip(DECISIONS, self.exposure) if d != "reject"},
+            "exposure_delta": round(float(self.exposure.sum() - baseline.exposure.sum()), 2),
+            "risk_levels": {level: int(n) for level, n in zip(RISK_LEVELS, self.risk_levels)},
+            "changed": int(self.transitions.sum() - np.trace(self.transitions)),
+            "transitions": {f"{DECISIONS[a]}->{DECISIONS[b]}": int(self.transitions[a, b])
+                            for a in range(len(DECISIONS)) for b in range(len(DECISIONS))
+                            if a != b and self.transitions[a, b]},
+            "by_product": {f"{product}:{decision}": count for (product, decision), count in sorted(self.by_product.items())}
+        }
+
+def simulate(applications: Iterable[Dict[str, Any]], candidates: List[Candidate],
+             chunk_size: int = 50_000) -> Dict[str, Any]:
+    """Decide every application under the current settings and each candidate.
+
+    The first report entry is the current settings; "recorded_agreement" is
+    the share of applications with a stored decision where it reproduces
+    that decision, a check that the book is comparable with today's logic.
+    """
+    current = Candidate("current")
+    totals = [CandidateTotals(c.name) for c in [current] + candidates]
+    rows = recorded = agreed = 0
+    started = time.perf_counter()
+    for columns in iter_chunks(applications, chunk_size):
+        outcome = current.decide(columns)
+        baseline = outcome[0]
+        rows += len(baseline)
+        recorded += int((columns["recorded_decision"] >= 0).sum())
+        agreed += int((baseline == columns["recorded_decision"]).sum())
+        totals[0].add(*outcome, baseline)
+        for candidate, candidate_totals in zip(candidates, totals[1:]):
+            candidate_totals.add(*candidate.decide(columns), baseline)
+    return {
+        "applications": rows,
+        "recorded_agreement": round(agreed / recorded, 4) if recorded else None,
+        "seconds": round(time.perf_counter() - started, 2),
+        "candidates": [t.to_dict(totals[0]) for t in totals]
+    }
+
+def synthetic_applications(count: int, seed: int = 0, batch: int = 100_000) -> Iterator[Dict[str, Any]]:
+    """Plausible application documents for load-testing the simulator"""
+    rng = np.random.default_rng(seed)
+    loan_types = ["Personal Loan", "Home Loan", "Business Loan", "Education Loan", "Auto Loan", "Gold Loan"]
+    for start in range(0, count, batch):
+        n = min(batch, count - start)
+        credit = rng.integers(450, 900, n)
+        confidence = rng.beta(6, 2, n)
+        risk = np.round((1 - credit / 900) * 0.5 + (1 - confidence) * 0.3 + 0.06, 3)
+        pre_approval = rng.choice([100_000, 250_000, 500_000, 1_000_000], n)
+        salary = np.round(rng.lognormal(np.log(45_000), 0.5, n), -2)
+        slip = rng.random(n) < 0.6
+        kinds = rng.integers(0, len(loan_types), n)
+        for i in range(n):
+            yield {"result": {
+                "customer_data": {"loan_type": loan_types[kinds[i]], "salary": float(salary[i]),
+                                  "salary_slip": bool(slip[i]), "requested_amount": 0},
+                "underwriting_result": {"risk_score": float(risk[i]), "credit_score": int(credit[i]),
+                                        "verification_confidence": float(confidence[i]),
+                                        "pre_approval_limit": float(pre_approval[i]), "decision": None}
+            }}
+
+def _print_report(report: Dict[str, Any]):
+    print(f"{report['applications']:,} applications in {report['seconds']} s")
+    if report["recorded_agreement"] is not None:
+        print(f"current settings reproduce {report['recorded_agreement']:.2%} of recorded decisions")
+    for entry in report["candidates"]:
+        decisions = "  ".join(f"{d} {n:,} ({entry['decision_delta'][d]:+,})" for d, n in entry["decisions"].items())
+        print(f"\n{entry['name']}: approval rate {entry['approval_rate']:.2%}  {decisions}")
+        print(f"  exposure {sum(entry['exposure'].values()):,.0f} ({entry['exposure_delta']:+,.0f})  "
+              f"risk levels {entry['risk_levels']}  changed {entry['changed']:,}")
+        for transition, count in entry["transitions"].items():
+            print(f"    {transition:<28} {count:,}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidate", action="append", default=[], metavar="NAME:KEY=VALUE,...",
+                        help=f"settings to try; keys: {', '.join(TUNABLES)}")
+    parser.add_argument("--input", help="JSONL of application documents instead of MongoDB")
+    parser.add_argument("--synthetic", type=int, help="simulate this many generated applications instead")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    candidates = [Candidate.parse(spec) for spec in args.candidate]
+    if args.synthetic:
+        source = synthetic_applications(args.synthetic)
+    elif args.input:
+        source = (json.loads(line) for line in open(args.input) if line.strip())
+    else:
+        from services.database import DatabaseService
+        source = DatabaseService().loan_applications.find(
+            {"result.underwriting_result": {"$exists": True}}, _PROJECTION, batch_size=args.chunk_size)
+
+    report = simulate(source, candidates, args.chunk_size)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
@@ -0,0 +1,176 @@
+"""Opt-in sampling profiler for individual requests.
+
+A single background thread samples the stack of every thread with an active
+capture (sys._current_frames) every PROFILE_INTERVAL_MS. Samples are tagged
+with the LangGraph node running at the time (see mark_node) and written as
+collapsed stacks, one "frame;frame;frame count" line per unique stack, which
+flamegraph.pl, speedscope or inferno render directly.
+
+Only the request's own thread is sampled: time awaiting the LLM or other
+asyncio I/O shows up as the event loop's select(), and work handed to
+executor threads (OCR, face matching) as waiting on the future.
+"""
+from typing import Dict, Any, List, Optional
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from config import Config
+from datetime import datetime
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+_active_capture: ContextVar[Optional["Capture"]] = ContextVar("profile_capture", default=None)
+
+def mark_node(node: str):
+    """Attribute the current request's following samples to a workflow node"""
+    capture = _active_capture.get()
+    if capture is not None:
+        capture.node = node
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}".replace(";", ":")
+
+class Capture:
+    """Samples collected for one request"""
+
+    def __init__(self, thread_id: int, tags: Dict[str, Any]):
+        self.capture_id = uuid.uuid4().hex[:12]
+        self.thread_id = thread_id
+        self.tags = dict(tags)
+        self.node = "request"
+        self.samples: Counter = Counter()
+        self.node_samples: Counter = Counter()
+        self.started_at = datetime.now().isoformat()
+        self.duration = 0.0
+        self.path: Optional[str] = None
+
+    def add_sample(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        stack.append(f"node:{self.node}")
+        self.samples[";".join(reversed(stack))] += 1
+        self.node_samples[self.node] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self, interval: float) -> Dict[str, Any]:
+        return {
+            "capture_id": self.capture_id,
+            "tags": self.tags,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": sum(self.samples.values()),
+            "node_ms": {node: round(count * interval * 1000, 1) for node, count in self.node_samples.most_common()},
+            "file": self.path
+        }
+
+class RequestProfiler:
+    """Starts and stops per-request captures and keeps the most recent ones"""
+
+    def __init__(self, interval: Optional[float] = None, sample_rate: Optional[float] = None,
+                 directory: Optional[str] = None, keep: Optional[int] = None,
+                 secret: Optional[str] = None, max_per_minute: Optional[int] = None):
+        self.interval = Config.PROFILE_INTERVAL_MS / 1000 if interval is None else interval
+        self.sample_rate = Config.PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.secret = Config.PROFILE_SECRET if secret is None else secret
+        self.max_per_minute = Config.PROFILE_MAX_PER_MINUTE if max_per_minute is None else max_per_minute
+        self._started: deque = deque()  # start times of captures in the last minute
+        self.directory = directory or Config.PROFILE_DIR
+        self._recent: deque = deque(maxlen=Config.PROFILE_KEEP if keep is None else keep)
+        self._active: Dict[int, Capture] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def should_profile(self, requested: Optional[str] = None) -> bool:
+        """Whether to profile a request, by sampling or because `requested` (a header value) is the secret.
+
+        At most max_per_minute requests are profiled, however they were chosen.
+        """
+        chosen = bool(self.secret and requested and hmac.compare_digest(requested.encode(), self.secret.encode()))
+        if not chosen and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            return False
+        now = time.monotonic()
+        with self._lock:
+            while self._started and self._started[0] <= now - 60:
+                self._started.popleft()
+            if len(self._started) >= self.max_per_minute:
+                return False
+            self._started.append(now)
+        return True
+
+    @contextmanager
+    def capture(self, **tags):
+        """Profile the calling thread for the duration of the block"""
+        capture = Capture(threading.get_ident(), tags)
+        token = _active_capture.set(capture)
+        with self._lock:
+            self._active[capture.thread_id] = capture
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_forever, name="request-profiler", daemon=True)
+                self._sampler.start()
+        start = time.perf_counter()
+        try:
+            yield capture
+        finally:
+            capture.duration = time.perf_counter() - start
+            with self._lock:
+                self._active.pop(capture.thread_id, None)
+            _active_capture.reset(token)
+            self._save(capture)
+
+    def _sample_forever(self):
+        me = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, capture in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != me:
+                        capture.add_sample(frame)
+            del frames
+
+    def _save(self, capture: Capture):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            capture.path = os.path.join(self.directory, f"{capture.capture_id}.folded")
+            with open(capture.path, "w") as f:
+                f.write(capture.collapsed())
+        except OSError as e:
+            print(f"Could not write profile {capture.capture_id}: {str(e)}")
+            capture.path = None
+        with self._lock:
+            if len(self._recent) == self._recent.maxlen:
+                self._remove(self._recent[0])
+            self._recent.append(capture)
+
+    @staticmethod
+    def _remove(capture: Capture):
+        if capture.path:
+            try:
+                os.remove(capture.path)
+            except OSError:
+                pass
+
+    def slowest(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Summaries of the slowest recent captures, slowest first"""
+        with self._lock:
+            captures = sorted(self._recent, key=lambda c: c.duration, reverse=True)[:limit]
+        return [capture.summary(self.interval) for capture in captures]
+
+    def collapsed(self, capture_id: str) -> Optional[str]:
+        """Collapsed stacks of a recent capture, or None if it is unknown or has been dropped"""
+        with self._lock:
+            capture = next((c for c in self._recent if c.capture_id == capture_id), None)
+        return capture.collapsed() if capture else None
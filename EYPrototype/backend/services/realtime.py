@@ -0,0 +1,108 @@
+from typing import Dict, Any, Optional, Tuple
+from config import Config
+import hashlib
+import hmac
+import threading
+import time
+
+def customer_room(customer_id: Any) -> str:
+    return f"customer:{customer_id}"
+
+def application_room(application_id: Any) -> str:
+    return f"application:{application_id}"
+
+def dashboard_room() -> str:
+    return "dashboard"
+
+def _room_signature(room: str, expires_at: int) -> str:
+    return hmac.new(Config.SECRET_KEY.encode(), f"{room}|{expires_at}".encode(), hashlib.sha256).hexdigest()
+
+def room_auth_enabled() -> bool:
+    """Room tokens need a private SECRET_KEY; with the public default anyone could sign them"""
+    return bool(Config.SECRET_KEY) and Config.SECRET_KEY != Config.DEV_SECRET_KEY
+
+def room_token(room: str, ttl: Optional[float] = None) -> Optional[str]:
+    """Signed, expiring proof that the holder may join a room, handed out with the id it covers.
+
+    None when room auth is disabled (SECRET_KEY not set), so no room can be joined.
+    """
+    if not room_auth_enabled():
+        return None
+    expires_at = int(time.time() + (Config.SOCKETIO_ROOM_TOKEN_TTL_SECONDS if ttl is None else ttl))
+    return f"{expires_at}.{_room_signature(room, expires_at)}"
+
+def verify_room_token(room: str, token: Any) -> bool:
+    if not room_auth_enabled():
+        return False
+    expires_at, _, signature = str(token or "").partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    # Compared as bytes: compare_digest refuses non-ASCII str, and tokens come from clients
+    return hmac.compare_digest(signature.encode(), _room_signature(room, int(expires_at)).encode())
+
+def is_staff_token(token: Any) -> bool:
+    """Whether token is the configured STAFF_API_TOKEN (never true when none is configured)"""
+    return bool(Config.STAFF_API_TOKEN) and hmac.compare_digest(str(token or "").encode(),
+                                                                 Config.STAFF_API_TOKEN.encode())
+
+class UpdatePublisher:
+    """Emits Socket.IO events to rooms, coalescing bursts of updates.
+
+    Events are snapshots: within one flush interval only the latest payload
+    per (event, room) is sent, so a burst of progress events costs one emit
+    per subscriber room rather than one per update. Payloads must therefore
+    carry full state (e.g. all completed steps), not deltas. An interval of
+    0 emits synchronously.
+    """
+
+    def __init__(self, socketio, interval: Optional[float] = None):
+        self.socketio = socketio
+        self.interval = Config.SOCKETIO_COALESCE_SECONDS if interval is None else interval
+        self._pending: Dict[Tuple[str, str, Any], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flusher_started = False
+        self.published = 0
+        self.emitted = 0
+
+    def publish(self, event: str, room: str, payload: Dict[str, Any], key: Any = None):
+        """Queue an event for a room; replaces any not-yet-sent payload for the same room and key.
+
+        Pass a key (e.g. an application id) when one room carries snapshots of
+        many objects, so only updates to the same object are merged.
+        """
+        self.published += 1
+        if self.interval <= 0:
+            self._emit(event, room, payload)
+            return
+        with self._lock:
+            self._pending[(event, room, key)] = payload
+            if not self._flusher_started:
+                self._flusher_started = True
+                self.socketio.start_background_task(self._flush_forever)
+
+    def flush(self):
+        """Emit everything pending now"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for (event, room, _), payload in pending.items():
+            self._emit(event, room, payload)
+
+    def _emit(self, event: str, room: str, payload: Dict[str, Any]):
+        try:
+            self.socketio.emit(event, payload, to=room)
+            self.emitted += 1
+        except Exception as e:
+            print(f"Error emitting {event} to {room}: {str(e)}")
+
+    def _flush_forever(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "emitted": self.emitted,
+            "pending": len(self._pending),
+            "coalesce_seconds": self.interval
+        }
@@ -0,0 +1,175 @@
+"""Customer profile risk model: logistic regression on application profile features.
+
+Trained offline on decisions from the feedback store joined with repayment
+outcomes, published to the model registry (services.model_registry) and
+used by UnderwritingAgent for the profile component of the risk score (until
+a model is trained that component stays at the fixed default).
+Standardisation is folded into the weights, so scoring one applicant is a
+dot product over a few features in plain Python.
+
+Train and publish a new version (CPU only, numpy):
+    python -m services.risk_model --train [--no-activate]
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+from .underwriting_policy import product_key
+import argparse
+import math
+
+PRODUCTS = ["personal", "home", "business", "education", "auto", "gold"]
+
+FEATURES = ["log_salary", "salary_missing", "loan_to_income", "has_salary_slip", "age", "age_missing",
+            "self_employed"] + [f"product_{product}" for product in PRODUCTS]
+
+# Raw inputs recorded with each decision; profile_features is recomputed from these for training
+PROFILE_INPUTS = ["salary", "requested_amount", "has_salary_slip", "age", "employment_type", "loan_type"]
+
+def profile_inputs(customer_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The raw customer fields the model reads"""
+    salary = (customer_data.get("salary_slip_data") or {}).get("net_salary") or customer_data.get("salary") or 0
+    return {
+        "salary": float(salary or 0),
+        "requested_amount": float(customer_data.get("requested_amount") or 0),
+        "has_salary_slip": bool(customer_data.get("salary_slip")),
+        "age": float(customer_data.get("age") or 0),
+        "employment_type": str(customer_data.get("employment_type") or customer_data.get("employment_status") or ""),
+        "loan_type": customer_data.get("loan_type")
+    }
+
+def profile_features(inputs: Dict[str, Any]) -> List[float]:
+    """Feature vector, in FEATURES order, from profile_inputs()"""
+    salary = inputs.get("salary") or 0.0
+    age = inputs.get("age") or 0.0
+    product = product_key(inputs.get("loan_type")) or "personal"
+    return [
+        math.log1p(salary),
+        0.0 if salary else 1.0,
+        min((inputs.get("requested_amount") or 0.0) / (12 * salary), 10.0) if salary else 0.0,
+        1.0 if inputs.get("has_salary_slip") else 0.0,
+        age,
+        0.0 if age else 1.0,
+        1.0 if "self" in (inputs.get("employment_type") or "").lower() else 0.0,
+    ] + [1.0 if product == p else 0.0 for p in PRODUCTS]
+
+def fold_standardisation(spec: Dict[str, Any]) -> Tuple[List[float], float]:
+    """Weights and bias that apply a spec's standardisation: w.(x - mean)/scale + b == w'.x + b'"""
+    weights = [w / s for w, s in zip(spec["weights"], spec["scale"])]
+    return weights, spec["bias"] - sum(w * m for w, m in zip(weights, spec["mean"]))
+
+class RiskModel:
+    """A trained model version: predicts the probability an applicant defaults"""
+
+    def __init__(self, version: str, coefficients, bias: float, metrics: Optional[Dict[str, Any]] = None):
+        if len(coefficients) != len(FEATURES):
+            raise ValueError("model was trained on a different feature set")
+        self.version = version
+        self.coefficients = coefficients  # numpy array (possibly memory-mapped) for batch scoring
+        self.bias = float(bias)
+        self.metrics = metrics or {}
+        self._weights = tuple(float(w) for w in coefficients)  # plain floats for single rows
+
+    @classmethod
+    def from_spec(cls, spec: Dict[str, Any]) -> "RiskModel":
+        import numpy as np
+        if spec.get("features") != FEATURES:
+            raise ValueError("model was trained on a different feature set")
+        weights, bias = fold_standardisation(spec)
+        return cls(spec["version"], np.array(weights), bias, spec.get("metrics"))
+
+    def predict(self, customer_data: Dict[str, Any]) -> float:
+        return self.predict_features(profile_features(profile_inputs(customer_data)))
+
+    def predict_features(self, features: List[float]) -> float:
+        z = self.bias + sum(w * x for w, x in zip(self._weights, features))
+        return 1.0 / (1.0 + math.exp(-z)) if z > -700 else 0.0
+
+    def predict_batch(self, features):
+        """Default probabilities for a (rows, len(FEATURES)) array"""
+        import numpy as np
+        z = np.asarray(features, dtype=np.float64) @ self.coefficients + self.bias
+        return 1.0 / (1.0 + np.exp(-np.clip(z, -700, 700)))
+
+def _auc(labels, scores) -> float:
+    import numpy as np
+    order = np.argsort(scores, kind="mergesort")
+    ranks = np.empty(len(scores))
+    ranks[order] = np.arange(1, len(scores) + 1)
+    positives = labels.sum()
+    negatives = len(labels) - positives
+    if not positives or not negatives:
+        return float("nan")
+    return float((ranks[labels == 1].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+def fit_logistic(X, y, l2: float = 1.0, iterations: int = 25) -> Tuple[Any, float, Any, Any]:
+    """L2-regularised logistic regression by Newton's method; returns (weights, bias, mean, scale)"""
+    import numpy as np
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    Z = np.hstack([(X - mean) / scale, np.ones((len(X), 1))])
+    beta = np.zeros(Z.shape[1])
+    penalty = np.full(Z.shape[1], l2)
+    penalty[-1] = 0.0  # do not shrink the intercept
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-np.clip(Z @ beta, -30, 30)))
+        gradient = Z.T @ (p - y) + penalty * beta
+        hessian = (Z * (p * (1 - p))[:, None]).T @ Z + np.diag(penalty)
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return beta[:-1], float(beta[-1]), mean, scale
+
+def train(table, l2: float = 1.0, holdout: float = 0.2) -> Dict[str, Any]:
+    """Fit on a joined feedback table (see FeedbackStore.training_table); returns the model spec.
+
+    The most recent `holdout` share of decisions is kept out of training to
+    measure AUC and log loss, then the model is refit on everything.
+    """
+    import numpy as np
+    rows = table.select(PROFILE_INPUTS + ["decided_at", "defaulted"]).to_pylist()
+    if len(rows) < 50:
+        raise ValueError(f"need at least 50 decisions with outcomes to train, have {len(rows)}")
+    rows.sort(key=lambda row: row["decided_at"])
+    X = np.array([profile_features(row) for row in rows], dtype=np.float64)
+    y = np.array([1.0 if row["defaulted"] else 0.0 for row in rows])
+
+    split = int(len(rows) * (1 - holdout))
+    weights, bias, mean, scale = fit_logistic(X[:split], y[:split], l2)
+    p = 1.0 / (1.0 + np.exp(-np.clip(((X[split:] - mean) / scale) @ weights + bias, -30, 30)))
+    eps = 1e-12
+    metrics = {
+        "rows": len(rows),
+        "default_rate": round(float(y.mean()), 4),
+        "holdout_rows": len(rows) - split,
+        "holdout_auc": round(_auc(y[split:], p), 4),
+        "holdout_log_loss": round(float(-np.mean(y[split:] * np.log(p + eps) + (1 - y[split:]) * np.log(1 - p + eps))), 4)
+    }
+
+    weights, bias, mean, scale = fit_logistic(X, y, l2)
+    return {
+        "version": datetime.now().strftime("%Y%m%d%H%M%S"),
+        "trained_at": datetime.now().isoformat(),
+        "features": FEATURES,
+        "mean": mean.tolist(),
+        "scale": scale.tolist(),
+        "weights": weights.tolist(),
+        "bias": bias,
+        "metrics": metrics
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--train", action="store_true", help="fit on the feedback store and publish the model")
+    parser.add_argument("--no-activate", action="store_true", help="publish without making it the current version")
+    parser.add_argument("--l2", type=float, default=1.0, help="regularisation strength")
+    args = parser.parse_args()
+
+    from services.model_registry import ModelRegistry
+    registry = ModelRegistry()
+    if args.train:
+        from services.feedback_store import FeedbackStore
+        spec = train(FeedbackStore().training_table(), args.l2)
+        registry.publish(spec, activate=not args.no_activate)
+        print(f"model {spec['version']}: {spec['metrics']}")
+    print(f"current model: {registry.current_version or 'none'}; versions: {', '.join(registry.versions()) or 'none'}")
@@ -0,0 +1,267 @@
+"""Versioned underwriting policies per loan product, compiled for fast evaluation.
+
+A policy file (JSON) has a "defaults" block and a block per product that
+overrides it:
+
+    {"version": "...", "default_product": "personal",
+     "defaults": {"reject_rules": [{"when": {"credit_score": {"<": 600}}, "reason": "..."}],
+                  "rate_bands": [{"max_risk": 0.3, "rate": 0.10}, ...],
+                  "tenure_months": 60, "counter_offer": {"rate": 0.12, "tenure_months": 60},
+                  "max_amount": null},
+     "products": {"home": {"name": "Home Loan", "tenure_months": 240, ...}}}
+
+Reject rules are checked in order and the first match wins; the rate comes
+from the first band whose max_risk is at or above the risk score. Rules are
+compiled once per load into operator/threshold tuples for single decisions
+and into numpy masks for batches (evaluate_batch), so both paths apply the
+same policy.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from config import Config
+import json
+import operator
+import os
+import threading
+import time
+import zlib
+import numpy as np
+
+FEATURES = ["risk_score", "credit_score", "verification_confidence", "requested_amount",
+            "pre_approval_limit", "salary", "prior_applications", "prior_approvals", "prior_rejections"]
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq}
+
+def product_key(loan_type: Optional[str]) -> str:
+    """'Home Loan', 'home' and 'HOME_LOAN' all map to 'home'"""
+    words = str(loan_type or "").lower().replace("_", " ").split()
+    return " ".join(word for word in words if word != "loan")
+
+class ProductPolicy:
+    """One product's compiled rules and pricing"""
+
+    def __init__(self, key: str, spec: Dict[str, Any]):
+        self.key = key
+        self.name = spec.get("name", key)
+        self.reject_rules: List[Tuple[str, Any, float, str]] = []
+        for rule in spec.get("reject_rules", []):
+            for feature, conditions in rule["when"].items():
+                if feature not in FEATURES:
+                    raise ValueError(f"{key}: unknown feature {feature!r}")
+                for op, threshold in conditions.items():
+                    if op not in OPERATORS:
+                        raise ValueError(f"{key}: unknown operator {op!r}")
+                    self.reject_rules.append((feature, op, float(threshold), rule["reason"]))
+        bands = sorted(spec["rate_bands"], key=lambda band: band["max_risk"])
+        if not bands:
+            raise ValueError(f"{key}: at least one rate band is required")
+        self.band_caps = np.array([band["max_risk"] for band in bands], dtype=np.float64)
+        self.band_rates = np.array([band["rate"] for band in bands], dtype=np.float64)
+        self.tenure_months = int(spec["tenure_months"])
+        counter_offer = spec.get("counter_offer") or {}
+        self.counter_offer_rate = float(counter_offer.get("rate", self.band_rates[-1]))
+        self.counter_offer_tenure_months = int(counter_offer.get("tenure_months", self.tenure_months))
+        self.max_amount = float(spec["max_amount"]) if spec.get("max_amount") else None
+
+    def rate_for(self, risk_score: float) -> float:
+        index = int(np.searchsorted(self.band_caps, risk_score, side="left"))
+        return float(self.band_rates[min(index, len(self.band_rates) - 1)])
+
+    def evaluate(self, features: Dict[str, float]) -> Dict[str, Any]:
+        """Reject (with the first matching rule's reason) or approve with rate and terms"""
+        for feature, op, threshold, reason in self.reject_rules:
+            if OPERATORS[op](features.get(feature, 0), threshold):
+                return {"decision": "reject", "reason": reason, "rule": f"{feature} {op} {threshold:g}"}
+        return {
+            "decision": "approve",
+            "interest_rate": self.rate_for(features.get("risk_score", 0)),
+            "tenure_months": self.tenure_months,
+            "max_amount": self.max_amount,
+            "counter_offer_rate": self.counter_offer_rate,
+            "counter_offer_tenure_months": self.counter_offer_tenure_months
+        }
+
+class CompiledPolicy:
+    """A whole policy version: one ProductPolicy per loan product"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.version = str(spec.get("version", "unversioned"))
+        defaults = spec.get("defaults", {})
+        self.products = {key: ProductPolicy(key, {**defaults, **overrides})
+                         for key, overrides in spec.get("products", {}).items()}
+        self.default_product = spec.get("default_product") or next(iter(self.products), None)
+        if self.default_product not in self.products:
+            raise ValueError(f"default_product {self.default_product!r} is not defined")
+
+    @classmethod
+    def load(cls, path: str) -> "CompiledPolicy":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def product(self, loan_type: Optional[str]) -> ProductPolicy:
+        return self.products.get(product_key(loan_type)) or self.products[self.default_product]
+
+    def evaluate(self, loan_type: Optional[str], features: Dict[str, float]) -> Dict[str, Any]:
+        product = self.product(loan_type)
+        return {"product": product.key, "policy_version": self.version, **product.evaluate(features)}
+
+    def evaluate_batch(self, loan_types: np.ndarray, features: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Vectorised evaluate over many applications.
+
+        Returns arrays: approve (bool), reject_rule (index into the product's
+        reject_rules, -1 when approved), interest_rate and tenure_months (0
+        when rejected) and max_amount (inf when uncapped).
+        """
+        resolved: Dict[Any, str] = {}  # few distinct loan types, so map each once
+        for loan_type in set(loan_types):
+            resolved[loan_type] = self.product(loan_type).key
+        keys = np.array([resolved[loan_type] for loan_type in loan_types], dtype=object)
+        count = len(keys)
+        reject_rule = np.full(count, -1, dtype=np.int32)
+        interest_rate = np.zeros(count, dtype=np.float64)
+        tenure_months = np.zeros(count, dtype=np.int32)
+        max_amount = np.full(count, np.inf, dtype=np.float64)
+        columns = {name: np.asarray(values, dtype=np.float64) for name, values in features.items()}
+
+        for key, product in self.products.items():
+            rows = np.flatnonzero(keys == key)
+            if not len(rows):
+                continue
+            undecided = np.ones(len(rows), dtype=bool)
+            for index, (feature, op, threshold, _) in enumerate(product.reject_rules):
+                values = columns.get(feature, np.zeros(count))[rows]
+                hit = undecided & OPERATORS[op](values, threshold)
+                reject_rule[rows[hit]] = index
+                undecided &= ~hit
+            approved = rows[undecided]
+            risk = columns.get("risk_score", np.zeros(count))[approved]
+            band = np.minimum(np.searchsorted(product.band_caps, risk, side="left"), len(product.band_rates) - 1)
+            interest_rate[approved] = product.band_rates[band]
+            tenure_months[approved] = product.tenure_months
+            if product.max_amount:
+                max_amount[rows] = product.max_amount
+
+        return {
+            "product": keys,
+            "approve": reject_rule < 0,
+            "reject_rule": reject_rule,
+            "interest_rate": interest_rate,
+            "tenure_months": tenure_months,
+            "max_amount": max_amount
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "default_product": self.default_product,
+            "products": {key: {"name": p.name, "rules": len(p.reject_rules), "tenure_months": p.tenure_months,
+                               "max_amount": p.max_amount} for key, p in self.products.items()}
+        }
+
+class PolicyStore:
+    """The live (champion) policy and an optional challenger, hot-reloaded from disk.
+
+    With a challenger configured every decision is also evaluated under it
+    (shadow mode) and agreement is counted; UNDERWRITING_CHALLENGER_SHARE of
+    customers, chosen by a stable hash of their id, get the challenger's
+    decision for real. A reload compiles the new file first and swaps one
+    reference, so a broken file leaves the previous policy serving.
+    """
+
+    def __init__(self, path: Optional[str] = None, challenger_path: Optional[str] = None,
+                 challenger_share: Optional[float] = None):
+        self.path = path or Config.UNDERWRITING_POLICY_PATH
+        self.challenger_path = Config.UNDERWRITING_CHALLENGER_POLICY_PATH if challenger_path is None else challenger_path
+        self.challenger_share = Config.UNDERWRITING_CHALLENGER_SHARE if challenger_share is None else challenger_share
+        self.champion: Optional[CompiledPolicy] = None
+        self.challenger: Optional[CompiledPolicy] = None
+        self._mtimes: Dict[str, float] = {}
+        self._reload_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._watch_thread: Optional[threading.Thread] = None
+        self.loaded_at: Optional[float] = None
+        self.comparisons: Dict[str, int] = {}
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """Recompile policies whose file changed; returns True if anything was swapped"""
+        with self._reload_lock:
+            swapped = False
+            for attribute, path in [("champion", self.path), ("challenger", self.challenger_path)]:
+                if not path:
+                    continue
+                mtime = os.path.getmtime(path)
+                if not force and self._mtimes.get(path) == mtime:
+                    continue
+                policy = CompiledPolicy.load(path)
+                if attribute == "challenger" and self.challenger and self.challenger.version != policy.version:
+                    self.comparisons = {}
+                setattr(self, attribute, policy)
+                self._mtimes[path] = mtime
+                swapped = True
+            if swapped:
+                self.loaded_at = time.time()
+            return swapped
+
+    def start_watching(self, interval: Optional[float] = None):
+        """Poll the policy files and hot-reload them in a daemon thread"""
+        if self._watch_thread:
+            return
+        interval = interval or Config.UNDERWRITING_POLICY_RELOAD_INTERVAL_SECONDS
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Underwriting policy reload failed, keeping the current policy: {str(e)}")
+
+        self._watch_thread = threading.Thread(target=_run, name="underwriting-policy-reload", daemon=True)
+        self._watch_thread.start()
+
+    def _in_challenger_arm(self, unit_id: Any) -> bool:
+        if not self.challenger or self.challenger_share <= 0 or unit_id is None:
+            return False
+        return zlib.crc32(str(unit_id).encode()) % 10_000 < self.challenger_share * 10_000
+
+    def evaluate(self, loan_type: Optional[str], features: Dict[str, float], unit_id: Any = None) -> Dict[str, Any]:
+        """Decision under the policy serving this customer; includes the other policy's verdict when A/B testing"""
+        champion, challenger = self.champion, self.challenger
+        live = champion.evaluate(loan_type, features)
+        if challenger is None:
+            return live
+        alternative = challenger.evaluate(loan_type, features)
+        key = f"{live['decision']}->{alternative['decision']}"
+        with self._stats_lock:
+            self.comparisons[key] = self.comparisons.get(key, 0) + 1
+        if self._in_challenger_arm(unit_id):
+            live, shadow, arm = alternative, live, "challenger"
+        else:
+            shadow, arm = alternative, "champion"
+        live["arm"] = arm
+        live["shadow"] = {k: shadow.get(k) for k in ["policy_version", "decision", "reason", "interest_rate"]}
+        return live
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "champion": self.champion.summary() if self.champion else None,
+            "challenger": self.challenger.summary() if self.challenger else None,
+            "challenger_share": self.challenger_share if self.challenger else 0.0,
+            "comparisons": dict(self.comparisons),  # "champion decision->challenger decision": count
+            "loaded_at": self.loaded_at
+        }
+
+_store: Optional[PolicyStore] = None
+_store_lock = threading.Lock()
+
+def get_policy_store() -> PolicyStore:
+    """Process-wide policy store, watching the policy files for changes"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = PolicyStore()
+                if Config.UNDERWRITING_POLICY_RELOAD_INTERVAL_SECONDS > 0:
+                    store.start_watching()
+                _store = store
+    return _store
@@ -0,0 +1,88 @@
+"""Change-feed paging over applications that share an updated_at"""
+from bson import ObjectId
+from datetime import datetime, timedelta
+from services.database import DatabaseService, change_cursor, parse_change_cursor
+from services.fraud_index import DuplicateApplicationIndex
+import pytest
+
+class _Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.documents.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        return self.documents[:count]
+
+def _matches(document, query):
+    if "$or" in query:
+        return any(_matches(document, clause) for clause in query["$or"])
+    for field, condition in query.items():
+        if isinstance(condition, dict):
+            compare = {"$gt": lambda a, b: a > b, "$gte": lambda a, b: a >= b, "$lte": lambda a, b: a <= b}
+            if not all(compare[op](document[field], value) for op, value in condition.items()):
+                return False
+        elif document[field] != condition:
+            return False
+    return True
+
+class _Collection:
+    """Just enough of a pymongo collection for get_application_changes"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query):
+        return _Cursor([d for d in self.documents if _matches(d, query)])
+
+class _Database(DatabaseService):
+    def __init__(self, documents):
+        super().__init__()
+        self._applications = _Collection(documents)
+
+    @property
+    def loan_applications(self):
+        return self._applications
+
+@pytest.fixture
+def applications():
+    tied = datetime(2026, 10, 19, 9, 30, 0, 250000)
+    times = [tied - timedelta(seconds=1)] + [tied] * 5 + [tied + timedelta(seconds=1)]
+    return [{"_id": ObjectId(), "customer_id": f"c{i}", "updated_at": at, "created_at": at,
+             "result": {"customer_data": {"phone": f"90000000{i:02d}"}}} for i, at in enumerate(times)]
+
+def test_paging_never_skips_or_repeats_tied_applications(applications):
+    db = _Database(list(reversed(applications)))
+    seen, cursor = [], None
+    while True:
+        page = db.get_application_changes(cursor, limit=2)
+        seen.extend(a["_id"] for a in page)
+        if len(page) < 2:
+            break
+        cursor = change_cursor(page[-1])
+    assert seen == [a["_id"] for a in sorted(applications, key=lambda a: (a["updated_at"], a["_id"]))]
+
+def test_cursor_round_trips_at_millisecond_precision(applications):
+    application = {**applications[0], "updated_at": datetime(2026, 10, 19, 9, 30, 0, 123999)}
+    updated_at, object_id = parse_change_cursor(change_cursor(application))
+    assert updated_at == datetime(2026, 10, 19, 9, 30, 0, 123000)
+    assert object_id == application["_id"]
+
+def test_fraud_index_sync_pages_through_ties(applications):
+    index = DuplicateApplicationIndex(_Database(applications))
+    assert index.sync_once(batch_size=2) == len(applications)
+    assert len(index) == len(applications)
+    assert index.sync_once(batch_size=2) == 0
+
+def test_fraud_index_sync_picks_up_late_commits_behind_the_cursor(applications):
+    db = _Database(applications[:-1])
+    index = DuplicateApplicationIndex(db)
+    index.sync_once()
+    # Stamped before the newest indexed row but committed after the sync passed it
+    late = {**applications[-1], "_id": ObjectId(), "updated_at": applications[-2]["updated_at"] - timedelta(seconds=1)}
+    db.loan_applications.documents.append(late)
+    index.sync_once()
+    assert len(index) == len(applications)
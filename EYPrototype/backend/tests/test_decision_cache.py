@@ -0,0 +1,49 @@
+"""Fast-path decision cache: hits only while every input is live and unchanged"""
+from services.decision_cache import DecisionCache
+from services.otp import InMemoryTtlStore
+import pytest
+
+CUSTOMER = {"phone": "9876543210", "loan_amount": 300000, "salary": 80000, "otp_code": "123456"}
+OUTCOME = {"final_decision": "approve", "underwriting_result": {"loan_amount": 300000},
+           "feedback_data": {"decision_id": "d1"}, "status": "approved"}
+
+@pytest.fixture
+def cache():
+    cache = DecisionCache(InMemoryTtlStore())
+    cache.record_inputs("c1", {"status": "verified"}, {"score": 750}, {"eligibility": True})
+    assert cache.record_decision("c1", CUSTOMER, [], OUTCOME)
+    return cache
+
+def test_unchanged_inputs_hit(cache):
+    outcome = cache.lookup("c1", {**CUSTOMER, "otp_code": "654321"}, [])  # one-time codes are not inputs
+    assert outcome["final_decision"] == "approve"
+    assert outcome["verification_result"] == {"status": "verified"}
+    assert outcome["credit_score"] == {"score": 750}
+    assert cache.stats()["hits"] == 1
+
+def test_changed_customer_data_misses_and_drops_the_decision(cache):
+    assert cache.lookup("c1", {**CUSTOMER, "loan_amount": 500000}, []) is None
+    assert cache.lookup("c1", CUSTOMER, []) is None
+    assert cache.stats()["misses"] == {"input_changed": 1, "no_decision": 1}
+
+def test_new_documents_miss(cache):
+    assert cache.lookup("c1", CUSTOMER, [{"type": "pan", "filename": "abc.png"}]) is None
+
+def test_invalidate_drops_every_entry(cache):
+    cache.invalidate("c1")
+    assert cache.lookup("c1", CUSTOMER, []) is None
+    assert not cache.record_decision("c1", CUSTOMER, [], OUTCOME)  # inputs are gone too
+
+def test_failed_kyc_recheck_ends_the_fast_path(cache):
+    cache.record_inputs("c1", {"status": "needs_review"}, {"score": 750}, {"eligibility": True})
+    assert cache.lookup("c1", CUSTOMER, []) is None
+    assert cache.stats()["misses"] == {"input_expired": 1}
+
+def test_fraud_flag_misses_and_drops_the_decision(cache):
+    assert cache.lookup("c1", CUSTOMER, [], fraud_check={"requires_review": True}) is None
+    assert cache.lookup("c1", CUSTOMER, [], fraud_check={"requires_review": False}) is None
+    assert cache.stats()["misses"] == {"fraud_flagged": 1, "no_decision": 1}
+
+def test_decisions_are_per_customer(cache):
+    assert cache.lookup("c2", CUSTOMER, []) is None
+    assert cache.lookup(None, CUSTOMER, []) is None
@@ -0,0 +1,64 @@
+"""Duplicate counts and fraud-ring sizes of the in-memory application index"""
+from services.fraud_index import DuplicateApplicationIndex, KEYS_PER_APPLICATION
+import numpy as np
+import time
+
+def _ids(phone=None, email=None, device=None):
+    ids = {"phone": [phone], "email": [email], "device": [device]}
+    return {kind: values for kind, values in ids.items() if values[0]}
+
+def test_other_customers_are_counted_once_each():
+    index = DuplicateApplicationIndex()
+    index.add_application("a1", _ids(phone="9000000001"), customer_id="alice")
+    index.add_application("a2", _ids(phone="9000000001", email="a@x.in"), customer_id="alice")
+    index.add_application("b1", _ids(email="a@x.in"), customer_id="bob")
+
+    shared = index.count_shared(_ids(phone="9000000001", email="a@x.in"), customer_id="carol")
+    assert shared["count"] == 2
+    assert shared["by_identifier"] == {"phone": 1, "email": 2}
+    assert shared["ring_size"] == 3
+
+def test_returning_customer_is_not_their_own_duplicate():
+    index = DuplicateApplicationIndex()
+    for i in range(3):
+        index.add_application(f"a{i}", _ids(phone="9000000001", device="d1"), customer_id="alice")
+
+    shared = index.count_shared(_ids(phone="9000000001", device="d1"), customer_id="alice")
+    assert shared == {"count": 0, "by_identifier": {}, "ring_size": 1}
+    assert index.ring("a2")["size"] == 1
+
+def test_rings_chain_through_shared_identifiers():
+    index = DuplicateApplicationIndex()
+    index.add_application("a", _ids(phone="9000000001"), customer_id="alice")
+    index.add_application("b", _ids(phone="9000000001", email="b@x.in"), customer_id="bob")
+    index.add_application("c", _ids(email="b@x.in", device="d3"), customer_id="carol")
+
+    assert index.ring("a")["size"] == 3
+    assert index.count_shared(_ids(device="d3"), customer_id="dave")["ring_size"] == 4
+    assert index.count_shared(_ids(device="other"), customer_id="dave") == {
+        "count": 0, "by_identifier": {}, "ring_size": 1
+    }
+
+def test_old_applications_are_outside_the_lookback():
+    index = DuplicateApplicationIndex()
+    index.add_application("old", _ids(phone="9000000001"), created_at=time.time() - 90 * 86400, customer_id="bob")
+    assert index.count_shared(_ids(phone="9000000001"), days=30, customer_id="alice")["count"] == 0
+    assert index.count_shared(_ids(phone="9000000001"), days=120, customer_id="alice")["count"] == 1
+
+def test_bulk_load_matches_incremental_adds():
+    rng = np.random.default_rng(0)
+    applications = [(f"app{i}", f"cust{rng.integers(40)}", _ids(phone=f"90000000{rng.integers(30):02d}",
+                                                                device=f"d{rng.integers(30)}"))
+                    for i in range(120)]
+    incremental = DuplicateApplicationIndex()
+    for application_id, customer_id, identifiers in applications:
+        incremental.add_application(application_id, identifiers, created_at=1.0, customer_id=customer_id)
+
+    bulk = DuplicateApplicationIndex()
+    keys = np.stack([bulk._hash_identifiers(identifiers) for _, _, identifiers in applications])
+    assert keys.shape == (len(applications), KEYS_PER_APPLICATION)
+    bulk.bulk_load([a for a, _, _ in applications], keys, np.ones(len(applications)),
+                   customer_ids=[c for _, c, _ in applications])
+
+    for application_id, _, _ in applications:
+        assert bulk.ring(application_id)["size"] == incremental.ring(application_id)["size"]
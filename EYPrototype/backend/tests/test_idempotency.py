@@ -0,0 +1,77 @@
+"""Idempotency keys: replays, rejected reuse and responses that are not kept"""
+from config import Config
+from services.idempotency import IdempotencyStore, IdempotencyRejected
+from services.otp import InMemoryTtlStore
+import json
+import threading
+import time
+import pytest
+
+class _Handler:
+    def __init__(self, status=200, delay=0.0):
+        self.status = status
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"call": self.calls}, self.status
+
+def test_retry_replays_the_first_response():
+    idempotency = IdempotencyStore(InMemoryTtlStore())
+    handler = _Handler()
+    assert idempotency.run("chat", "k1", "fp", handler) == ({"call": 1}, 200, False)
+    assert idempotency.run("chat", "k1", "fp", handler) == ({"call": 1}, 200, True)
+    assert handler.calls == 1
+    assert idempotency.stats()["replayed"] == 1
+
+def test_key_reused_for_a_different_request_is_rejected():
+    idempotency = IdempotencyStore(InMemoryTtlStore())
+    idempotency.run("chat", "k1", "fp-a", _Handler())
+    with pytest.raises(IdempotencyRejected) as excinfo:
+        idempotency.run("chat", "k1", "fp-b", _Handler())
+    assert excinfo.value.status_code == 422
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_throttled_and_failed_responses_are_not_kept(status):
+    idempotency = IdempotencyStore(InMemoryTtlStore())
+    handler = _Handler(status)
+    assert idempotency.run("chat", "k1", "fp", handler)[1:] == (status, False)
+    assert idempotency.run("chat", "k1", "fp", handler) == ({"call": 2}, status, False)
+    assert handler.calls == 2
+
+def test_client_errors_are_kept():
+    idempotency = IdempotencyStore(InMemoryTtlStore())
+    handler = _Handler(400)
+    idempotency.run("chat", "k1", "fp", handler)
+    assert idempotency.run("chat", "k1", "fp", handler) == ({"call": 1}, 400, True)
+
+def test_concurrent_duplicate_waits_for_the_first_request():
+    idempotency = IdempotencyStore(InMemoryTtlStore())
+    handler = _Handler(delay=0.2)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(idempotency.run("chat", "k1", "fp", handler)))
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert handler.calls == 1
+    assert sorted(results, key=lambda r: r[2]) == [({"call": 1}, 200, False), ({"call": 1}, 200, True)]
+
+def test_duplicate_on_another_worker_polls_the_shared_store(monkeypatch):
+    monkeypatch.setattr(Config, "IDEMPOTENCY_POLL_SECONDS", 0.01)
+    shared = InMemoryTtlStore()
+    other_worker = IdempotencyStore(shared)
+    shared.add("idem:chat:k1:lock", "fp", 10)  # the first request is running on another worker
+
+    def finish():
+        time.sleep(0.1)
+        shared.set("idem:chat:k1", json.dumps({"fingerprint": "fp", "status": 200, "body": "done"}), 60)
+        shared.delete("idem:chat:k1:lock")
+
+    threading.Thread(target=finish).start()
+    handler = _Handler()
+    assert other_worker.run("chat", "k1", "fp", handler) == ("done", 200, True)
+    assert handler.calls == 0
@@ -0,0 +1,18 @@
+"""OCR scores without Tesseract installed and without documents"""
+from config import Config
+from services import ocr
+from services.ocr import OcrService
+import asyncio
+
+def test_missing_tesseract_is_reported_with_the_fixed_confidence(monkeypatch):
+    monkeypatch.setattr(ocr, "_tesseract_available", False)
+    result = asyncio.run(OcrService(max_workers=1, cache=ocr.OcrResultCache(cache_dir="")).extract(
+        [{"type": "pan", "filename": "missing.jpg"}]))
+    assert result["status"] == "unavailable"
+    assert result["confidence"] == Config.OCR_UNAVAILABLE_CONFIDENCE
+
+def test_no_documents_score_zero_when_tesseract_is_installed(monkeypatch):
+    monkeypatch.setattr(ocr, "_tesseract_available", True)
+    result = asyncio.run(OcrService(max_workers=1, cache=ocr.OcrResultCache(cache_dir="")).extract([]))
+    assert result["status"] == "skipped"
+    assert result["confidence"] == 0.0
@@ -0,0 +1,49 @@
+"""OTP issue and verify against the in-process and Redis-protocol TTL stores"""
+from config import Config
+from services.otp import OtpService, OtpRateLimited, create_ttl_store
+import pytest
+
+PHONE = "+91 98765 43210"
+
+@pytest.fixture(params=["memory", "fakeredis"])
+def otp(request, monkeypatch):
+    monkeypatch.setattr(Config, "OTP_RETURN_CODE_FOR_TESTS", True)
+    store = create_ttl_store(request.param)
+    if hasattr(store, "client"):
+        store.client.flushall()
+    return OtpService(store)
+
+def test_issued_code_verifies_once(otp):
+    issued = otp.issue(PHONE)
+    assert issued["phone"] == "9876543210"
+    assert otp.verify(PHONE, issued["debug_code"], "customer-1") == {"status": "verified"}
+    assert otp.is_verified(PHONE, "customer-1")
+    assert otp.verify(PHONE, issued["debug_code"], "customer-1")["status"] == "expired"
+
+def test_verification_counts_only_for_the_verifying_customer(otp):
+    otp.verify(PHONE, otp.issue(PHONE)["debug_code"], "customer-1")
+    assert not otp.is_verified(PHONE, "customer-2")
+    assert not otp.is_verified(PHONE, None)
+
+def test_wrong_codes_lock_the_number(otp, monkeypatch):
+    monkeypatch.setattr(Config, "OTP_MAX_ATTEMPTS", 3)
+    code = otp.issue(PHONE)["debug_code"]
+    wrong = f"{(int(code) + 1) % 10 ** Config.OTP_LENGTH:0{Config.OTP_LENGTH}d}"
+    assert [otp.verify(PHONE, wrong)["attempts_remaining"] for _ in range(3)] == [2, 1, 0]
+    assert otp.verify(PHONE, code, "customer-1")["status"] == "locked"
+    assert not otp.is_verified(PHONE, "customer-1")
+
+def test_resend_is_rate_limited(otp):
+    otp.issue(PHONE)
+    with pytest.raises(OtpRateLimited) as excinfo:
+        otp.issue(PHONE)
+    assert 0 < excinfo.value.retry_after <= Config.OTP_RESEND_COOLDOWN_SECONDS + 1
+
+def test_code_is_returned_only_under_the_test_flag(otp, monkeypatch):
+    monkeypatch.setattr(Config, "OTP_RETURN_CODE_FOR_TESTS", False)
+    assert "debug_code" not in otp.issue(PHONE)
+
+def test_invalid_phone_is_refused(otp):
+    with pytest.raises(ValueError):
+        otp.issue("12345")
+    assert otp.verify("12345", "000000")["status"] == "failed"
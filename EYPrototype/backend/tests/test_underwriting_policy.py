@@ -0,0 +1,41 @@
+"""The single-decision and batch paths of a compiled policy must agree"""
+from services.underwriting_policy import CompiledPolicy
+import numpy as np
+import os
+import pytest
+
+POLICY_PATH = os.path.join(os.path.dirname(__file__), "..", "policies", "underwriting.json")
+
+@pytest.fixture(scope="module")
+def policy():
+    return CompiledPolicy.load(POLICY_PATH)
+
+def test_evaluate_matches_evaluate_batch(policy):
+    rng = np.random.default_rng(0)
+    count = 5000
+    loan_types = rng.choice(["Personal Loan", "home", "BUSINESS_LOAN", "Education Loan", "Gold Loan", "holiday", None], count)
+    # Grid values so rows land exactly on rule thresholds and rate band edges
+    features = {
+        "risk_score": rng.choice(np.round(np.arange(0, 1.01, 0.05), 2), count),
+        "verification_confidence": rng.choice([0.3, 0.5, 0.8, 1.0], count),
+        "credit_score": rng.choice([500, 550, 600, 650, 680, 750, 850], count).astype(float),
+        "requested_amount": rng.integers(50_000, 20_000_000, count).astype(float),
+    }
+    batch = policy.evaluate_batch(loan_types, features)
+
+    for i in range(count):
+        single = policy.evaluate(loan_types[i], {name: values[i] for name, values in features.items()})
+        product = policy.products[single["product"]]
+        assert batch["product"][i] == single["product"]
+        assert bool(batch["approve"][i]) == (single["decision"] == "approve")
+        assert batch["max_amount"][i] == (single.get("max_amount") or product.max_amount or np.inf)
+        if single["decision"] == "approve":
+            assert batch["interest_rate"][i] == single["interest_rate"]
+            assert batch["tenure_months"][i] == single["tenure_months"]
+        else:
+            assert product.reject_rules[batch["reject_rule"][i]][3] == single["reason"]
+
+def test_unknown_products_use_the_default(policy):
+    decision = policy.evaluate("Holiday Loan", {"risk_score": 0.1, "verification_confidence": 0.9, "credit_score": 800})
+    assert decision["product"] == policy.default_product
+    assert decision["decision"] == "approve"
@@ -1,16 +1,32 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef, useCallback } from 'react';
+import { io } from 'socket.io-client';
 
 const DashboardPage = ({ setCurrentPage, setApplicationData, submittedApplications }) => {
   const [applications, setApplications] = useState([]);
+  const [serverStats, setServerStats] = useState(null);
   const [loading, setLoading] = useState(true);
+  const cursorRef = useRef(null);
   const API_BASE_URL = process.env.REACT_APP_BACKEND_URL || 'http://localhost:5000';
 
+  // Counts come from server-side aggregates, not from the (recent) list below
+  const fetchStats = useCallback(async () => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/stats/dashboard`);
+      if (response.ok) {
+        const data = await response.json();
+        setServerStats(data.stats || null);
+      }
+    } catch (error) {
+      console.error('Error fetching dashboard stats:', error);
+    }
+  }, [API_BASE_URL]);
+
   // Fetch applications from backend
   useEffect(() => {
     const fetchApplications = async () => {
       try {
         setLoading(true);
-        const response = await fetch(`${API_BASE_URL}/api/applications`, {
+        const response = await fetch(`${API_BASE_URL}/api/applications?limit=50`, {
           method: 'GET',
           headers: {
             'Content-Type': 'application/json',
@@ -20,6 +36,7 @@ const DashboardPage = ({ setCurrentPage, setApplicationData, submittedApplicatio
         if (response.ok) {
           const data = await response.json();
           setApplications(data.applications || []);
+          cursorRef.current = data.cursor || null;
         } else {
           // Fallback to submitted applications
           setApplications(submittedApplications && submittedApplications.length > 0 
@@ -38,13 +55,97 @@ const DashboardPage = ({ setCurrentPage, setApplicationData, submittedApplicatio
     };
 
     fetchApplications();
-  }, [submittedApplications, API_BASE_URL]);
+    fetchStats();
+  }, [submittedApplications, API_BASE_URL, fetchStats]);
+
+  // Keep the list current from the change feed instead of refetching everything
+  useEffect(() => {
+    const mergeApplications = (changed) => {
+      if (!changed.length) return;
+      setApplications(current => {
+        const byId = new Map(current.map(a => [a.id, a]));
+        const added = [];
+        changed.forEach(a => {
+          if (!byId.has(a.id)) added.unshift(a);
+          byId.set(a.id, a);
+        });
+        return [...added, ...current.map(a => byId.get(a.id))];
+      });
+    };
+
+    const advanceCursor = (cursor) => {
+      if (cursor && (!cursorRef.current || cursor > cursorRef.current)) {
+        cursorRef.current = cursor;
+      }
+    };
+
+    // Catch up on anything missed while disconnected
+    const fetchChanges = async () => {
+      let hasMore = true;
+      while (hasMore && cursorRef.current) {
+        const response = await fetch(
+          `${API_BASE_URL}/api/applications/changes?since=${encodeURIComponent(cursorRef.current)}`
+        );
+        if (!response.ok) return;
+        const data = await response.json();
+        mergeApplications(data.applications || []);
+        advanceCursor(data.cursor);
+        hasMore = data.has_more;
+      }
+    };
+
+    // The staff key is entered at runtime and only exchanged for a short-lived dashboard token;
+    // it is never part of the bundle
+    const fetchDashboardToken = async () => {
+      let staffKey = sessionStorage.getItem('staffApiToken');
+      if (!staffKey) {
+        staffKey = window.prompt('Staff access key for live updates');
+        if (!staffKey) return null;
+        sessionStorage.setItem('staffApiToken', staffKey);
+      }
+      const response = await fetch(`${API_BASE_URL}/api/staff/dashboard-token`, {
+        method: 'POST',
+        headers: { 'Authorization': `Bearer ${staffKey}` }
+      });
+      if (response.status === 401) sessionStorage.removeItem('staffApiToken');
+      if (!response.ok) return null;
+      const data = await response.json();
+      return data.dashboard_token;
+    };
+
+    // A burst of changes refreshes the counts once, after it settles
+    let statsTimer = null;
+    const refreshStats = () => {
+      clearTimeout(statsTimer);
+      statsTimer = setTimeout(fetchStats, 1000);
+    };
+
+    const socket = io(API_BASE_URL, { transports: ['websocket'] });
+    socket.on('connect', () => {
+      fetchDashboardToken()
+        .then(token => token && socket.emit('subscribe', { dashboard: true, dashboard_token: token }))
+        .catch(error => console.error('Error fetching dashboard token:', error));
+      fetchChanges()
+        .then(refreshStats)
+        .catch(error => console.error('Error fetching application changes:', error));
+    });
+    socket.on('application_changed', (data) => {
+      mergeApplications([data.application]);
+      advanceCursor(data.cursor);
+      refreshStats();
+    });
+
+    return () => {
+      clearTimeout(statsTimer);
+      socket.disconnect();
+    };
+  }, [API_BASE_URL, fetchStats]);
 
-  // Calculate stats dynamically
-  const totalApps = applications.length;
-  const approvedCount = applications.filter(a => a.status === 'approved').length;
-  const inProgressCount = applications.filter(a => ['underwriting', 'verification', 'processing'].includes(a.status)).length;
-  const pendingCount = applications.filter(a => a.status === 'pending').length;
+  // Use server aggregates when available, otherwise count the applications we have
+  const totalApps = serverStats ? serverStats.total_applications : applications.length;
+  const approvedCount = serverStats ? serverStats.approved : applications.filter(a => a.status === 'approved').length;
+  const inProgressCount = serverStats ? serverStats.in_progress : applications.filter(a => ['underwriting', 'verification', 'processing'].includes(a.status)).length;
+  const pendingCount = serverStats ? serverStats.pending : applications.filter(a => a.status === 'pending').length;
 
   const stats = [
     { label: 'Total Applications', value: totalApps.toString(), color: 'indigo' },